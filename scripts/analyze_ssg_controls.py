@@ -10,8 +10,9 @@ from collections import Counter
 from pathlib import Path
 
 from diskcache import Deque
-from nested_lookup import nested_lookup
 
+from yaml_tools.oscal import ssg_id
+from yaml_tools.query import collect_keys
 from yaml_tools.templates import xform_id
 from yaml_tools.utils import (
     FileTypeError,
@@ -92,10 +93,12 @@ for path in nist_file_tuples:
     except FileTypeError as exc:
         print(f'{exc} => {fpath}')
 
-    id_list = [x for x in nested_lookup('id', indata) if x.isupper()]
-    id_queue.append((path[1], id_list))
+    found = collect_keys(
+        indata, ['id', 'controls'], predicates={'id': ssg_id}, limits={'controls': 1}
+    )
+    id_queue.append((path[1], found['id']))
 
-    ctl_list = nested_lookup('controls', indata)[0]
+    ctl_list = found['controls'][0]
     for ctl_id in ctl_list:
         ctl_queue.append((ctl_id['id'], ctl_id))
 
@@ -0,0 +1,74 @@
+"""
+Compare the old regex munging of Jinja ``{{{ }}}`` macros (before loading
+and after dumping) with the ``jinja`` scanner/emitter support, for the
+yasort load, sort, and dump cycle on generated SSG-style control files.
+Use the FILES env var (colon-separated paths) to add real control files.
+"""
+
+import os
+import timeit
+from pathlib import Path
+
+from ruamel.yaml import YAML
+
+from yaml_tools.jinja import jinja_yaml
+from yaml_tools.utils import (
+    get_str_yaml,
+    load_config,
+    replace_angles,
+    replace_curlys,
+)
+from yaml_tools.yasort import get_sort_spec, sort_list_data
+
+SIZES = [int(x) for x in os.getenv('SIZES', default='100,500,2000').split(',')]
+FILES = os.getenv('FILES', default='')
+REPEAT = int(os.getenv('REPEAT', default=3))
+
+
+def make_controls(size: int) -> str:
+    """
+    Generate a control file with Jinja macros in titles, rules, and
+    descriptions (followed by text or comments on the same line, so the
+    old munging does not join lines).
+    """
+    lines = ['policy: Bench', 'title: Bench {{{ full_name }}} controls', 'controls:']
+    for idx in range(size):
+        lines += [
+            f'  - id: ac-{idx}',
+            f'    title: Ensure {{{{{{ full_name }}}}}} control {idx}',
+            '    rules:',
+            f'      - {{{{{{ xccdf_value("var_{idx}") }}}}}} # value',
+        ]
+        lines += [f'      - rule_{x}' for x in range(10, 0, -1)]
+        lines += [
+            '    description: |-',
+            f'      Configure {{{{{{ prodname }}}}}} for control {idx}.',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def run_munged(text, popts):
+    """Old implementation."""
+    data = YAML().load(replace_curlys(text))
+    get_sort_spec(popts).sort(data)
+    return replace_angles(get_str_yaml(popts).dump(data))
+
+
+def run_jinja(text, popts):
+    """New implementation."""
+    return sort_list_data(jinja_yaml(YAML()).load(text), popts)
+
+
+popts, _ = load_config('yasort')
+inputs = [(f'{size} controls', make_controls(size)) for size in SIZES]
+inputs += [
+    (Path(x).name, Path(x).read_text(encoding='utf-8')) for x in FILES.split(':') if x
+]
+
+print(f"{'input':<24} {'size':>10} {'munged (s)':>12} {'jinja (s)':>12} {'speedup':>9}")
+for name, text in inputs:
+    t_old = min(timeit.repeat(lambda: run_munged(text, popts), number=1, repeat=REPEAT))
+    t_new = min(timeit.repeat(lambda: run_jinja(text, popts), number=1, repeat=REPEAT))
+    print(
+        f'{name:<24} {len(text):>10} {t_old:>12.5f} {t_new:>12.5f} {t_old / t_new:>8.1f}x'
+    )
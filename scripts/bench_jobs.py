@@ -0,0 +1,81 @@
+"""
+Parallel scaling benchmark for the ``--jobs`` execution layer; converts
+a set of generated YAML files to XML with ``ymltoxml`` using 1 to N
+worker processes and reports the speedup over a serial run. Worker
+counts above the available CPUs (including any container CPU quota)
+are clamped, so those rows are skipped.
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from munch import Munch
+
+from yaml_tools.utils import (
+    available_cpus,
+    load_config,
+    resolve_jobs,
+    run_jobs,
+)
+from yaml_tools.ymltoxml import process_inputs
+
+NUM_FILES = int(os.getenv('NUM_FILES', default=200))
+NUM_CONTROLS = int(os.getenv('NUM_CONTROLS', default=200))
+JOBS = os.getenv('JOBS', default='')
+REPEAT = int(os.getenv('REPEAT', default=3))
+
+
+def make_inputs(dirpath):
+    """
+    Write ``NUM_FILES`` YAML files with ``NUM_CONTROLS`` controls each.
+    """
+    lines = ['catalog:', '  controls:']
+    for num in range(NUM_CONTROLS):
+        lines += [
+            f'    - id: ac-{num}',
+            f'      title: Control number {num}',
+            '      levels:',
+            '        - high',
+            '        - moderate',
+            '      props:',
+            f'        name: prop-{num}',
+            f'        value: "{num * 3}"',
+        ]
+    text = '\n'.join(lines) + '\n'
+    paths = []
+    for num in range(NUM_FILES):
+        path = Path(dirpath).joinpath(f'controls-{num:04d}.yaml')
+        path.write_text(text, encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+cpus = available_cpus()
+if JOBS:
+    job_counts = [int(x) for x in JOBS.split(',')]
+else:
+    job_counts = sorted({1, 2, 4, 8, cpus})
+cfg, _ = load_config('ymltoxml')
+popts = Munch.toDict(cfg)
+popts['use_cache'] = False
+
+print(f'Available CPUs: {cpus}; {NUM_FILES} files x {NUM_CONTROLS} controls')
+print(f"{'jobs':>6} {'best (s)':>10} {'speedup':>8}")
+with tempfile.TemporaryDirectory() as tmpdir:
+    files = make_inputs(tmpdir)
+    serial = None
+    for jobs in job_counts:
+        if resolve_jobs(jobs) != jobs:
+            print(f'{jobs:>6} {"skipped (only " + str(cpus) + " CPUs)":>20}')
+            continue
+        times = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            for _ in run_jobs(process_inputs, files, (popts, None, False), jobs=jobs):
+                pass
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        serial = serial or best
+        print(f'{jobs:>6} {best:>10.3f} {serial / best:>7.2f}x')
@@ -0,0 +1,76 @@
+"""
+Microbenchmark for sorting all mapping keys in a round-trip document,
+compared with the recursive pop/insert prototype in ``tests/sort_check.py``.
+"""
+
+import copy
+import os
+import random
+import sys
+import timeit
+
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+
+from yaml_tools.sorting import sort_mapping_keys
+
+SIZES = [int(x) for x in os.getenv('SIZES', default='100,500,1000,3000').split(',')]
+DEPTH = int(os.getenv('DEPTH', default=20))
+REPEAT = int(os.getenv('REPEAT', default=3))
+
+
+def recursive_sort_mappings(s):
+    """Prototype implementation."""
+    if isinstance(s, list):
+        for elem in s:
+            recursive_sort_mappings(elem)
+        return
+    if not isinstance(s, dict):
+        return
+    for key in sorted(s, reverse=True):
+        value = s.pop(key)
+        recursive_sort_mappings(value)
+        s.insert(0, key, value)
+
+
+def make_doc(size: int, depth: int) -> CommentedMap:
+    """
+    Generate a control file with ``size`` controls in shuffled key order,
+    each with a nested chain of ``depth`` mappings.
+    """
+    rng = random.Random(size)
+    controls = CommentedSeq()
+    for idx in range(size):
+        ctl = CommentedMap()
+        fields = [
+            ('title', f'Control {idx}'),
+            ('status', 'pending'),
+            ('levels', CommentedSeq(['low', 'medium'])),
+            ('rules', CommentedSeq(f'rule_{x}' for x in range(10))),
+            ('id', f'ac-{idx}'),
+        ]
+        rng.shuffle(fields)
+        for key, value in fields:
+            ctl[key] = value
+        node = ctl
+        for level in range(depth):
+            child = CommentedMap([('z', level), ('b', level), ('a', level)])
+            node['notes'] = child
+            node = child
+        controls.append(ctl)
+    return CommentedMap([('title', 'bench'), ('id', 'bench'), ('controls', controls)])
+
+
+sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * DEPTH + 100))
+print(f"{'size':>8} {'recursive (s)':>14} {'in place (s)':>14} {'speedup':>9}")
+for size in SIZES:
+    doc = make_doc(size, DEPTH)
+    docs = [copy.deepcopy(doc) for _ in range(2 * REPEAT)]
+    t_rec = min(
+        timeit.repeat(
+            lambda: recursive_sort_mappings(docs.pop()), number=1, repeat=REPEAT
+        )
+    )
+    t_new = min(
+        timeit.repeat(lambda: sort_mapping_keys(docs.pop()), number=1, repeat=REPEAT)
+    )
+    print(f'{size:>8} {t_rec:>14.5f} {t_new:>14.5f} {t_rec / t_new:>8.1f}x')
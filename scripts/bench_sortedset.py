@@ -0,0 +1,75 @@
+"""
+Microbenchmark for ``SortedSet`` construction and set algebra, compared
+with the old list-backed implementation.
+"""
+
+import os
+import random
+import timeit
+from typing import List
+
+from yaml_tools.utils import SortedSet
+
+SIZES = [int(x) for x in os.getenv('SIZES', default='100,500,1000,5000').split(',')]
+REPEAT = int(os.getenv('REPEAT', default=3))
+
+
+class ListSortedSet:
+    """
+    The original list-backed set (kept here for comparison only).
+    """
+
+    def __init__(self, iterable):
+        self.elements: List = []
+        for value in iterable:
+            if value not in self.elements:
+                self.elements.append(value)
+
+    def __contains__(self, value):
+        return value in self.elements
+
+    def common(self, other):
+        """Emulate the ``Set.__and__`` mixin."""
+        return [x for x in other.elements if x in self]
+
+    def diff(self, other):
+        """Emulate the ``Set.__sub__`` mixin."""
+        return [x for x in self.elements if x not in other]
+
+
+def make_ids(size: int) -> List[str]:
+    """
+    Generate control-like ID strings, eg, ``ac-12.02``.
+    """
+    fams = ['ac', 'au', 'cm', 'ia', 'sc', 'si', 'sa', 'pm']
+    return [f'{fams[i % len(fams)]}-{i // 8:02d}.{i % 13:02d}' for i in range(size)]
+
+
+def run_list(in_ids, ctl_ids):
+    """Old implementation."""
+    in_set = ListSortedSet(in_ids)
+    id_set = ListSortedSet(ctl_ids)
+    in_set.common(id_set)
+    in_set.diff(id_set)
+
+
+def run_hashed(in_ids, ctl_ids):
+    """New implementation."""
+    in_set = SortedSet(in_ids)
+    id_set = SortedSet(ctl_ids)
+    _ = id_set > in_set
+    _ = id_set & in_set
+    _ = in_set - id_set
+
+
+print(f"{'size':>8} {'list (s)':>12} {'hashed (s)':>12} {'speedup':>9}")
+for size in SIZES:
+    ctl_ids = make_ids(size)
+    in_ids = random.sample(ctl_ids, size // 2) + make_ids(size + size // 4)[size:]
+    t_list = min(
+        timeit.repeat(lambda: run_list(in_ids, ctl_ids), number=1, repeat=REPEAT)
+    )
+    t_hash = min(
+        timeit.repeat(lambda: run_hashed(in_ids, ctl_ids), number=1, repeat=REPEAT)
+    )
+    print(f'{size:>8} {t_list:>12.5f} {t_hash:>12.5f} {t_list / t_hash:>8.1f}x')
@@ -0,0 +1,53 @@
+"""
+Startup benchmark for the console entry points using ``python -X
+importtime``. The console scripts start in ``yaml_tools.daemon``, so
+each run imports it before the tool module and the reported time covers
+both. Exits non-zero if the (best of N) cumulative import time for any
+entry point is over budget, or if any heavy dependency is imported at
+startup.
+"""
+
+import os
+import subprocess
+import sys
+
+ENTRY_MODULE = 'yaml_tools.daemon'
+MODULES = ['ymltoxml', 'yasort', 'yagrep', 'oscal']
+BUDGET_MS = float(os.getenv('BUDGET_MS', default=250))
+REPEAT = int(os.getenv('REPEAT', default=5))
+DEFERRED = ['dpath', 'natsort', 'nested_lookup', 'pystache', 'ruamel.yaml', 'xmltodict']
+
+
+def import_times(modname):
+    """
+    Run one interpreter importing the entry module and ``modname`` and
+    return a dict of cumulative import times in microseconds keyed by
+    module name.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {ENTRY_MODULE}, {modname}'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+failed = False
+print(f"{'module':<12} {'best (ms)':>10} {'budget':>8}  deferred deps imported")
+for mod in MODULES:
+    modname = f'yaml_tools.{mod}'
+    runs = [import_times(modname) for _ in range(REPEAT)]
+    best = min(run[ENTRY_MODULE] + run[modname] for run in runs) / 1000
+    eager = [dep for dep in DEFERRED if dep in runs[0]]
+    status = 'OK' if best <= BUDGET_MS and not eager else 'FAIL'
+    failed = failed or status == 'FAIL'
+    print(f"{mod:<12} {best:>10.1f} {BUDGET_MS:>8.0f}  {eager or '-'}  {status}")
+
+sys.exit(1 if failed else 0)
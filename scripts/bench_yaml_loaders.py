@@ -0,0 +1,50 @@
+"""
+Compare YAML loader backends on the packaged config files and the test
+catalog; add more files (eg, resolved NIST catalogs) with the FILES env
+var as a colon-separated list of paths.
+"""
+
+import os
+import timeit
+from pathlib import Path
+
+from yaml_tools.utils import (
+    YAML_BACKENDS,
+    get_filelist,
+    get_loader_backend,
+    yaml_safe_load,
+)
+
+FILES = os.getenv('FILES', default='')
+REPEAT = int(os.getenv('REPEAT', default=5))
+NUMBER = int(os.getenv('NUMBER', default=3))
+
+paths = get_filelist('src/yaml_tools/data', '*.yaml') + ['tests/data/catalog.yaml']
+paths += [x for x in FILES.split(':') if x]
+
+backends = []
+for name in YAML_BACKENDS[1:]:
+    opts = {'yaml_backend': name}
+    if get_loader_backend(opts) != name:
+        print(f'Backend {name} not available, skipping...')
+        continue
+    backends.append(name)
+
+print(f"{'file':<40} {'size':>10} " + ' '.join(f'{x:>10}' for x in backends))
+for path in paths:
+    text = Path(path).read_text(encoding='utf-8')
+    times = []
+    for name in backends:
+        opts = {'yaml_backend': name}
+        best = min(
+            timeit.repeat(
+                lambda opts=opts: yaml_safe_load(text, opts),
+                number=NUMBER,
+                repeat=REPEAT,
+            )
+        )
+        times.append(best / NUMBER)
+    print(
+        f'{Path(path).name:<40} {len(text):>10} '
+        + ' '.join(f'{x * 1000:>8.3f}ms' for x in times)
+    )
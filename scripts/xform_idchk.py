@@ -4,9 +4,7 @@ Simple consumer test with de-dup and sort.
 
 import os
 
-from natsort import os_sorted
-
-from yaml_tools.templates import xform_id
+from yaml_tools.templates import id_sort_key, xform_ids
 from yaml_tools.utils import text_file_reader
 
 FILE = os.getenv('ID_FILE', default='tests/data/OE-expanded-profile-all-ids.txt')
@@ -30,10 +28,10 @@ def set_unique(sequence):
 data = text_file_reader(FILE, OPTS)
 
 # we assume input IDs are classic upper case
-raw_ids = [xform_id(x) for x in data if len(x) > 0]
+raw_ids = xform_ids(data)
 
 unique_ids = set_unique(raw_ids)
 
 # spit out lowercase id format
-for ctl in os_sorted(unique_ids):
+for ctl in sorted(unique_ids, key=id_sort_key):
     print(ctl)
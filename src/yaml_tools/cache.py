@@ -0,0 +1,301 @@
+"""
+Persistent on-disk cache of parsed documents shared by the console tools.
+"""
+
+import hashlib
+import io
+import os
+import pickle  # nosec B403
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TextIO, Tuple, Union
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.pickle'
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# eviction after a put trims the cache to this fraction of the size limit
+EVICT_LOW_WATER = 0.9
+
+
+def get_cache_dir(prog_opts: Optional[Dict] = None) -> Path:
+    """
+    Get the cache directory from the ``cache_dir`` config option, or use
+    ``$XDG_CACHE_HOME/yaml-tools`` (default ``~/.cache/yaml-tools``).
+
+    :param prog_opts: configuration options
+    :returns: cache directory path (may not exist yet)
+    """
+    cfg_dir = (prog_opts or {}).get('cache_dir')
+    if cfg_dir:
+        return Path(cfg_dir).expanduser()
+    xdg_dir = os.getenv('XDG_CACHE_HOME') or Path.home().joinpath('.cache')
+    return Path(xdg_dir).joinpath('yaml-tools')
+
+
+class DocumentCache:
+    """
+    Size-capped LRU cache of parsed documents stored as pickle files in
+    ``cache_dir``. Entries are keyed by source path, size, mtime, content
+    hash and the loader config, so any change to the source file or how
+    it gets parsed results in a cache miss. Cache errors are never fatal;
+    an unreadable or unwritable entry is treated as a miss.
+
+    The total size of the entries is counted once (on the first ``put``)
+    and then tracked in memory, so the directory is only scanned again
+    when the cache goes over the size limit.
+
+    :param cache_dir: cache directory path
+    :param max_size: maximum total size of cache entries in bytes
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.size: Optional[int] = None
+
+    @staticmethod
+    def make_key(path: Path, data: bytes, loader_cfg: str) -> str:
+        """
+        Build the cache key for the raw file ``data`` read from ``path``.
+
+        :param path: source file path
+        :param data: source file contents
+        :param loader_cfg: string describing the loader configuration
+        :returns: hex digest key
+        """
+        stat = path.stat()
+        digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+        ident = '\0'.join(
+            [
+                str(CACHE_VERSION),
+                str(path.resolve()),
+                str(stat.st_size),
+                str(stat.st_mtime_ns),
+                digest,
+                loader_cfg,
+            ]
+        )
+        return hashlib.blake2b(ident.encode('utf-8'), digest_size=20).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir.joinpath(f'{key}{CACHE_SUFFIX}')
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up ``key`` and refresh its LRU timestamp on a hit.
+
+        :param key: cache key
+        :returns: tuple of (hit, data)
+        """
+        entry = self._entry(key)
+        try:
+            with entry.open('rb') as cfile:
+                data = pickle.load(cfile)  # nosec B301
+            os.utime(entry)
+        except FileNotFoundError:
+            return False, None
+        except Exception:  # pylint: disable=W0703
+            entry.unlink(missing_ok=True)
+            return False, None
+        return True, data
+
+    def put(self, key: str, data: Any) -> None:
+        """
+        Store ``data`` under ``key`` (atomically) and evict old entries if
+        the cache is over the size limit.
+
+        :param key: cache key
+        :param data: parsed document
+        """
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                'wb', dir=self.cache_dir, suffix='.tmp', delete=False
+            ) as tfile:
+                pickle.dump(data, tfile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tfile.name, self._entry(key))
+            size = os.stat(self._entry(key)).st_size
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            return
+        if self.size is not None:
+            self.size += size
+        if self.size is None or self.size > self.max_size:
+            self.evict(int(self.max_size * EVICT_LOW_WATER))
+
+    def evict(self, low_water: Optional[int] = None) -> None:
+        """
+        Scan the cache and, if the total size of the entries is over
+        ``max_size``, remove least recently used entries until it is
+        within ``low_water`` (default is ``max_size``).
+
+        :param low_water: target size in bytes
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as scan:
+            for item in scan:
+                if item.name.endswith(CACHE_SUFFIX) and item.is_file():
+                    stat = item.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, item.path))
+                    total += stat.st_size
+        target = self.max_size if low_water is None else low_water
+        if total > self.max_size:
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+        self.size = total
+
+    def clear(self) -> None:
+        """
+        Remove the cache directory and all of its contents.
+        """
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.size = 0
+
+
+class MemoryCache:
+    """
+    Size-capped in-process LRU cache of parsed documents, used in front of
+    the ``DocumentCache`` by long-running processes (see ``daemon``). The
+    entries are stored pickled, so each hit returns a new copy that the
+    caller is free to modify. The cache is disabled when ``max_size`` is 0.
+
+    :param max_size: maximum total size of cache entries in bytes
+    """
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self.size = 0
+        self.entries: 'OrderedDict[str, bytes]' = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up ``key`` and mark it as most recently used on a hit.
+
+        :param key: cache key
+        :returns: tuple of (hit, data)
+        """
+        blob = self.entries.get(key)
+        if blob is None:
+            return False, None
+        self.entries.move_to_end(key)
+        return True, pickle.loads(blob)  # nosec B301
+
+    def put(self, key: str, data: Any) -> None:
+        """
+        Store ``data`` under ``key`` and evict the least recently used
+        entries if the cache is over the size limit.
+
+        :param key: cache key
+        :param data: parsed document
+        """
+        if not self.max_size:
+            return
+        try:
+            blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        if len(blob) > self.max_size:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = blob
+        self.size += len(blob)
+        while self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        self.entries.clear()
+        self.size = 0
+
+
+# in-process document cache (only enabled by the daemon)
+MEMORY_CACHE = MemoryCache()
+
+# on-disk document caches by (cache_dir, max_size)
+DOCUMENT_CACHES: Dict[Tuple[Path, int], DocumentCache] = {}
+
+
+def cache_enabled(prog_opts: Dict) -> bool:
+    """
+    Check the ``use_cache`` config option (off if not present).
+    """
+    return bool(prog_opts.get('use_cache'))
+
+
+def get_document_cache(prog_opts: Dict) -> DocumentCache:
+    """
+    Get the (shared) document cache for the configured cache directory
+    and size limit, so the cache size is only counted once per process.
+
+    :param prog_opts: configuration options
+    :returns: document cache
+    """
+    cache_key = (
+        get_cache_dir(prog_opts),
+        prog_opts.get('cache_max_size') or DEFAULT_MAX_SIZE,
+    )
+    cache = DOCUMENT_CACHES.get(cache_key)
+    if cache is None:
+        cache = DOCUMENT_CACHES[cache_key] = DocumentCache(*cache_key)
+    return cache
+
+
+def clear_cache(prog_opts: Dict) -> Path:
+    """
+    Remove all entries from the configured cache directory.
+
+    :param prog_opts: configuration options
+    :returns: cache directory path
+    """
+    cache = get_document_cache(prog_opts)
+    cache.clear()
+    return cache.cache_dir
+
+
+def cached_load(
+    path: Path,
+    prog_opts: Dict,
+    loader: Callable[[TextIO], Any],
+    loader_cfg: str,
+) -> Any:
+    """
+    Load ``path`` through the document cache (and the in-process
+    ``MEMORY_CACHE`` if enabled); on a miss the file text is parsed with
+    ``loader`` (which gets a text stream named after ``path``, so parse
+    errors show the file name) and the result is stored for the next run.
+    The ``file_encoding`` option is part of the cache key.
+
+    :param path: source file path
+    :param prog_opts: configuration options
+    :param loader: callable returning the parsed data from a text stream
+    :param loader_cfg: string describing the loader configuration
+    :returns: parsed document
+    """
+    cache = get_document_cache(prog_opts)
+    encoding = prog_opts['file_encoding']
+    raw = path.read_bytes()
+    key = cache.make_key(path, raw, f'{encoding}:{loader_cfg}')
+    hit, data = MEMORY_CACHE.get(key)
+    if hit:
+        return data
+    hit, data = cache.get(key)
+    if not hit:
+        stream = io.StringIO(raw.decode(encoding), newline=None)
+        stream.name = str(path)  # type: ignore[misc]
+        data = loader(stream)
+        cache.put(key, data)
+    MEMORY_CACHE.put(key, data)
+    return data
@@ -0,0 +1,472 @@
+"""
+Opt-in background daemon for the console tools. Running a tool with the
+``--daemon`` option forwards the command line, working directory, and
+environment (plus the stdin/stdout/stderr file descriptors themselves)
+over a Unix socket to a daemon process that keeps the tool modules
+imported and recently parsed documents in memory. The tool runs in the
+daemon exactly as it would in a new process and writes directly to the
+client's stdout/stderr, and the client exits with the same exit code.
+
+The daemon is started on demand, handles one request at a time, and
+shuts down after ``YAML_TOOLS_DAEMON_IDLE`` seconds (default 600) without
+a request. If the daemon cannot be used (eg, on platforms without Unix
+socket descriptor passing) the tool just runs in the client process.
+
+The console entry points start here so the client does not pay for
+importing the tool modules; keep the imports in this module light.
+"""
+
+import array
+import hashlib
+import json
+import os
+import socket
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DAEMON_FLAG = '--daemon'
+IDLE_TIMEOUT = 600
+MEMORY_CACHE_SIZE = 256 * 1024 * 1024
+PRELOAD = ['dpath', 'natsort', 'pystache', 'ruamel.yaml', 'xmltodict']
+SPAWN_TIMEOUT = 10.0
+TOOLS = ['oscal', 'yagrep', 'yasort', 'ymltoxml']
+
+_ACK = struct.Struct('!ci')
+_FAILED: List[str] = []
+_HEADER = struct.Struct('!I')
+_STATUS = struct.Struct('!i')
+
+
+def supported() -> bool:
+    """
+    Check whether this platform can pass file descriptors over Unix
+    sockets (required for the daemon).
+    """
+    return all(hasattr(socket, x) for x in ('AF_UNIX', 'SCM_RIGHTS', 'CMSG_LEN'))
+
+
+def socket_path() -> Path:
+    """
+    Get the daemon socket path; the socket lives in a private (mode 0700)
+    directory, and the name depends on the python interpreter (with any
+    symlinks resolved, so ``python`` and ``python3.x`` find the same
+    daemon) and the package source files, so a new install (or any source
+    change) gets a new daemon.
+
+    :returns: socket path
+    :raises OSError: if the socket directory is not private to the user
+    """
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        sock_dir = Path(runtime_dir).joinpath('yaml-tools')
+    else:
+        import tempfile  # pylint: disable=C0415
+
+        sock_dir = Path(tempfile.gettempdir()).joinpath(f'yaml-tools-{os.getuid()}')
+    sock_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    stat = sock_dir.stat()
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise OSError(f'insecure daemon socket directory {sock_dir}')
+    pkg_dir = os.path.dirname(os.path.abspath(__file__))
+    with os.scandir(pkg_dir) as entries:
+        mtime = max(x.stat().st_mtime_ns for x in entries if x.name.endswith('.py'))
+    executable = os.path.realpath(sys.executable)
+    ident = f'{executable}\0{pkg_dir}\0{mtime}'.encode('utf-8')
+    digest = hashlib.blake2b(ident, digest_size=6).hexdigest()
+    return sock_dir.joinpath(f'daemon-{digest}.sock')
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    """
+    Read exactly ``size`` bytes (or fewer if the connection is closed).
+    """
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def send_request(conn: socket.socket, request: Dict, fds: Sequence[int] = ()):
+    """
+    Send a request (a JSON message) and optionally pass file descriptors.
+    """
+    payload = json.dumps(request).encode('utf-8')
+    data = _HEADER.pack(len(payload)) + payload
+    ancillary = []
+    if fds:
+        ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))]
+    sent = conn.sendmsg([data], ancillary)
+    if sent < len(data):
+        conn.sendall(data[sent:])
+
+
+def recv_request(conn: socket.socket, max_fds: int = 3) -> Tuple[Dict, List[int]]:
+    """
+    Receive a request and any file descriptors sent with it.
+
+    :raises ValueError: if the request is incomplete
+    """
+    fds = array.array('i')
+    data, ancdata, _, _ = conn.recvmsg(
+        _HEADER.size + 65536, socket.CMSG_LEN(max_fds * fds.itemsize)
+    )
+    for level, kind, cdata in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            usable = len(cdata) - (len(cdata) % fds.itemsize)
+            fds.frombytes(cdata[:usable])
+    if len(data) < _HEADER.size:
+        data += _recv_exact(conn, _HEADER.size - len(data))
+    if len(data) < _HEADER.size:
+        raise ValueError('incomplete request')
+    (size,) = _HEADER.unpack(data[: _HEADER.size])
+    payload = data[_HEADER.size :]
+    payload += _recv_exact(conn, size - len(payload))
+    if len(payload) != size:
+        raise ValueError('incomplete request')
+    return json.loads(payload.decode('utf-8')), list(fds)
+
+
+def _connect(path: Path) -> Optional[socket.socket]:
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(path))
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+
+def _spawn_daemon(path: Path) -> Optional[socket.socket]:
+    """
+    Start the daemon in a new session and wait for it to accept
+    connections.
+    """
+    import subprocess  # pylint: disable=C0415  # nosec B404
+
+    subprocess.Popen(  # pylint: disable=R1732  # nosec B603
+        [sys.executable, '-m', 'yaml_tools.daemon', '--serve'],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd='/',
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    while time.monotonic() < deadline:
+        conn = _connect(path)
+        if conn is not None:
+            return conn
+        time.sleep(0.02)
+    return None
+
+
+def _stream_info(stream) -> Dict:
+    return {
+        'encoding': getattr(stream, 'encoding', None) or 'utf-8',
+        'errors': getattr(stream, 'errors', None) or 'strict',
+        'line_buffering': bool(getattr(stream, 'line_buffering', False)),
+    }
+
+
+def run_client(tool: str, argv: Sequence[str]) -> Optional[int]:
+    """
+    Run a tool command in the daemon (starting it if needed).
+
+    :param tool: tool (module) name, one of TOOLS
+    :param argv: command line, including ``argv[0]``
+    :returns: exit code, or None if the daemon could not be used
+    """
+    if _FAILED or not supported():
+        return None
+    try:
+        fds = [sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()]
+        for fdesc in fds:
+            os.fstat(fdesc)
+        path = socket_path()
+    except (AttributeError, ValueError, OSError):
+        return None
+    sys.stdout.flush()
+    sys.stderr.flush()
+    request = {
+        'tool': tool,
+        'argv': [x for x in argv if x != DAEMON_FLAG],
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+        'streams': [_stream_info(x) for x in (sys.stdin, sys.stdout, sys.stderr)],
+    }
+
+    for attempt in range(2):
+        conn = _connect(path) if attempt == 0 else _spawn_daemon(path)
+        if conn is None:
+            continue
+        with conn:
+            try:
+                send_request(conn, request, fds)
+                ack = _recv_exact(conn, _ACK.size)
+            except OSError:
+                ack = b''
+            if len(ack) != _ACK.size:
+                # the daemon was shutting down; the command did not run
+                continue
+            try:
+                status = _recv_exact(conn, _STATUS.size)
+            except KeyboardInterrupt:
+                # pass the interrupt on to the running command
+                import signal  # pylint: disable=C0415
+
+                os.kill(_ACK.unpack(ack)[1], signal.SIGINT)
+                return 130
+            if len(status) != _STATUS.size:
+                print('yaml-tools daemon: connection lost', file=sys.stderr)
+                return 1
+            return _STATUS.unpack(status)[0]
+    return None
+
+
+def client_main(tool: str, argv: Sequence[str]):
+    """
+    Entry point hook for the ``--daemon`` option; exits with the result
+    from the daemon, or returns (to run the command in this process) if
+    the daemon cannot be used.
+    """
+    code = run_client(tool, argv)
+    if code is not None:
+        sys.exit(code)
+    _FAILED.append(tool)
+
+
+def _launcher(tool: str) -> Callable:
+    def main():
+        if DAEMON_FLAG in sys.argv[1:]:
+            client_main(tool, sys.argv)
+        import importlib  # pylint: disable=C0415
+
+        return importlib.import_module(f'yaml_tools.{tool}').main()
+
+    main.__doc__ = f'Console entry point for ``{tool}`` (with ``--daemon`` support).'
+    return main
+
+
+oscal_main = _launcher('oscal')
+yagrep_main = _launcher('yagrep')
+yasort_main = _launcher('yasort')
+ymltoxml_main = _launcher('ymltoxml')
+
+
+class Daemon:
+    """
+    Daemon server; runs tool requests one at a time in this process.
+
+    :param path: socket path
+    :param idle_timeout: seconds to wait for a request before exiting
+    """
+
+    def __init__(self, path: Path, idle_timeout: float = IDLE_TIMEOUT):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.running = False
+
+    @staticmethod
+    def preload():
+        """
+        Import the tool modules and their (deferred) dependencies.
+        """
+        import importlib  # pylint: disable=C0415
+
+        from .cache import MEMORY_CACHE  # pylint: disable=C0415
+
+        MEMORY_CACHE.max_size = MEMORY_CACHE_SIZE
+        for name in [f'yaml_tools.{x}' for x in TOOLS] + PRELOAD:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                continue
+
+    def serve(self):
+        """
+        Listen for requests until idle or stopped. Only one daemon per
+        socket can run; if another one holds the lock this returns.
+        """
+        import fcntl  # pylint: disable=C0415
+
+        lock_path = self.path.with_suffix('.lock')
+        with open(lock_path, 'w', encoding='utf-8') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            self.preload()
+            self.path.unlink(missing_ok=True)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+                listener.bind(str(self.path))
+                listener.listen(64)
+                listener.settimeout(self.idle_timeout)
+                self.running = True
+                try:
+                    while self.running:
+                        try:
+                            conn, _ = listener.accept()
+                        except socket.timeout:
+                            break
+                        with conn:
+                            self.handle(conn)
+                finally:
+                    self.path.unlink(missing_ok=True)
+
+    def handle(self, conn: socket.socket):
+        """
+        Handle one connection, ie, a tool request or a control command.
+        """
+        conn.settimeout(None)
+        try:
+            request, fds = recv_request(conn)
+        except (OSError, ValueError):
+            return
+        try:
+            if request.get('command') == 'stop':
+                self.running = False
+            elif request.get('tool') not in TOOLS or len(fds) != 3:
+                if request.get('command') != 'status':
+                    return
+            conn.sendall(_ACK.pack(b'A', os.getpid()))
+            if 'command' in request:
+                return
+            code = self.run(request, fds)
+            conn.sendall(_STATUS.pack(code))
+        except Exception:  # pylint: disable=W0703
+            return
+        finally:
+            for fdesc in fds:
+                os.close(fdesc)
+
+    @staticmethod
+    def _open_streams(streams: List[Dict]) -> List:
+        """
+        Open text streams on fds 0-2 with the client's stream settings.
+        """
+        modes = ['r', 'w', 'w']
+        return [
+            open(  # pylint: disable=R1732
+                fdesc,
+                modes[fdesc],
+                buffering=1 if fdesc and info['line_buffering'] else -1,
+                encoding=info['encoding'],
+                errors=info['errors'],
+                closefd=False,
+            )
+            for fdesc, info in enumerate(streams)
+        ]
+
+    def run(self, request: Dict, fds: List[int]) -> int:
+        """
+        Run a tool request with the client's stdio, cwd, environment and
+        argv, then restore the daemon state.
+
+        :returns: exit code
+        """
+        import importlib  # pylint: disable=C0415
+        import traceback  # pylint: disable=C0415
+
+        saved_fds = [os.dup(x) for x in (0, 1, 2)]
+        saved_env = dict(os.environ)
+        saved_argv = sys.argv
+        code = 0
+        try:
+            for target, fdesc in enumerate(fds):
+                os.dup2(fdesc, target)
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            sys.stdin, sys.stdout, sys.stderr = self._open_streams(request['streams'])
+            sys.argv = list(request['argv'])
+            try:
+                importlib.import_module(f"yaml_tools.{request['tool']}").main()
+            except SystemExit as exc:
+                if exc.code is None:
+                    code = 0
+                elif isinstance(exc.code, int):
+                    code = exc.code
+                else:
+                    print(exc.code, file=sys.stderr)
+                    code = 1
+            except KeyboardInterrupt:
+                code = 130
+            except Exception:  # pylint: disable=W0703
+                traceback.print_exc()
+                code = 1
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except (OSError, ValueError):
+                    pass
+            sys.stdin, sys.stdout, sys.stderr = (
+                sys.__stdin__,
+                sys.__stdout__,
+                sys.__stderr__,
+            )
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_env)
+            os.chdir('/')
+            for target, fdesc in enumerate(saved_fds):
+                os.dup2(fdesc, target)
+                os.close(fdesc)
+        return code
+
+
+def send_command(command: str) -> Optional[int]:
+    """
+    Send a control command (``stop`` or ``status``) to a running daemon.
+
+    :returns: the daemon pid, or None if no daemon is running
+    """
+    conn = _connect(socket_path())
+    if conn is None:
+        return None
+    with conn:
+        send_request(conn, {'command': command})
+        reply = _recv_exact(conn, _ACK.size)
+    if len(reply) != _ACK.size:
+        return None
+    return _ACK.unpack(reply)[1]
+
+
+def main(argv=None):  # pragma: no cover
+    """
+    Start, stop, or check the daemon.
+    """
+    import argparse  # pylint: disable=C0415
+
+    parser = argparse.ArgumentParser(
+        prog='python -m yaml_tools.daemon',
+        description='Manage the yaml-tools background daemon (used by --daemon).',
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--serve', action='store_true', help='Run the daemon')
+    group.add_argument('--stop', action='store_true', help='Stop the daemon')
+    group.add_argument('--status', action='store_true', help='Show daemon status')
+    args = parser.parse_args(argv)
+
+    if not supported():
+        parser.error('the daemon is not supported on this platform')
+    if args.serve:
+        idle = float(os.getenv('YAML_TOOLS_DAEMON_IDLE') or IDLE_TIMEOUT)
+        Daemon(socket_path(), idle).serve()
+        sys.exit(0)
+    pid = send_command('stop' if args.stop else 'status')
+    if pid is None:
+        print('yaml-tools daemon is not running')
+        sys.exit(1)
+    if args.status:
+        print(f'yaml-tools daemon is running (pid {pid})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+"""
+Persistent inverted index of a directory of YAML/JSON files for repeated
+``yagrep`` searches. The index records the keys and scalar values of each
+file with their path locations, plus the parsed document, so searches can
+skip files that cannot match and never re-parse unchanged files. XML
+files are not indexed; they are always searched live. Indexes
+are stored in the cache directory (see ``cache.get_cache_dir()``) and are
+updated incrementally based on file mtime, size, and content hash.
+"""
+
+import hashlib
+import os
+import pickle  # nosec B403
+import tempfile
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .cache import get_cache_dir
+from .matching import compile_matcher
+from .query import compile_query, is_container
+from .streaming import XML_EXTENSIONS
+from .utils import CACHE_EXTENSIONS, text_file_reader
+from .walk import walk_files
+
+# the files ``yagrep -r`` searches by default (only CACHE_EXTENSIONS files
+# are indexed)
+SEARCH_EXTENSIONS = CACHE_EXTENSIONS + XML_EXTENSIONS
+
+INDEX_NAME = 'index.pickle'
+INDEX_VERSION = 2
+
+
+def index_dir(dirpath: str, prog_opts: Dict) -> Path:
+    """
+    Get the index storage directory for the content directory ``dirpath``.
+
+    :param dirpath: content directory
+    :param prog_opts: configuration options
+    :returns: index directory path (may not exist yet)
+    """
+    ident = str(Path(dirpath).resolve()).encode('utf-8')
+    digest = hashlib.blake2b(ident, digest_size=10).hexdigest()
+    return get_cache_dir(prog_opts).joinpath('yagrep-index', digest)
+
+
+def index_files(dirpath: str, prog_opts: Optional[Dict] = None) -> List[Path]:
+    """
+    Get the list of files under ``dirpath`` that ``yagrep -r`` would
+    search by default, ie, YAML/JSON/XML files found by the same pruned
+    walk (with the ``walk_exclude`` and ``walk_gitignore`` settings), in
+    walk order.
+
+    :param dirpath: indexed directory
+    :param prog_opts: configuration options
+    :returns: list of file paths
+    """
+    prog_opts = prog_opts or {}
+    return [
+        Path(x)
+        for x in walk_files(
+            dirpath,
+            [f'*{ext}' for ext in SEARCH_EXTENSIONS],
+            prog_opts.get('walk_exclude'),
+            bool(prog_opts.get('walk_gitignore')),
+        )
+    ]
+
+
+def iter_locations(data: Any) -> Iterator[Tuple[Tuple, Any, bool]]:
+    """
+    Walk a parsed document and yield a (path, item, is_key) tuple for
+    every mapping key and every scalar value, where ``path`` is the key
+    path of the item.
+    """
+    stack: List[Tuple[Any, Tuple]] = [(data, ())]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                yield path + (key,), key, True
+                stack.append((value, path + (key,)))
+        elif is_container(node):
+            for idx, value in enumerate(node):
+                stack.append((value, path + (idx,)))
+        else:
+            yield path, node, False
+
+
+def tokens(item: Any) -> Set[str]:
+    """
+    Get the strings a ``yagrep`` filter could match for a key or scalar,
+    ie, its ``str()`` form.
+    """
+    return {str(item)}
+
+
+class GrepIndex:
+    """
+    Inverted index for one content directory. The ``files`` attribute
+    maps each relative file path to its entry (stat data, content digest,
+    and the keys and tokens of the file), and the ``keys`` and ``values``
+    attributes map each key, and each scalar token, to a dict of relative
+    file path to the list of key paths where it occurs. Parsed documents
+    are stored next to the index, one file per content digest.
+
+    :param dirpath: content directory
+    :param prog_opts: configuration options
+    """
+
+    def __init__(self, dirpath: str, prog_opts: Dict):
+        self.root = Path(dirpath).resolve()
+        self.prog_opts = prog_opts
+        self.path = index_dir(dirpath, prog_opts)
+        self.files: Dict[str, Dict] = {}
+        self.keys: Dict[Any, Dict[str, List[Tuple]]] = {}
+        self.values: Dict[str, Dict[str, List[Tuple]]] = {}
+
+    @classmethod
+    def load(cls, dirpath: str, prog_opts: Dict) -> 'GrepIndex':
+        """
+        Load the index for ``dirpath`` (or return an empty index if there
+        is none or it cannot be read).
+        """
+        index = cls(dirpath, prog_opts)
+        try:
+            with index.path.joinpath(INDEX_NAME).open('rb') as ifile:
+                data = pickle.load(ifile)  # nosec B301
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return index
+        if isinstance(data, dict) and data.get('version') == INDEX_VERSION:
+            index.files = data['files']
+            index.keys = data['keys']
+            index.values = data['values']
+        return index
+
+    @property
+    def exists(self) -> bool:
+        """
+        True if the index has been built.
+        """
+        return self.path.joinpath(INDEX_NAME).exists()
+
+    def _doc_path(self, digest: str) -> Path:
+        return self.path.joinpath('docs', f'{digest}.pickle')
+
+    def _add(self, relpath: str, stat: os.stat_result, digest: str, data: Any):
+        entry_keys: Set = set()
+        entry_tokens: Set[str] = set()
+        for loc, item, is_key in iter_locations(data):
+            if is_key:
+                entry_keys.add(item)
+                self.keys.setdefault(item, {}).setdefault(relpath, []).append(loc)
+            for token in tokens(item):
+                entry_tokens.add(token)
+                self.values.setdefault(token, {}).setdefault(relpath, []).append(loc)
+        self.files[relpath] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'digest': digest,
+            'keys': entry_keys,
+            'tokens': entry_tokens,
+        }
+
+    def _remove(self, relpath: str):
+        entry = self.files.pop(relpath)
+        for key in entry['keys']:
+            self.keys[key].pop(relpath, None)
+            if not self.keys[key]:
+                del self.keys[key]
+        for token in entry['tokens']:
+            self.values[token].pop(relpath, None)
+            if not self.values[token]:
+                del self.values[token]
+
+    def is_current(self, relpath: str, stat: Optional[os.stat_result] = None) -> bool:
+        """
+        Check whether the index entry for ``relpath`` matches the file on
+        disk (by mtime and size).
+        """
+        entry = self.files.get(relpath)
+        if entry is None:
+            return False
+        if stat is None:
+            try:
+                stat = self.root.joinpath(relpath).stat()
+            except OSError:
+                return False
+        return entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+
+    def update(self, debug: bool = False) -> Dict[str, int]:
+        """
+        Add new and changed files to the index and drop entries for files
+        that no longer exist, then save the index. Files with a new mtime
+        but the same content hash are not parsed again.
+
+        :param debug: print each file that gets (re)indexed
+        :returns: dict of ``files``, ``updated``, and ``removed`` counts
+        """
+        found = {}
+        for fpath in index_files(self.root, self.prog_opts):
+            if fpath.suffix in CACHE_EXTENSIONS:
+                found[fpath.relative_to(self.root).as_posix()] = fpath
+        removed = [x for x in self.files if x not in found]
+        for relpath in removed:
+            self._remove(relpath)
+
+        updated = 0
+        for relpath, fpath in found.items():
+            stat = fpath.stat()
+            if self.is_current(relpath, stat):
+                continue
+            digest = hashlib.blake2b(fpath.read_bytes(), digest_size=20).hexdigest()
+            entry = self.files.get(relpath)
+            if entry and entry['digest'] == digest:
+                entry['mtime_ns'] = stat.st_mtime_ns
+                continue
+            if debug:
+                print(f'Indexing {fpath}')
+            try:
+                data = text_file_reader(fpath, self.prog_opts)
+            except Exception as exc:  # pylint: disable=W0703
+                print(f'{type(exc).__name__}: {exc} => {fpath} Skipping...')
+                if entry:
+                    self._remove(relpath)
+                continue
+            if entry:
+                self._remove(relpath)
+            self._add(relpath, stat, digest, data)
+            self._write(self._doc_path(digest), data)
+            updated += 1
+
+        self.save()
+        return {'files': len(self.files), 'updated': updated, 'removed': len(removed)}
+
+    def _write(self, path: Path, data: Any):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            'wb', dir=path.parent, suffix='.tmp', delete=False
+        ) as tfile:
+            pickle.dump(data, tfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tfile.name, path)
+
+    def save(self):
+        """
+        Write the index (atomically) and remove stored documents that are
+        no longer referenced.
+        """
+        data = {
+            'version': INDEX_VERSION,
+            'files': self.files,
+            'keys': self.keys,
+            'values': self.values,
+        }
+        self._write(self.path.joinpath(INDEX_NAME), data)
+        digests = {x['digest'] for x in self.files.values()}
+        docs_dir = self.path.joinpath('docs')
+        if docs_dir.is_dir():
+            for doc in docs_dir.glob('*.pickle'):
+                if doc.stem not in digests:
+                    doc.unlink(missing_ok=True)
+
+    def document(self, relpath: str) -> Any:
+        """
+        Get the stored parsed document for ``relpath``.
+
+        :raises OSError: if the document cannot be read
+        """
+        digest = self.files[relpath]['digest']
+        with self._doc_path(digest).open('rb') as dfile:
+            return pickle.load(dfile)  # nosec B301
+
+    def find_key(self, key: Any) -> Dict[str, List[Tuple]]:
+        """
+        Get the locations of ``key`` as a dict of relative file path to
+        list of key paths.
+        """
+        return self.keys.get(key, {})
+
+    def find_value(self, text: str) -> Dict[str, List[Tuple]]:
+        """
+        Get the locations of keys and scalar values containing ``text`` as
+        a dict of relative file path to list of key paths.
+        """
+        return self.find_matching(lambda token: text in token)
+
+    def find_matching(self, matcher: Callable[[str], bool]) -> Dict[str, List[Tuple]]:
+        """
+        Get the locations of keys and scalar values whose string form
+        satisfies ``matcher`` as a dict of relative file path to list of
+        key paths.
+        """
+        found: Dict[str, Dict[Tuple, None]] = {}
+        for token, files in self.values.items():
+            if matcher(token):
+                for relpath, locs in files.items():
+                    found.setdefault(relpath, {}).update(dict.fromkeys(locs))
+        return {relpath: list(locs) for relpath, locs in found.items()}
+
+    def candidates(
+        self,
+        text: str,
+        mode: str,
+        separator: str = '/',
+        matcher: Optional[Callable[[str], bool]] = None,
+    ) -> Optional[Set[str]]:
+        """
+        Get the set of indexed files that may have results for a search,
+        or None if every file needs to be searched. For path searches the
+        files must have all of the literal (non-numeric) keys in the glob;
+        for filter searches they must have a key or scalar value that
+        satisfies ``matcher`` (default is a substring match for ``text``).
+
+        :param text: search text
+        :param mode: one of ``path``, ``filter``, or ``lookup``
+        :param separator: path separator for path searches
+        :param matcher: filter predicate for key and value strings
+        :returns: set of relative file paths or None
+        """
+        if mode == 'lookup':
+            return set(self.find_key(text))
+        if mode == 'filter':
+            return set(self.find_matching(matcher or compile_matcher([text])))
+        query = compile_query(text, separator)
+        literals = [
+            literal
+            for _, literal, gint in query.prefix + (query.suffix or [])
+            if literal is not None and gint is None and literal not in ('True', 'False')
+        ]
+        if not literals:
+            return None
+        found = set(self.files)
+        for literal in literals:
+            found.intersection_update(self.find_key(literal))
+        return found
@@ -0,0 +1,106 @@
+"""
+Round-trip support for the Jinja macro calls (``{{{ ... }}}``) used in
+SSG content files. An unquoted scalar that starts with ``{{{`` is not
+valid YAML (it starts a flow mapping), so the scanner reads it as a plain
+scalar instead, and the emitter writes it back unquoted. This works on
+the tokens as they are scanned, so the file text is not rewritten before
+loading or after dumping.
+
+Only block context is handled; a macro in flow context, eg::
+
+  key: [{{{ macro }}}, other]
+
+is still read as a (nested) flow mapping. The round-trip loader keeps
+it as such, but the safe loader used by ``yasort --check`` fails with
+"found unhashable key".
+"""
+
+from functools import lru_cache
+from typing import Any, Optional
+
+JINJA_START = '{{{'
+
+
+class JinjaScalar(str):
+    """
+    Plain scalar that starts with a Jinja macro call.
+    """
+
+    __slots__ = ()
+
+
+class JinjaScannerMixin:
+    """
+    Scanner mixin; in block context, ``{{{`` starts a plain scalar.
+    """
+
+    def fetch_flow_mapping_start(self):
+        """
+        Fetch a Jinja plain scalar, or the start of a flow mapping.
+        """
+        if self.flow_level or self.reader.prefix(3) != JINJA_START:
+            return super().fetch_flow_mapping_start()
+        from ruamel.yaml.tokens import (  # pylint: disable=C0415
+            ScalarToken,
+        )
+
+        count = len(self.tokens)
+        self.fetch_plain()
+        for token in self.tokens[count:]:
+            if isinstance(token, ScalarToken):
+                token.value = JinjaScalar(token.value)
+        return None
+
+
+class JinjaEmitterMixin:
+    """
+    Emitter mixin; Jinja scalars are written unquoted in block context if
+    the rest of the scalar allows it.
+    """
+
+    def analyze_scalar(self, scalar):
+        """
+        Analyze a scalar, ignoring the leading brace of Jinja scalars.
+        """
+        if not isinstance(scalar, JinjaScalar) or self.flow_level:
+            return super().analyze_scalar(scalar)
+        analysis = super().analyze_scalar('x' + scalar[1:])
+        analysis.scalar = scalar
+        analysis.allow_flow_plain = False
+        return analysis
+
+
+def represent_jinja(representer, data):
+    """
+    Represent a Jinja scalar as a plain string.
+    """
+    return representer.represent_scalar('tag:yaml.org,2002:str', data)
+
+
+@lru_cache(maxsize=None)
+def _jinja_type(base: type, mixin: Optional[type] = None) -> type:
+    """
+    Create (once) a Jinja subclass of a ruamel.yaml class, with the mixin
+    (if any) and the Jinja scalar representer (for representers).
+    """
+    bases = (base,) if mixin is None else (mixin, base)
+    cls = type(f'Jinja{base.__name__}', bases, {'__module__': __name__})
+    if hasattr(cls, 'add_representer'):
+        cls.add_representer(JinjaScalar, represent_jinja)
+    return cls
+
+
+def jinja_yaml(yaml: Any) -> Any:
+    """
+    Enable Jinja scalars on a pure Python ``ruamel.yaml.YAML`` instance
+    (before it is first used).
+
+    :param yaml: YAML instance
+    :returns: the same instance
+    """
+    from ruamel.yaml.scanner import Scanner  # pylint: disable=C0415
+
+    yaml.Scanner = _jinja_type(yaml.Scanner or Scanner, JinjaScannerMixin)
+    yaml.Emitter = _jinja_type(yaml.Emitter, JinjaEmitterMixin)
+    yaml.Representer = _jinja_type(yaml.Representer)
+    return yaml
@@ -0,0 +1,321 @@
+"""
+Incremental build manifest for the file conversion tools. A manifest in
+each output directory records, for every output file, the input it was
+built from, the config used, and the hash of the output, so unchanged
+inputs can be skipped without parsing them.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Optional, Tuple, Union
+
+MANIFEST_NAME = '.yaml-tools-manifest.json'
+MANIFEST_VERSION = 1
+
+Record = Tuple[str, str, Dict[str, Any]]
+
+
+CHUNK_SIZE = 1 << 16
+DIGEST_SIZE = 20
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Get the hex digest used for manifest hashes.
+    """
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def config_digest(tool: str, prog_opts: Dict) -> str:
+    """
+    Hash the tool name, package version, and configuration options, so
+    any change to how outputs are built invalidates the manifest entries.
+
+    :param tool: tool name
+    :param prog_opts: configuration options
+    :returns: hex digest
+    """
+    from .utils import VERSION  # pylint: disable=C0415
+
+    ident = json.dumps(
+        [MANIFEST_VERSION, tool, VERSION, prog_opts], sort_keys=True, default=str
+    )
+    return hash_bytes(ident.encode('utf-8'))
+
+
+def _file_state(path: Path, digest: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the size, mtime and (if not given) content hash of a file.
+    """
+    stat = path.stat()
+    if digest is None:
+        digest = hash_bytes(path.read_bytes())
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+
+
+def _same_file(path: Path, state: Optional[Dict[str, Any]]) -> bool:
+    """
+    Check a file against its recorded state; the content is only hashed
+    if the size matches but the mtime does not.
+    """
+    if not state:
+        return False
+    try:
+        stat = path.stat()
+        if stat.st_size != state['size']:
+            return False
+        if stat.st_mtime_ns == state['mtime_ns']:
+            return True
+        return hash_bytes(path.read_bytes()) == state['hash']
+    except OSError:
+        return False
+
+
+def write_output(path: Union[str, Path], data: str, encoding: str = 'utf-8') -> bool:
+    """
+    Write ``data`` to ``path`` only if the file content would change; the
+    new file is written to a temporary file and renamed into place.
+
+    :param path: output file path
+    :param data: output text
+    :param encoding: output file encoding
+    :returns: True if the file was written
+    """
+    path = Path(path)
+    raw = data.encode(encoding)
+    try:
+        if path.stat().st_size == len(raw) and path.read_bytes() == raw:
+            return False
+    except OSError:
+        pass
+    with _temp_file(path) as tfile:
+        tfile.write(raw)
+    _replace_file(tfile.name, path)
+    return True
+
+
+def _temp_file(path: Path) -> IO[bytes]:
+    """
+    Create a temporary file in the directory of ``path``.
+    """
+    return tempfile.NamedTemporaryFile(  # pylint: disable=R1732
+        'wb', dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp', delete=False
+    )
+
+
+def _replace_file(tmpname: str, path: Path) -> None:
+    """
+    Rename a temporary file to ``path``, with the mode of the file it
+    replaces (or the default mode for new files); the temporary file is
+    removed on errors.
+    """
+    try:
+        if path.exists():
+            os.chmod(tmpname, path.stat().st_mode & 0o7777)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmpname, 0o666 & ~umask)
+        os.replace(tmpname, path)
+    except OSError:
+        os.unlink(tmpname)
+        raise
+
+
+class OutputFile:
+    """
+    Text output stream for ``write_output()`` style output that does not
+    need the whole output in memory. Use as a context manager; the text
+    is written to a temporary file, and on exit it is renamed into place
+    only if the content changed (or removed if there was an error or the
+    output was discarded). The content hash is available after exit.
+
+    :param path: output file path
+    :param encoding: output file encoding
+    """
+
+    def __init__(self, path: Union[str, Path], encoding: str = 'utf-8'):
+        self.path = Path(path)
+        self.encoding = encoding
+        self.changed = False
+        self.digest: Optional[str] = None
+        self._discard = False
+        self._tmpname = ''
+        self._stream: IO[str] = io.StringIO()
+
+    def __enter__(self) -> 'OutputFile':
+        tfile = _temp_file(self.path)
+        self._tmpname = tfile.name
+        self._stream = io.TextIOWrapper(tfile, encoding=self.encoding)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stream.close()
+        if exc_type is not None or self._discard:
+            os.unlink(self._tmpname)
+        elif self._compare(Path(self._tmpname)):
+            os.unlink(self._tmpname)
+        else:
+            _replace_file(self._tmpname, self.path)
+            self.changed = True
+
+    def write(self, data: str) -> int:
+        """
+        Write text to the output.
+        """
+        return self._stream.write(data)
+
+    def discard(self) -> None:
+        """
+        Drop the output on exit (any existing file is left alone).
+        """
+        self._discard = True
+
+    def _compare(self, tmppath: Path) -> bool:
+        """
+        Hash the new content and check whether the output file already
+        has it, reading both files in chunks.
+        """
+        hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        try:
+            old: Optional[IO[bytes]] = self.path.open('rb')
+            same = self.path.stat().st_size == tmppath.stat().st_size
+        except OSError:
+            old, same = None, False
+        with tmppath.open('rb') as new:
+            for chunk in iter(lambda: new.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                if same and old is not None:
+                    same = old.read(len(chunk)) == chunk
+        if old is not None:
+            old.close()
+        self.digest = hasher.hexdigest()
+        return same
+
+
+class BuildManifest:
+    """
+    Manifest of the outputs built into one directory, stored as JSON in
+    ``MANIFEST_NAME``. Entries are keyed by output file name; an output is
+    current if its input and the config are unchanged and the output file
+    is still the one that was written (or, for an input that produced no
+    output, there is still no output file). A missing or unreadable
+    manifest is treated as empty.
+
+    :param outdir: output directory
+    :param config: config digest (see ``config_digest()``)
+    """
+
+    def __init__(self, outdir: Union[str, Path], config: str):
+        self.outdir = Path(outdir)
+        self.path = self.outdir.joinpath(MANIFEST_NAME)
+        self.config = config
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(
+        cls, outdir: Union[str, Path], tool: str, prog_opts: Dict
+    ) -> 'BuildManifest':
+        """
+        Load the manifest for ``outdir`` (if any).
+
+        :param outdir: output directory
+        :param tool: tool name
+        :param prog_opts: configuration options
+        :returns: manifest
+        """
+        manifest = cls(outdir, config_digest(tool, prog_opts))
+        try:
+            data = json.loads(manifest.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return manifest
+        if isinstance(data, dict) and data.get('version') == MANIFEST_VERSION:
+            manifest.entries = data.get('entries') or {}
+        return manifest
+
+    def is_current(self, inpath: Path, outpath: Path) -> bool:
+        """
+        Check whether ``outpath`` is up to date for ``inpath``.
+
+        :param inpath: input file path
+        :param outpath: output file path
+        :returns: True if the output does not need to be rebuilt
+        """
+        entry = self.entries.get(outpath.name)
+        if not (
+            entry
+            and entry['config'] == self.config
+            and entry['input'] == str(inpath.resolve())
+            and _same_file(inpath, entry['input_state'])
+        ):
+            return False
+        if entry['output_state'] is None:
+            return not outpath.exists()
+        return _same_file(outpath, entry['output_state'])
+
+    @staticmethod
+    def input_state(inpath: Path) -> Dict[str, Any]:
+        """
+        Get the current state of an input file, to be passed to
+        ``record()``; call this before the input is read, so a change
+        made while it is processed is not recorded as built.
+
+        :param inpath: input file path
+        :returns: input file state
+        """
+        return _file_state(inpath)
+
+    def record(
+        self,
+        inpath: Path,
+        outpath: Path,
+        data: Optional[bytes] = None,
+        digest: Optional[str] = None,
+        input_state: Optional[Dict[str, Any]] = None,
+    ) -> Record:
+        """
+        Build the manifest record for an output that was just written
+        (or found unchanged); use ``update()`` to add it to a manifest.
+        If neither ``data`` nor ``digest`` is given, the input produced
+        no output and is current as long as ``outpath`` does not exist.
+
+        :param inpath: input file path
+        :param outpath: output file path
+        :param data: output file content
+        :param digest: output file hash (instead of ``data``, eg, from
+                       an ``OutputFile``)
+        :param input_state: input state from ``input_state()`` taken
+                            before the input was read (default is the
+                            current state)
+        :returns: tuple of output directory, output name, and entry
+        """
+        if digest is None and data is not None:
+            digest = hash_bytes(data)
+        entry = {
+            'input': str(inpath.resolve()),
+            'input_state': input_state or _file_state(inpath),
+            'config': self.config,
+            'output_state': (None if digest is None else _file_state(outpath, digest)),
+        }
+        return str(self.outdir), outpath.name, entry
+
+    def update(self, records: Iterable[Optional[Record]]) -> None:
+        """
+        Add the records (eg, returned by parallel jobs) for this manifest
+        directory and write the manifest (atomically) if anything changed.
+
+        :param records: records from ``record()`` (None is ignored)
+        """
+        changed = False
+        for rec in records:
+            if rec is None or Path(rec[0]) != self.outdir:
+                continue
+            self.entries[rec[1]] = rec[2]
+            changed = True
+        if changed:
+            data = {'version': MANIFEST_VERSION, 'entries': self.entries}
+            write_output(self.path, json.dumps(data, indent=1, sort_keys=True))
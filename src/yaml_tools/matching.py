@@ -0,0 +1,102 @@
+"""
+Text matchers for ``yagrep`` filter searches; a matcher is a predicate
+that checks whether a string contains any of a set of patterns.
+"""
+
+import re
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+# below this many patterns, repeated ``in`` checks beat the automaton
+AC_MIN_PATTERNS = 8
+
+Matcher = Callable[[str], bool]
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton for finding any of a set of substrings in a
+    single pass over the text, independent of the number of patterns.
+
+    :param patterns: non-empty substrings to look for
+    :raises ValueError: if there are no patterns or any is empty
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(dict.fromkeys(patterns))
+        if not self.patterns or not all(self.patterns):
+            raise ValueError('patterns must be non-empty strings')
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Optional[str]] = [None]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(None)
+                state = nxt
+            self.out[state] = pattern
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[nxt] = self.goto[fail].get(char, 0)
+                if self.out[nxt] is None:
+                    self.out[nxt] = self.out[self.fail[nxt]]
+
+    def find(self, text: str) -> Optional[str]:
+        """
+        Get the first pattern (by end position) found in ``text``, or None.
+        """
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state] is not None:
+                return out[state]
+        return None
+
+    def __call__(self, text: str) -> bool:
+        return self.find(text) is not None
+
+
+def compile_matcher(patterns: Iterable[str], regex: bool = False) -> Matcher:
+    """
+    Build a predicate that is True if a string contains any of
+    ``patterns`` (or matches any of them with ``re.search()`` if
+    ``regex`` is True). Plain substring patterns use ``in`` checks for a
+    few patterns and an Aho-Corasick automaton for many.
+
+    :param patterns: search patterns
+    :param regex: treat patterns as regular expressions
+    :returns: matcher predicate
+    :raises ValueError: if there are no patterns
+    :raises re.error: if a regex pattern is invalid
+    """
+    patterns = list(dict.fromkeys(patterns))
+    if not patterns:
+        raise ValueError('no search patterns')
+    if regex:
+        return re.compile('|'.join(f'(?:{x})' for x in patterns)).search  # type: ignore
+    if '' in patterns:
+        return lambda text: True
+    if len(patterns) == 1:
+        pattern = patterns[0]
+        return lambda text: pattern in text
+    if len(patterns) < AC_MIN_PATTERNS:
+        return lambda text: any(x in text for x in patterns)
+    return AhoCorasick(patterns)
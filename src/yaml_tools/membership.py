@@ -0,0 +1,177 @@
+"""
+Bitmap-based control ID set membership engine.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from .templates import ControlId
+
+
+def id_key(string: str) -> Any:
+    """
+    Membership key for an ID string; control IDs in either format (and
+    with or without zero padding) map to the same interned ``ControlId``,
+    anything else is used as-is.
+
+    :param string: id string
+    :returns: hashable key
+    """
+    try:
+        return ControlId(string)
+    except ValueError:
+        return string
+
+
+def popcount(bitmap: int) -> int:
+    """
+    Count the set bits in ``bitmap``.
+    """
+    try:
+        return bitmap.bit_count()  # type: ignore[attr-defined]
+    except AttributeError:  # pragma: no cover
+        return bin(bitmap).count('1')
+
+
+class IdMembership:
+    """
+    Membership engine that gives every known ID a dense integer position
+    and stores each named ID set as a bitmap (a Python int with bit N set
+    if ID N is a member). Intersections, differences, subset checks and
+    counts across any number of sets are then simple integer operations.
+
+    IDs are matched as exact strings by default (same as plain sets); set
+    ``fold_ids`` to match control IDs in either format with ``id_key``.
+    Set names can be any hashable value.
+
+    :param ids: optional iterable of initial ID strings
+    :param fold_ids: match both control ID spellings as one ID
+    """
+
+    def __init__(self, ids: Iterable[str] = (), fold_ids: bool = False):
+        self.ids: List[str] = []
+        self.positions: Dict[Any, int] = {}
+        self.sets: Dict[Hashable, int] = {}
+        self.key = id_key if fold_ids else str
+        for string in ids:
+            self.position(string)
+
+    @classmethod
+    def from_profile_index(cls, fold_ids: bool = False) -> 'IdMembership':
+        """
+        Create an engine preloaded with the packaged NIST profile ID sets
+        (named HIGH, MODERATE, LOW, and PRIVACY) from the profile index.
+
+        :param fold_ids: match both control ID spellings as one ID
+        """
+        from .profile_index import (  # pylint: disable=C0415
+            load_profile_index,
+        )
+
+        id_index = load_profile_index()
+        engine = cls(id_index['ids'], fold_ids=fold_ids)
+        for ptype, pdata in id_index['profiles'].items():
+            engine.sets[ptype] = pdata['mask']
+        return engine
+
+    def position(self, string: str) -> int:
+        """
+        Get the position of ``string``, adding it if it is a new ID.
+        """
+        key = self.key(string)
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.positions[key] = len(self.ids)
+            self.ids.append(string)
+        return pos
+
+    def respell(self, strings: Iterable[str]) -> List[str]:
+        """
+        Map each string to the first spelling in the engine of the same
+        control ID (see ``id_key``), eg, to compare input IDs against the
+        profile sets of an exact-match engine. Unknown IDs are kept as-is.
+        """
+        spellings: Dict[Any, str] = {}
+        for string in reversed(self.ids):
+            spellings[id_key(string)] = string
+        return [spellings.get(id_key(x), x) for x in strings]
+
+    def bitmap(self, strings: Iterable[str]) -> int:
+        """
+        Get the bitmap for an iterable of ID strings.
+        """
+        bitmap = 0
+        for string in strings:
+            bitmap |= 1 << self.position(string)
+        return bitmap
+
+    def add_set(self, name: Hashable, strings: Iterable[str]) -> int:
+        """
+        Add (or replace) a named ID set and return its bitmap.
+        """
+        self.sets[name] = self.bitmap(strings)
+        return self.sets[name]
+
+    def contains(self, bitmap: int, string: str) -> bool:
+        """
+        Check whether ``string`` is a member of ``bitmap``.
+        """
+        pos = self.positions.get(self.key(string))
+        return pos is not None and bool(bitmap >> pos & 1)
+
+    def members(self, bitmap: int) -> List[str]:
+        """
+        Get the member ID strings of ``bitmap`` in position order, ie, the
+        order the IDs were first added to the engine (not sorted, and not
+        the order of any one set). With ``fold_ids``, the first spelling
+        seen for each ID is used.
+        """
+        members = []
+        while bitmap:
+            low = bitmap & -bitmap
+            pos = low.bit_length() - 1
+            members.append(self.ids[pos])
+            bitmap ^= low
+        return members
+
+    def compare(self, name: Hashable, other: Hashable) -> Dict:
+        """
+        Compare the ``name`` set against the ``other`` set.
+
+        :returns: dict with ``size`` and ``other_size`` (set sizes),
+                  ``common`` and ``missing`` (bitmaps of the ``name``
+                  members in and not in ``other``), ``num_common`` and
+                  ``num_missing`` (counts), and ``subset`` (True if all
+                  ``name`` members are in ``other``)
+        """
+        bits = self.sets[name]
+        other_bits = self.sets[other]
+        common = bits & other_bits
+        missing = bits & ~other_bits
+        return {
+            'size': popcount(bits),
+            'other_size': popcount(other_bits),
+            'common': common,
+            'missing': missing,
+            'num_common': popcount(common),
+            'num_missing': popcount(missing),
+            'subset': missing == 0,
+        }
+
+    def matrix(
+        self,
+        inputs: Iterable[Hashable],
+        profiles: Optional[Iterable[Hashable]] = None,
+    ) -> Dict[Hashable, Dict[Hashable, Dict]]:
+        """
+        Compare each of the named ``inputs`` sets against each of the
+        ``profiles`` sets (default is all sets not in ``inputs``).
+
+        :param inputs: names of input sets
+        :param profiles: names of profile sets
+        :returns: nested dict of input name => profile name => ``compare()``
+        """
+        inputs = list(inputs)
+        if profiles is None:
+            profiles = [x for x in self.sets if x not in inputs]
+        profiles = list(profiles)
+        return {x: {y: self.compare(x, y) for y in profiles} for x in inputs}
@@ -3,31 +3,36 @@ The main init, run, and self-test functions for oscal extract.
 """
 
 import argparse
-import csv
 import importlib
 import sys
 from argparse import Namespace
 from collections import deque
 from pathlib import Path
-from typing import Deque, Dict, List, Tuple
+from typing import Deque, Dict, List, Optional, Tuple
 
 from munch import Munch
-from natsort import os_sorted
 
-from nested_lookup import nested_lookup
-
-from .templates import xform_id
+from .cache import clear_cache
+from .membership import IdMembership
+from .query import collect_keys
+from .templates import id_sort_key, xform_id, xform_ids
 from .utils import (
+    PROFILE_NAMES,
     VERSION,
     FileTypeError,
     SortedSet,
     get_filelist,
+    get_loader_backend,
     load_config,
+    output_stream,
     text_file_reader,
 )
 
 # pylint: disable=R0801
 
+INPUT_SET = 'input'
+PROFILE_INPUT_SET = 'input-profile'
+
 
 def csv_append_id_data(
     in_ids: List, prog_opts: Dict, uargs: Namespace
@@ -36,6 +41,8 @@ def csv_append_id_data(
     Append/update column data using ID sets and write a new csv file using
     the given filename with ``.modified`` appended to the filename stem.
     """
+    import csv  # pylint: disable=C0415
+
     mpath = Path(uargs.munge)
     opath = (
         Path(prog_opts['new_csv_file'])
@@ -81,21 +88,41 @@ def csv_row_match(in_ids: List, ctl: List) -> List:
     return ctl
 
 
+def content_id(value: str) -> bool:
+    """
+    Predicate for control IDs in (lowercase) content files, eg, ``ac-2.1``.
+    """
+    return value.islower() and '_' not in value and '-' in value
+
+
+def ssg_id(value: str) -> bool:
+    """
+    Predicate for control IDs in (uppercase) SSG control files.
+    """
+    return value.isupper()
+
+
 def load_input_data(
-    filepath: Path, prog_opts: Dict, use_ssg: bool = False, debug: bool = False
+    filepath: Path,
+    prog_opts: Dict,
+    use_ssg: bool = False,
+    debug: bool = False,
+    errors: Optional[List] = None,
 ) -> Tuple[List, Deque, Deque]:
     """
     Find and gather the inputs, ie, content file(s) and user control IDs,
     into a tuple of lists (id_list, file_tuple_list). Load up the queues
     and return a tuple of both queues and the list of normalized user IDs
-    from ``filepath``.
+    from ``filepath``. Content files that cannot be read are reported and
+    skipped (and appended to ``errors`` if given).
     """
     id_queue: Deque = deque()
     ctl_queue: Deque = deque()
     file_tuples: List = []
+    lookup_key = prog_opts['default_lookup_key']
     in_list = text_file_reader(filepath, prog_opts)
 
-    in_ids = [xform_id(x) for x in in_list] if in_list[0].islower() else in_list
+    in_ids = xform_ids(in_list) if in_list[0].islower() else in_list
     if debug:
         print(f'Normalized input Ids: {in_ids}')
 
@@ -110,6 +137,8 @@ def load_input_data(
         prog_opts['default_content_path'],
         prog_opts['default_profile_glob'],
         debug,
+        exclude=prog_opts.get('walk_exclude'),
+        gitignore=prog_opts.get('walk_gitignore', False),
     )
 
     for file in ctl_files:
@@ -125,19 +154,22 @@ def load_input_data(
             indata = text_file_reader(Path(path[0]), prog_opts)
         except FileTypeError as exc:
             print(f'{exc} => {Path(path[0])}')
-
-        if not use_ssg:
-            path_ids = [
-                xform_id(x)
-                for x in nested_lookup('id', indata)
-                if x.islower() and '_' not in x and '-' in x
-            ]
-        else:
-            path_ids = [x for x in nested_lookup('id', indata) if x.isupper()]
+            if errors is not None:
+                errors.append(path[0])
+            continue
+
+        # one walk per file for both the IDs and the controls
+        found = collect_keys(
+            indata,
+            ['id', lookup_key],
+            predicates={'id': ssg_id if use_ssg else content_id},
+            limits={lookup_key: 1},
+        )
+        path_ids = found['id'] if use_ssg else xform_ids(found['id'])
 
         id_queue.append((path[1], path_ids))
 
-        for ctl_id in nested_lookup(prog_opts['default_lookup_key'], indata)[0]:
+        for ctl_id in found[lookup_key][0]:
             ctl_queue.append((ctl_id['id'], ctl_id))
 
     if debug:
@@ -155,14 +187,21 @@ def munge_file(filepath: Path, prog_opts: Dict, uargs: Namespace):
     csv_append_id_data(input_ids, prog_opts=prog_opts, uargs=uargs)
 
 
-def process_data(filepath: Path, prog_opts: Dict, uargs: Namespace):
+def process_data(
+    filepath: Path, prog_opts: Dict, uargs: Namespace, errors: Optional[List] = None
+):
     """
-    Process inputs, print some output.
+    Process inputs, print some output. The control report is written to
+    ``output_path`` if set in the config, otherwise to stdout. Controls are
+    reported in content file order. Content files that cannot be read are
+    appended to ``errors`` if given.
     """
     input_ids, id_queue, ctl_queue = load_input_data(
-        filepath, prog_opts, use_ssg=uargs.ssg, debug=uargs.verbose
+        filepath, prog_opts, use_ssg=uargs.ssg, debug=uargs.verbose, errors=errors
     )
-    in_list, _ = id_set_match(input_ids, id_queue, uargs=uargs)
+    engine = IdMembership.from_profile_index()
+    in_list, _ = id_set_match(input_ids, id_queue, uargs=uargs, engine=engine)
+    in_bits = engine.bitmap(in_list)
 
     if not uargs.quiet:
         print(f'\nControl queue has {len(ctl_queue)} items')
@@ -170,10 +209,11 @@ def process_data(filepath: Path, prog_opts: Dict, uargs: Namespace):
     rpt_attr = uargs.attribute if uargs.attribute else prog_opts['default_control_attr']
     if uargs.verbose:
         print(f'Checking input IDs: {in_list}')
-    print(f'\nID;{rpt_attr}')
-    for ctl in ctl_queue:
-        if ctl[0] in in_list:
-            print(f'{ctl[0]};{ctl[1][rpt_attr]}')
+    with output_stream(prog_opts) as ostream:
+        ostream.write(f'\nID;{rpt_attr}\n')
+        for ctl in ctl_queue:
+            if engine.contains(in_bits, ctl[0]):
+                ostream.write(f'{ctl[0]};{ctl[1][rpt_attr]}\n')
 
 
 def ssg_ctrl_from_nist(in_id: str, prog_opts: Dict, uargs: Munch):
@@ -184,46 +224,79 @@ def ssg_ctrl_from_nist(in_id: str, prog_opts: Dict, uargs: Munch):
     raise NotImplementedError()
 
 
-def id_set_match(in_ids: List, id_q: Deque, uargs: Namespace) -> Tuple[List, List]:
+def id_set_match(
+    in_ids: List,
+    id_q: Deque,
+    uargs: Namespace,
+    engine: Optional[IdMembership] = None,
+) -> Tuple[List, List]:
     """
-    Quick set match analysis of ID sets.
+    Quick set match analysis of ID sets. All of the ID sets (input IDs,
+    content file IDs, and the packaged NIST profiles) are loaded into one
+    bitmap membership engine and compared in a single matrix. Content file
+    sets are keyed by queue position, so files with the same name (or a
+    name like ``HIGH``) are kept apart. IDs are matched as exact strings;
+    only the NIST profile summary matches the input IDs in either spelling.
+    The returned lists keep the (string) sort order of the input ID set,
+    not the ``id_sort_key`` order used for the ``--sort`` output.
+
+    :param in_ids: input ID list
+    :param id_q: queue of (filename, ID list) tuples, one per content file
+    :param uargs: parsed cmd args
+    :param engine: membership engine to use (default is a new engine with
+                   the packaged NIST profiles)
+    :returns: tuple of input IDs in and not in the (last) content file
     """
+    if engine is None:
+        engine = IdMembership.from_profile_index()
     in_set = SortedSet(in_ids)
+    engine.add_set(PROFILE_INPUT_SET, engine.respell(in_set))
+    engine.add_set(INPUT_SET, in_set)
     q_size = len(id_q)
+    pnames: List = []
 
-    for _ in range(q_size):
+    for idx in range(q_size):
         pname, id_list = id_q.popleft()
-        if uargs.verbose:
-            print(f"\n{pname} control IDs -> {len(id_list)}")
-        id_set = SortedSet(id_list)
+        engine.add_set(idx, id_list)
+        pnames.append(pname)
 
+    matrix = engine.matrix(
+        [INPUT_SET, PROFILE_INPUT_SET], list(range(q_size)) + PROFILE_NAMES
+    )
+    common_set: List = []
+    not_in_set: List = list(in_set)
+
+    for idx, pname in enumerate(pnames):
+        result = matrix[INPUT_SET][idx]
+        common_set = [x for x in in_set if engine.contains(result['common'], x)]
+        not_in_set = [x for x in in_set if engine.contains(result['missing'], x)]
         if uargs.verbose:
-            print(f"Input set is in {pname} set: {id_set > in_set}")
-        common_set = id_set & in_set
-        if uargs.verbose:
-            print(f"Num input controls in {pname} set -> {len(common_set)}")
-        not_in_set = in_set - id_set
-        if uargs.verbose:
-            print(f"Num input controls not in {pname} set -> {len(not_in_set)}")
-            print(f"Input control IDs not in {pname} set: {list(not_in_set)}")
+            print(f"\n{pname} control IDs -> {result['other_size']}")
+            is_in = result['subset'] and result['other_size'] > result['size']
+            print(f"Input set is in {pname} set: {is_in}")
+            print(f"Num input controls in {pname} set -> {result['num_common']}")
+            print(f"Num input controls not in {pname} set -> {result['num_missing']}")
+            print(f"Input control IDs not in {pname} set: {not_in_set}")
+
+    if uargs.verbose:
+        print('\nNIST profile;num in;num not in')
+        for ptype in PROFILE_NAMES:
+            result = matrix[PROFILE_INPUT_SET][ptype]
+            print(f"{ptype};{result['num_common']};{result['num_missing']}")
 
     # this requires a single filename in the search glob resulting in a control
     # ID queue size of 1 (as well as the sort-ids argument)
     if q_size == 1 and uargs.sort:
-        sort_in = (
-            [xform_id(x) for x in common_set] if in_ids[0].isupper() else common_set
-        )
-        sort_out = (
-            [xform_id(x) for x in not_in_set] if in_ids[0].isupper() else not_in_set
-        )
+        sort_in = xform_ids(common_set) if in_ids[0].isupper() else common_set
+        sort_out = xform_ids(not_in_set) if in_ids[0].isupper() else not_in_set
         print(f'\nInput IDs in {pname}:')
-        for ctl in os_sorted(sort_in):
+        for ctl in sorted(sort_in, key=id_sort_key):
             print(ctl)
         print(f'\nInput IDs not in {pname}:')
-        for ctl in os_sorted(sort_out):
+        for ctl in sorted(sort_out, key=id_sort_key):
             print(ctl)
 
-    return list(common_set), list(not_in_set)
+    return common_set, not_in_set
 
 
 def self_test(ucfg: Munch):
@@ -231,6 +304,10 @@ def self_test(ucfg: Munch):
     Basic sanity check using ``import_module``.
     """
     print("Python version:", sys.version)
+    try:
+        print("YAML loader backend:", get_loader_backend(ucfg))
+    except ValueError as exc:
+        print(f"  {repr(exc)}")
     print("-" * 80)
 
     modlist = ['yaml_tools.__init__', 'yaml_tools.oscal', 'yaml_tools.utils']
@@ -263,6 +340,10 @@ def main(argv=None):  # pragma: no cover
     """
     if argv is None:
         argv = sys.argv
+    if '--daemon' in argv[1:]:
+        from .daemon import client_main  # pylint: disable=C0415
+
+        client_main(Path(__file__).stem, argv)
 
     cfg, pfile = load_config(Path(__file__).stem)
     popts = Munch.toDict(cfg)
@@ -271,7 +352,16 @@ def main(argv=None):  # pragma: no cover
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         description='Extract data from OSCAL or SSG content sources',
     )
-    parser.add_argument('--version', action="version", version=f"%(prog)s {VERSION}")
+    parser.add_argument(
+        '--version',
+        action="version",
+        version=f"%(prog)s {VERSION} (yaml loader: {get_loader_backend(popts)})",
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run in the background daemon (started on demand) to save startup time',
+    )
     parser.add_argument(
         '-t', '--test', help='run sanity checks and exit', action='store_true'
     )
@@ -333,6 +423,18 @@ def main(argv=None):  # pragma: no cover
         dest="save",
         help='save active config to default filename (.oscal.yml) and exit',
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        dest="use_cache",
+        help='do not use the parsed document cache',
+    )
+    parser.add_argument(
+        '--clear-cache',
+        action='store_true',
+        dest="clear_cache",
+        help='remove all parsed document cache entries and exit',
+    )
     parser.add_argument(
         'file',
         nargs='?',
@@ -353,6 +455,11 @@ def main(argv=None):  # pragma: no cover
     if args.test:
         self_test(cfg)
         sys.exit(0)
+    if args.clear_cache:
+        print(f'Clearing cache in {clear_cache(popts)}')
+        sys.exit(0)
+    if not args.use_cache:
+        popts['use_cache'] = False
     if not args.file:
         parser.print_usage()
         print("oscal: error: the following arguments are required: FILE")
@@ -370,7 +477,10 @@ def main(argv=None):  # pragma: no cover
     if not args.quiet:
         print(f"Processing input file: {infile}")
 
-    process_data(infile, popts, args)
+    errors: List = []
+    process_data(infile, popts, args, errors=errors)
+    if errors:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+"""
+Prebuilt index of the packaged NIST profile ID files. The text files in
+``yaml_tools/data`` are the source of truth; regenerate the index after
+changing any of them with::
+
+  $ python -m yaml_tools.profile_index
+
+or check whether the packaged index is stale with the ``--check`` option.
+"""
+
+import argparse
+import codecs
+import hashlib
+import pickle  # nosec B403
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from .templates import id_sort_key
+from .utils import (
+    PROFILE_ID_FILES,
+    get_profile_type,
+    importlib_resources,
+)
+
+INDEX_FILE = 'profile-ids.idx'
+INDEX_VERSION = 1
+# encoding of the ID files used to build the packaged index
+INDEX_ENCODING = 'utf-8'
+
+
+def build_index(file_encoding: str = INDEX_ENCODING) -> Dict:
+    """
+    Read the packaged profile ID text files and build the index data. The
+    lines are stripped, and blank lines and duplicate IDs are dropped. The
+    result is a dict with the following keys:
+
+    * ``ids`` - tuple of all unique IDs in natural sort order
+    * ``profiles`` - dict of profile name to a dict with the profile
+      ``ids`` (sorted tuple) and ``mask``, an int with bit N set if
+      ``ids[N]`` is in the profile
+    * ``sources`` - dict of source file name to content digest
+
+    :param file_encoding: file encoding of the ID files
+    :returns: index data
+    """
+    id_data = importlib_resources.files('yaml_tools').joinpath('data')
+    sources: Dict = {}
+    profile_ids: Dict = {}
+    for file in PROFILE_ID_FILES:
+        raw = id_data.joinpath(file).read_bytes()
+        sources[file] = hashlib.sha256(raw).hexdigest()
+        lines = raw.decode(file_encoding).splitlines()
+        profile_ids[get_profile_type(file)] = sorted(
+            {x.strip() for x in lines if x.strip()}, key=id_sort_key
+        )
+
+    unique_ids = {x for ids in profile_ids.values() for x in ids}
+    all_ids = tuple(sorted(unique_ids, key=id_sort_key))
+    position = {x: idx for idx, x in enumerate(all_ids)}
+    profiles = {
+        ptype: {
+            'ids': tuple(ids),
+            'mask': sum(1 << position[x] for x in ids),
+        }
+        for ptype, ids in profile_ids.items()
+    }
+    return {
+        'version': INDEX_VERSION,
+        'sources': sources,
+        'ids': all_ids,
+        'profiles': profiles,
+    }
+
+
+def default_index_path() -> Path:
+    """
+    Path of the index file in the package data directory.
+    """
+    return Path(__file__).parent.joinpath('data', INDEX_FILE)
+
+
+def index_is_stale(path: Optional[Path] = None, file_encoding: str = 'utf-8') -> bool:
+    """
+    Check whether the index file at ``path`` is missing, unreadable, or
+    does not match the current profile ID text files.
+
+    :param path: index file path (default is the packaged index)
+    :param file_encoding: file encoding of the ID files
+    :returns: True if the index needs to be regenerated
+    """
+    try:
+        data = read_index(path or default_index_path())
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return True
+    return data != build_index(file_encoding)
+
+
+@lru_cache(maxsize=None)
+def load_profile_index(file_encoding: str = INDEX_ENCODING) -> Dict:
+    """
+    Load the packaged profile ID index (cached for the life of the
+    process). If the index file is missing, or the ID files are read
+    with an encoding other than ``INDEX_ENCODING``, the index is built in
+    memory from the text files instead.
+
+    :param file_encoding: file encoding of the ID files
+    :returns: index data (see ``build_index()``)
+    """
+    if codecs.lookup(file_encoding).name != codecs.lookup(INDEX_ENCODING).name:
+        return build_index(file_encoding)
+    idx_ref = importlib_resources.files('yaml_tools').joinpath('data', INDEX_FILE)
+    try:
+        with importlib_resources.as_file(idx_ref) as path:
+            return read_index(path)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return build_index()
+
+
+def read_index(path: Path) -> Dict:
+    """
+    Read index data from ``path``.
+
+    :param path: index file path
+    :returns: index data
+    :raises OSError: if the file cannot be read
+    :raises pickle.UnpicklingError: if the file is not an index
+    """
+    with Path(path).open('rb') as ifile:
+        data = pickle.load(ifile)  # nosec B301
+    if not isinstance(data, dict) or data.get('version') != INDEX_VERSION:
+        raise pickle.UnpicklingError(f'unsupported index format in {path}')
+    return data
+
+
+def write_index(path: Optional[Path] = None, file_encoding: str = 'utf-8') -> Path:
+    """
+    Build the index and write it to ``path``.
+
+    :param path: index file path (default is the packaged index)
+    :param file_encoding: file encoding of the ID files
+    :returns: index file path
+    """
+    opath = Path(path) if path else default_index_path()
+    with opath.open('wb') as ofile:
+        pickle.dump(build_index(file_encoding), ofile, protocol=4)
+    return opath
+
+
+def main(argv=None):  # pragma: no cover
+    """
+    Regenerate (or check) the packaged profile ID index.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m yaml_tools.profile_index',
+        description='Regenerate the NIST profile ID index from the ID text files',
+    )
+    parser.add_argument(
+        '-c',
+        '--check',
+        action='store_true',
+        help='exit non-zero if the index is stale instead of writing it',
+    )
+    parser.add_argument(
+        '-o',
+        '--outfile',
+        metavar="FILE",
+        type=Path,
+        default=None,
+        help='path to index file (default is the packaged index)',
+    )
+    args = parser.parse_args(argv)
+
+    if args.check:
+        if index_is_stale(args.outfile):
+            print('Profile ID index is stale; regenerate it!')
+            sys.exit(1)
+        print('Profile ID index is up to date')
+        sys.exit(0)
+    print(f'Wrote {write_index(args.outfile)}')
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
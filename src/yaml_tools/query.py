@@ -0,0 +1,364 @@
+"""
+Compiled path queries for searching parsed YAML/JSON documents.
+
+A query is a path glob like the ones ``dpath`` accepts, eg, ``controls/*/id``
+or ``**/rules``, compiled once into a ``PathQuery`` that can be applied to
+any number of documents. Matching follows the ``dpath`` rules (each segment
+is an ``fnmatch`` pattern, list indices match their string form, and one
+``**`` segment matches zero or more segments) and results come back in the
+same order, but only the subtrees that can still match are visited.
+"""
+
+import re
+from collections.abc import Mapping, Sequence
+from fnmatch import translate
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+GLOB_MAGIC = re.compile(r'[*?[]')
+STAR_STAR = '**'
+
+
+def _compile_segment(
+    glob: str,
+) -> Tuple[Callable[[Any], bool], Optional[str], Optional[int]]:
+    """
+    Compile one glob segment into a key predicate; also return the literal
+    key (or index) for segments without glob characters so they can be
+    looked up directly.
+    """
+    try:
+        gint: Optional[int] = int(glob)
+    except ValueError:
+        gint = None
+    literal = None if GLOB_MAGIC.search(glob) else glob
+    if literal is not None:
+        pattern = None
+    else:
+        pattern = re.compile(translate(glob)).match
+
+    def match(key: Any) -> bool:
+        if isinstance(key, int):
+            if gint is not None:
+                return key == gint
+            key = str(key)
+        elif not isinstance(key, str):
+            return False
+        if pattern is None:
+            return key == literal
+        return pattern(key) is not None
+
+    return match, literal, gint
+
+
+def _children(node: Any) -> Iterator[Tuple[Any, Any]]:
+    """
+    Iterate over the (key, value) pairs of a container node.
+    """
+    if isinstance(node, Mapping):
+        return iter(node.items())
+    return enumerate(node)
+
+
+def is_container(node: Any) -> bool:
+    """
+    Check whether ``node`` is a mapping or a (non-string) sequence, ie,
+    a node with children.
+    """
+    return isinstance(node, Mapping) or (
+        isinstance(node, Sequence) and not isinstance(node, (str, bytes))
+    )
+
+
+class PathQuery:
+    """
+    Compiled path glob. Segments before a ``**`` segment (or all of them
+    if there is none) are matched while descending, so subtrees that
+    cannot match are skipped, and literal segments are looked up directly
+    instead of scanning every key.
+
+    :param glob: path glob string
+    :param separator: path separator
+    :raises ValueError: if the glob has more than one ``**`` segment
+    """
+
+    def __init__(self, glob: str, separator: str = '/'):
+        self.glob = glob
+        self.separator = separator
+        segments = glob.lstrip(separator).split(separator)
+        if segments.count(STAR_STAR) > 1:
+            raise ValueError(f"Only one '**' is permitted per glob: {glob}")
+        if STAR_STAR in segments:
+            idx = segments.index(STAR_STAR)
+            prefix, suffix = segments[:idx], segments[idx + 1 :]
+        else:
+            prefix, suffix = segments, None
+        self.prefix = [_compile_segment(x) for x in prefix]
+        self.suffix = None if suffix is None else [_compile_segment(x) for x in suffix]
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.glob!r}, separator={self.separator!r})'
+
+    @property
+    def max_depth(self) -> Optional[int]:
+        """
+        Depth of all matches, or None if the glob has a ``**`` segment.
+        """
+        return len(self.prefix) if self.suffix is None else None
+
+    def match(self, path: Tuple) -> bool:
+        """
+        Check whether the key ``path`` (a tuple of keys/indices) matches.
+        """
+        num_prefix = len(self.prefix)
+        if self.suffix is None:
+            if len(path) != num_prefix:
+                return False
+        elif len(path) < num_prefix + len(self.suffix):
+            return False
+        for seg, (match, _, _) in zip(path, self.prefix):
+            if not match(seg):
+                return False
+        if self.suffix:
+            tail = path[len(path) - len(self.suffix) :]
+            return all(match(seg) for seg, (match, _, _) in zip(tail, self.suffix))
+        return True
+
+    def may_contain(self, path: Tuple) -> bool:
+        """
+        Check whether any descendant of the node at key ``path`` could
+        match, ie, whether a search needs to look below it.
+        """
+        if self.suffix is None and len(path) >= len(self.prefix):
+            return False
+        for seg, (match, _, _) in zip(path, self.prefix):
+            if not match(seg):
+                return False
+        return True
+
+    def _candidates(self, node: Any, depth: int) -> Iterator[Tuple[Any, Any]]:
+        """
+        Get the children of ``node`` (at ``depth``) that may lead to a
+        match, using a direct lookup for literal prefix segments.
+        """
+        if depth >= len(self.prefix):
+            return _children(node)
+        match, literal, gint = self.prefix[depth]
+        if isinstance(node, Mapping):
+            # bool keys can match 'True'/'False', so only str keys are safe
+            if (
+                literal is not None
+                and gint is None
+                and literal not in ('True', 'False')
+            ):
+                return iter([(literal, node[literal])] if literal in node else [])
+            return ((k, v) for k, v in node.items() if match(k))
+        if gint is not None and literal is not None:
+            return iter([(gint, node[gint])] if 0 <= gint < len(node) else [])
+        return ((k, v) for k, v in enumerate(node) if match(k))
+
+    def search(self, doc: Any) -> Iterator[Tuple[Tuple, Any]]:
+        """
+        Yield the (path, value) pairs matching the query, where ``path``
+        is a tuple of keys/indices, in ``dpath`` walk order (all children
+        of a node before any grandchildren).
+
+        :param doc: parsed document
+        :returns: generator of (path, value) tuples
+        """
+        max_depth = self.max_depth
+        stack: List[Tuple[Any, Tuple]] = [(doc, ())] if is_container(doc) else []
+        while stack:
+            node, path = stack.pop()
+            depth = len(path)
+            children = []
+            for key, value in self._candidates(node, depth):
+                child_path = path + (key,)
+                if self.match(child_path):
+                    yield child_path, value
+                if is_container(value) and (max_depth is None or depth + 1 < max_depth):
+                    children.append((value, child_path))
+            stack.extend(reversed(children))
+
+    def paths(self, doc: Any) -> Iterator[str]:
+        """
+        Yield the matching paths as separator-joined strings.
+        """
+        for path, _ in self.search(doc):
+            yield self.separator.join(str(x) for x in path)
+
+    def values(self, doc: Any) -> List[Any]:
+        """
+        Get the list of values matching the query (same as
+        ``dpath.values(doc, glob, separator)``).
+        """
+        return [value for _, value in self.search(doc)]
+
+
+def _fold_child(node: Any, key: Any, ctype: type) -> Any:
+    """
+    Get (or create) the child container of a folded result node.
+    """
+    if isinstance(node, list):
+        node.extend([None] * (key + 1 - len(node)))
+        if node[key] is None:
+            node[key] = ctype()
+        return node[key]
+    return node.setdefault(key, ctype())
+
+
+@lru_cache(maxsize=128)
+def compile_query(glob: str, separator: str = '/') -> PathQuery:
+    """
+    Compile (and cache) a path query; use this to apply the same query to
+    many documents.
+
+    :param glob: path glob string
+    :param separator: path separator
+    :returns: compiled query
+    :raises ValueError: if the glob is invalid
+    """
+    return PathQuery(glob, separator)
+
+
+def fold_matches(doc: Any, matches: Iterable[Tuple[Tuple, Any]]) -> Dict:
+    """
+    Fold (path, value) matches from ``doc`` into a new sparse tree with
+    the matched values at their paths, like ``dpath.search()`` without
+    ``yielded``; list parents are padded with None.
+
+    :param doc: parsed document the matches came from
+    :param matches: iterable of (path, value) tuples
+    :returns: folded result
+    """
+    result: Dict = {}
+    for path, value in matches:
+        node: Any = result
+        source = doc
+        for key in path[:-1]:
+            source = source[key]
+            node = _fold_child(node, key, list if isinstance(source, list) else dict)
+        if isinstance(node, list):
+            node.extend([None] * (path[-1] + 1 - len(node)))
+        node[path[-1]] = value
+    return result
+
+
+def iter_filter(
+    doc: Any, matcher: Callable[[str], bool]
+) -> Iterator[Tuple[Tuple, Any]]:
+    """
+    Yield (path, value) for each mapping key and scalar leaf in ``doc``
+    whose string form satisfies ``matcher``. A matching key yields the
+    whole value under it (which is then not searched any further), and
+    every leaf is tested only once, so the search is linear in the size
+    of the document.
+
+    :param doc: parsed document
+    :param matcher: predicate for key and leaf strings
+    :returns: generator of (path, value) tuples
+    """
+    stack: List[Tuple[Any, Tuple]] = [(doc, ())] if is_container(doc) else []
+    while stack:
+        node, path = stack.pop()
+        is_map = isinstance(node, Mapping)
+        children = []
+        for key, value in _children(node):
+            child_path = path + (key,)
+            if is_map and matcher(str(key)):
+                yield child_path, value
+            elif is_container(value):
+                children.append((value, child_path))
+            elif matcher(str(value)):
+                yield child_path, value
+        stack.extend(reversed(children))
+
+
+def iter_keys(doc: Any, keys: Container) -> Iterator[Tuple[Any, Tuple, Any]]:
+    """
+    Yield (key, path, value) for each mapping item in ``doc`` whose key is
+    in ``keys``, in the same (pre-order) order as ``nested_lookup()``. The
+    walk uses an explicit stack, so document depth is not limited by the
+    recursion limit. ``keys`` is checked for every item, so a caller can
+    remove keys from a set to stop looking for them.
+
+    :param doc: parsed document
+    :param keys: keys to look for (eg, a set)
+    :returns: generator of (key, path, value) tuples
+    """
+
+    def items(node: Any) -> Iterator[Tuple[Any, Any, bool]]:
+        if isinstance(node, dict):
+            return ((k, v, True) for k, v in node.items())
+        return ((idx, v, False) for idx, v in enumerate(node))
+
+    if not isinstance(doc, (dict, list)):
+        return
+    stack = [((), items(doc))]
+    while stack:
+        path, node_items = stack[-1]
+        for name, value, is_map in node_items:
+            if is_map and name in keys:
+                yield name, path + (name,), value
+            if isinstance(value, (dict, list)):
+                stack.append((path + (name,), items(value)))
+                break
+        else:
+            stack.pop()
+
+
+def iter_lookup(doc: Any, key: Any) -> Iterator[Tuple[Tuple, Any]]:
+    """
+    Yield (path, value) for each mapping item in ``doc`` with key
+    ``key``, in the same (pre-order) order as ``nested_lookup()``.
+
+    :param doc: parsed document
+    :param key: key to look for
+    :returns: generator of (path, value) tuples
+    """
+    return ((path, value) for _, path, value in iter_keys(doc, (key,)))
+
+
+def collect_keys(
+    doc: Any,
+    keys: Iterable[Any],
+    predicates: Optional[Dict[Any, Callable[[Any], bool]]] = None,
+    limits: Optional[Dict[Any, int]] = None,
+) -> Dict[Any, List[Any]]:
+    """
+    Collect the values of several keys in a single walk of ``doc``; the
+    result for each key is the same list ``nested_lookup(key, doc)`` would
+    return, filtered by the key's predicate (if any). A key with a limit
+    is no longer looked for once it has that many values, and the walk
+    stops as soon as every key has reached its limit.
+
+    :param doc: parsed document
+    :param keys: keys to look for
+    :param predicates: dict of key to value predicate
+    :param limits: dict of key to maximum number of values
+    :returns: dict of key to list of values
+    """
+    predicates = predicates or {}
+    limits = limits or {}
+    found: Dict[Any, List[Any]] = {key: [] for key in keys}
+    active = {key for key in found if limits.get(key, 1) > 0}
+    for key, _, value in iter_keys(doc, active):
+        check = predicates.get(key)
+        if check is not None and not check(value):
+            continue
+        found[key].append(value)
+        if len(found[key]) == limits.get(key):
+            active.discard(key)
+            if not active:
+                break
+    return found
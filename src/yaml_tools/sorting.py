@@ -0,0 +1,286 @@
+"""
+Sort specs for sorting several lists in a document in one pass. A spec
+is a list of targets, each with a path glob (same syntax as ``yagrep``
+path searches, eg, ``controls/*/rules``) and optional sort options:
+
+:path: path glob for the list(s) to sort
+:by: sort a list of mappings by the value of this field
+:natural: use natural order, eg, ``ac-2`` before ``ac-10``
+:reverse: sort in descending order
+
+Sort keys are computed once per item (decorate-sort-undecorate), and
+comments on ``ruamel.yaml`` sequence items move with the items.
+
+Mapping keys can also be sorted for a whole document; each mapping is
+reordered once, in place, and ``ruamel.yaml`` comments stay with their
+keys.
+"""
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .query import compile_query, is_container
+
+SPEC_OPTIONS = ('path', 'by', 'natural', 'reverse')
+
+
+class SortTarget:
+    """
+    One compiled sort spec entry.
+
+    :param path: path glob for the list(s) to sort
+    :param by: mapping field to sort by
+    :param natural: use natural order
+    :param reverse: sort in descending order
+    :param separator: path separator
+    :raises ValueError: if the path glob is invalid
+    """
+
+    def __init__(
+        self,
+        path: str,
+        by: Optional[str] = None,
+        natural: bool = False,
+        reverse: bool = False,
+        separator: str = '/',
+    ):
+        self.query = compile_query(path, separator)
+        self.by = by
+        self.natural = bool(natural)
+        self.reverse = bool(reverse)
+
+    def __repr__(self):
+        return (
+            f'{type(self).__name__}({self.query.glob!r}, by={self.by!r}, '
+            f'natural={self.natural}, reverse={self.reverse})'
+        )
+
+    def key_func(self) -> Optional[Callable[[Any], Any]]:
+        """
+        Get the sort key function for the list items (None means the item
+        itself).
+        """
+        base: Optional[Callable[[Any], Any]] = None
+        if self.natural:
+            from natsort import natsort_keygen  # pylint: disable=C0415
+
+            base = natsort_keygen()
+        if self.by is None:
+            return base
+        field = self.by
+        if base is None:
+            return lambda item: item[field]
+        return lambda item: base(item[field])  # type: ignore[misc]
+
+    def sort(self, items: List) -> None:
+        """
+        Sort ``items`` in place (stable in both directions).
+        """
+        key = self.key_func()
+        keys = list(items) if key is None else [key(item) for item in items]
+        order = sorted(range(len(items)), key=keys.__getitem__, reverse=self.reverse)
+        list.__setitem__(items, slice(None), [items[idx] for idx in order])
+        comments = getattr(getattr(items, 'ca', None), 'items', None)
+        if comments:
+            old = dict(comments)
+            comments.clear()
+            for new_idx, old_idx in enumerate(order):
+                if old_idx in old:
+                    comments[new_idx] = old[old_idx]
+
+    def first_unsorted(self, items: List) -> Optional[int]:
+        """
+        Find the index of the first item that sorts before the one above
+        it; item keys are computed as needed, so the check stops early.
+        """
+        key = self.key_func() or (lambda item: item)
+        prev = None
+        for idx, item in enumerate(items):
+            current = key(item)
+            if idx and (prev < current if self.reverse else current < prev):
+                return idx
+            prev = current
+        return None
+
+
+class SortSpec:
+    """
+    Compiled sort spec; all of its targets are applied in one traversal
+    of a document. Lists are matched by their paths in the document as
+    loaded (before any sorting), and a list matched by more than one
+    target is sorted by each of them in spec order.
+
+    :param spec: list of target dicts (see module docs)
+    :param separator: path separator
+    :raises ValueError: if the spec is invalid
+    """
+
+    def __init__(self, spec: Iterable[Dict], separator: str = '/'):
+        self.separator = separator
+        self.targets: List[SortTarget] = []
+        for entry in spec:
+            if not isinstance(entry, dict) or not isinstance(entry.get('path'), str):
+                raise ValueError(f'sort spec entries need a path: {entry!r}')
+            unknown = set(entry) - set(SPEC_OPTIONS)
+            if unknown:
+                raise ValueError(f'unknown sort spec option(s): {sorted(unknown)}')
+            self.targets.append(SortTarget(separator=separator, **entry))
+        if not self.targets:
+            raise ValueError('sort spec is empty')
+
+    def lists(self, doc: Any) -> Iterator[Tuple[Tuple, List, SortTarget]]:
+        """
+        Walk ``doc`` (with an explicit stack) and yield (path, list,
+        target) for each target list, in document order. The children of
+        a list are queued before it is yielded, so it can be sorted in
+        place during the walk.
+
+        :param doc: parsed document
+        :returns: generator of (path, list, target) tuples
+        """
+        targets = self.targets
+        stack: List[Tuple[Any, Tuple]] = [(doc, ())]
+        while stack:
+            node, path = stack.pop()
+            if not is_container(node):
+                continue
+            items = node.items() if isinstance(node, dict) else enumerate(node)
+            children = []
+            for key, value in items:
+                child_path = path + (key,)
+                if is_container(value) and any(
+                    t.query.match(child_path) or t.query.may_contain(child_path)
+                    for t in targets
+                ):
+                    children.append((value, child_path))
+            stack.extend(reversed(children))
+            if path and isinstance(node, list):
+                for target in targets:
+                    if target.query.match(path):
+                        yield path, node, target
+
+    def sort(self, doc: Any) -> int:
+        """
+        Sort all target lists in ``doc`` in place.
+
+        :param doc: parsed document
+        :returns: number of lists sorted
+        """
+        count = 0
+        for _, items, target in self.lists(doc):
+            target.sort(items)
+            count += 1
+        return count
+
+    def find_unsorted(self, doc: Any) -> Optional[Tuple[str, Any, Any]]:
+        """
+        Find the first out-of-order item in the target lists of ``doc``.
+
+        :param doc: parsed document
+        :returns: tuple of item path, previous item, and item (the field
+                  values for ``by`` targets), or None if all are sorted
+        """
+        for path, items, target in self.lists(doc):
+            idx = target.first_unsorted(items)
+            if idx is not None:
+                prev, item = items[idx - 1], items[idx]
+                if target.by is not None:
+                    prev, item = prev[target.by], item[target.by]
+                item_path = self.separator.join(str(x) for x in path + (idx,))
+                return item_path, prev, item
+        return None
+
+
+def _key_order(keys: Iterable[Any]) -> List[Any]:
+    """
+    Sort mapping keys; mixed key types (eg, int and str) are sorted by
+    type name first.
+    """
+    try:
+        return sorted(keys)
+    except TypeError:
+        return sorted(keys, key=lambda k: (type(k).__name__, str(k)))
+
+
+def _nodes(doc: Any) -> Iterator[Tuple[Tuple, Any]]:
+    """
+    Walk ``doc`` with an explicit stack and yield (path, node) for each
+    container node, pre-order; nodes shared by aliases are only visited
+    once.
+    """
+    seen = set()
+    stack: List[Tuple[Tuple, Any]] = [((), doc)]
+    while stack:
+        path, node = stack.pop()
+        if not is_container(node) or id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield path, node
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        stack.extend(
+            (path + (key,), value)
+            for key, value in reversed(list(items))
+            if is_container(value)
+        )
+
+
+def sort_mapping_keys(doc: Any) -> int:
+    """
+    Sort the keys of every mapping in ``doc`` in place; the walk uses an
+    explicit stack, so document depth is not limited by the recursion
+    limit. Mappings that are already sorted are left alone, and others
+    are reordered with one pass over the sorted keys.
+
+    :param doc: parsed document
+    :returns: number of mappings
+    """
+    count = 0
+    for _, node in _nodes(doc):
+        if not isinstance(node, dict):
+            continue
+        count += 1
+        keys = list(node)
+        order = _key_order(keys)
+        if order == keys:
+            continue
+        if hasattr(node, 'move_to_end'):
+            for key in order:
+                node.move_to_end(key)
+        else:
+            items = [(key, node[key]) for key in order]
+            node.clear()
+            node.update(items)
+    return count
+
+
+def find_unsorted_key(doc: Any, separator: str = '/') -> Optional[Tuple[str, Any, Any]]:
+    """
+    Find the first mapping key in ``doc`` that sorts before the key above
+    it.
+
+    :param doc: parsed document
+    :param separator: path separator
+    :returns: tuple of key path, previous key, and key, or None if all
+              mapping keys are sorted
+    """
+    for path, node in _nodes(doc):
+        if not isinstance(node, dict):
+            continue
+        keys = list(node)
+        order = _key_order(keys)
+        if order != keys:
+            rank = {key: idx for idx, key in enumerate(order)}
+            idx = next(
+                i for i in range(1, len(keys)) if rank[keys[i]] < rank[keys[i - 1]]
+            )
+            key_path = separator.join(str(x) for x in path + (keys[idx],))
+            return key_path, keys[idx - 1], keys[idx]
+    return None
@@ -0,0 +1,664 @@
+"""
+Event-driven streaming search of YAML and JSON files. Documents are read
+as a stream of parser events (YAML) or tokens (JSON) while tracking the
+current key path, and only the subtree under each match is built, so the
+memory used by a search is bounded by the document depth (plus the size
+of the matches) instead of the document size.
+
+XML files are parsed incrementally with ``expat`` into the same document
+``xmltodict`` builds (``@attr`` keys for attributes, ``#text`` for text
+next to attributes or child elements, and ``#comment`` for comments), but
+each element that cannot contain a match is dropped as soon as it ends.
+
+Events are ``(kind, value)`` tuples where ``kind`` is one of ``map`` or
+``seq`` (start of a container), ``end`` (end of the current container),
+``scalar`` (value is the constructed scalar), or ``doc`` (start of a new
+document).
+"""
+
+import re
+from types import MappingProxyType
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .query import compile_query
+
+CHUNK_SIZE = 64 * 1024
+DOC = 'doc'
+END = 'end'
+MAP = 'map'
+SCALAR = 'scalar'
+SEQ = 'seq'
+STREAM_EXTENSIONS = ['.json', '.jsonl', '.yaml', '.yml']
+XML_EXTENSIONS = ['.xml']
+
+Event = Tuple[str, Any]
+
+_JSON_CONSTANTS = {
+    'true': True,
+    'false': False,
+    'null': None,
+    'NaN': float('nan'),
+    'Infinity': float('inf'),
+    '-Infinity': float('-inf'),
+}
+_JSON_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?')
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+_NO_KEY = object()
+# stands in for elements dropped from an XML search document
+_PRUNED = MappingProxyType({})
+
+
+class _Builder:
+    """
+    Build the value of one (matched) node from its events.
+    """
+
+    __slots__ = ('stack', 'value')
+
+    def __init__(self):
+        self.stack: List[List[Any]] = []
+        self.value: Any = None
+
+    def feed(self, kind: str, value: Any) -> bool:
+        """
+        Add an event and return True when the node is complete.
+        """
+        if kind == END:
+            self.stack.pop()
+            return not self.stack
+        node = value if kind == SCALAR else {} if kind == MAP else []
+        if self.stack:
+            frame = self.stack[-1]
+            if isinstance(frame[0], dict):
+                if frame[1] is _NO_KEY:
+                    if kind != SCALAR:
+                        raise ValueError('found unhashable mapping key')
+                    frame[1] = value
+                    return False
+                frame[0][frame[1]] = node
+                frame[1] = _NO_KEY
+            else:
+                frame[0].append(node)
+        else:
+            self.value = node
+        if kind != SCALAR:
+            self.stack.append([node, _NO_KEY])
+        return not self.stack
+
+
+def _walk(node: Any, path: Tuple = ()) -> Iterator[Tuple[Tuple, Any]]:
+    """
+    Pre-order walk of a built node, yielding (path, value) for every
+    descendant.
+    """
+    if isinstance(node, dict):
+        items: Any = node.items()
+    elif isinstance(node, list):
+        items = enumerate(node)
+    else:
+        return
+    for key, value in items:
+        yield path + (key,), value
+        yield from _walk(value, path + (key,))
+
+
+def json_events(stream: IO, chunk_size: int = CHUNK_SIZE) -> Iterator[Event]:
+    """
+    Tokenize JSON text from ``stream`` (read in chunks) into events. This
+    is a tokenizer, so punctuation is not fully validated; invalid string
+    escapes and unexpected characters raise a ``ValueError``.
+
+    :param stream: open text stream
+    :param chunk_size: number of characters to read at a time
+    :returns: generator of events
+    """
+    from json.decoder import scanstring  # pylint: disable=C0415
+
+    buf = ''
+    pos = 0
+    eof = False
+
+    while True:
+        pos = _JSON_WS.match(buf, pos).end()  # type: ignore[union-attr]
+        # keep enough look-ahead for any number or constant token
+        if not eof and len(buf) - pos < 16:
+            data = stream.read(chunk_size)
+            eof = not data
+            buf = buf[pos:] + data
+            pos = 0
+            continue
+        if pos >= len(buf):
+            break
+        char = buf[pos]
+        if char in '{[':
+            yield (MAP if char == '{' else SEQ), None
+            pos += 1
+        elif char in '}]':
+            yield END, None
+            pos += 1
+        elif char in ',:':
+            pos += 1
+        elif char == '"':
+            try:
+                value, end = scanstring(buf, pos + 1, True)
+            except ValueError:
+                if eof:
+                    raise
+                data = stream.read(chunk_size)
+                eof = not data
+                buf = buf[pos:] + data
+                pos = 0
+                continue
+            yield SCALAR, value
+            pos = end
+        else:
+            match = _JSON_NUMBER.match(buf, pos)
+            if match and not buf.startswith('-Infinity', pos):
+                if match.end() == len(buf) and not eof:
+                    data = stream.read(chunk_size)
+                    eof = not data
+                    buf = buf[pos:] + data
+                    pos = 0
+                    continue
+                text = match.group()
+                is_float = match.group(1) or match.group(2)
+                yield SCALAR, float(text) if is_float else int(text)
+                pos = match.end()
+                continue
+            for word, value in _JSON_CONSTANTS.items():
+                if buf.startswith(word, pos):
+                    yield SCALAR, value
+                    pos += len(word)
+                    break
+            else:
+                raise ValueError(f'unexpected character {char!r} in JSON data')
+
+
+def jsonl_events(stream: IO) -> Iterator[Event]:
+    """
+    Tokenize JSON Lines text from ``stream`` into the events for a list
+    of records (one per non-blank line).
+    """
+    from io import StringIO  # pylint: disable=C0415
+
+    yield SEQ, None
+    for line in stream:
+        if line.strip():
+            yield from json_events(StringIO(line))
+    yield END, None
+
+
+def yaml_events(stream: IO, prog_opts: Optional[Dict] = None) -> Iterator[Event]:
+    """
+    Parse YAML text from ``stream`` into events with PyYAML (using the
+    libyaml parser if selected by the ``yaml_backend`` config option).
+    Scalars are resolved and constructed the same as ``safe_load()``, and
+    aliases are expanded by replaying the events of the anchored node.
+
+    .. note:: merge keys (``<<``) are not expanded.
+
+    :param stream: open text stream
+    :param prog_opts: configuration options
+    :returns: generator of events
+    """
+    import yaml  # pylint: disable=C0415
+
+    from .utils import get_loader_backend  # pylint: disable=C0415
+
+    if get_loader_backend(prog_opts) == 'libyaml':
+        loader = yaml.CSafeLoader
+    else:
+        loader = yaml.SafeLoader
+    resolver = yaml.resolver.Resolver()
+    constructor = yaml.constructor.SafeConstructor()
+    anchors: Dict[str, List[Event]] = {}
+    recording: List[List[Any]] = []
+
+    def record(evt: Event, anchor: Optional[str] = None) -> Event:
+        if anchor:
+            recording.append([anchor, [], 0])
+        for rec in recording:
+            rec[1].append(evt)
+            if evt[0] in (MAP, SEQ):
+                rec[2] += 1
+            elif evt[0] == END:
+                rec[2] -= 1
+        while recording and recording[-1][2] == 0:
+            name, events, _ = recording.pop()
+            anchors[name] = events
+        return evt
+
+    for event in yaml.parse(stream, Loader=loader):
+        if isinstance(event, yaml.ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+            node = yaml.ScalarNode(tag, event.value, style=event.style)
+            yield record((SCALAR, constructor.construct_document(node)), event.anchor)
+        elif isinstance(event, yaml.MappingStartEvent):
+            yield record((MAP, None), event.anchor)
+        elif isinstance(event, yaml.SequenceStartEvent):
+            yield record((SEQ, None), event.anchor)
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            yield record((END, None))
+        elif isinstance(event, yaml.AliasEvent):
+            if event.anchor not in anchors:
+                raise yaml.composer.ComposerError(
+                    None,
+                    None,
+                    f'found undefined alias {event.anchor!r}',
+                    event.start_mark,
+                )
+            for evt in anchors[event.anchor]:
+                yield record(evt)
+        elif isinstance(event, yaml.DocumentStartEvent):
+            anchors.clear()
+            yield DOC, None
+
+
+def iter_events(file: str, prog_opts: Dict) -> Iterator[Event]:
+    """
+    Open ``file`` and generate its events based on the file extension.
+
+    :param file: filename/path to read
+    :param prog_opts: configuration options
+    :returns: generator of events
+    :raises ValueError: if the file extension is not in STREAM_EXTENSIONS
+    """
+    from pathlib import Path  # pylint: disable=C0415
+
+    infile = Path(file)
+    if infile.suffix not in STREAM_EXTENSIONS:
+        raise ValueError(f'streaming search not supported for {infile.name}')
+
+    def generate() -> Iterator[Event]:
+        with infile.open('r', encoding=prog_opts['file_encoding']) as dfile:
+            if infile.suffix == '.json':
+                yield from json_events(dfile)
+            elif infile.suffix == '.jsonl':
+                yield from jsonl_events(dfile)
+            else:
+                yield from yaml_events(dfile, prog_opts)
+
+    return generate()
+
+
+def search_events(
+    events: Iterator[Event],
+    want: Callable[[Tuple], bool],
+    descend: Optional[Callable[[Tuple], bool]] = None,
+    nested: bool = True,
+) -> Iterator[Tuple[Tuple, Any]]:
+    """
+    Search a stream of events and yield a (path, value) tuple for each
+    node whose key path is wanted, in document order. Only the matching
+    nodes are built; with ``nested`` the nodes inside a match are checked
+    too, and subtrees where ``descend(path)`` is False are skipped.
+
+    :param events: document events
+    :param want: predicate for the key path (a tuple) of a node
+    :param descend: predicate for whether to search below a container
+    :param nested: also search inside matched nodes
+    :returns: generator of (path, value) tuples
+    """
+    path: List[Any] = []
+    # open containers; [is_map, key or index, expect_key]
+    frames: List[List[Any]] = []
+    builder: Optional[_Builder] = None
+    match_path: Tuple = ()
+    skip = 0
+
+    def advance():
+        if frames:
+            if frames[-1][0]:
+                frames[-1][2] = True
+            else:
+                frames[-1][1] += 1
+
+    for kind, value in events:
+        if builder is not None:
+            if builder.feed(kind, value):
+                yield match_path, builder.value
+                if nested:
+                    for sub_path, sub_value in _walk(builder.value):
+                        if want(match_path + sub_path):
+                            yield match_path + sub_path, sub_value
+                builder = None
+                advance()
+            continue
+        if skip:
+            if kind in (MAP, SEQ):
+                skip += 1
+            elif kind == END:
+                skip -= 1
+                if not skip:
+                    advance()
+            continue
+        if kind == DOC:
+            path.clear()
+            frames.clear()
+            continue
+        if kind == END:
+            frames.pop()
+            if frames:
+                path.pop()
+            advance()
+            continue
+        if frames and frames[-1][0] and frames[-1][2]:
+            if kind != SCALAR:
+                raise ValueError('found unhashable mapping key')
+            frames[-1][1] = value
+            frames[-1][2] = False
+            continue
+        if not frames:
+            if kind != SCALAR:
+                frames.append([kind == MAP, 0, True])
+            continue
+
+        node_path = tuple(path) + (frames[-1][1],)
+        if want(node_path):
+            match_path = node_path
+            builder = _Builder()
+            if builder.feed(kind, value):
+                yield match_path, builder.value
+                builder = None
+                advance()
+        elif kind == SCALAR:
+            advance()
+        elif descend is not None and not descend(node_path):
+            skip = 1
+        else:
+            path.append(frames[-1][1])
+            frames.append([kind == MAP, 0, True])
+
+
+def stream_search(file: str, text: str, mode: str, prog_opts: Dict) -> Iterator[Any]:
+    """
+    Streaming version of the ``yagrep`` path and lookup searches; yield
+    the matching values from ``file`` as they are found. Lookup results
+    are in the same order as ``nested_lookup()``; path results are in
+    document order (which only differs from a ``dpath`` search for globs
+    with a ``**`` segment).
+
+    :param file: filename/path to search
+    :param text: path glob or key name
+    :param mode: ``path`` or ``lookup``
+    :param prog_opts: configuration options
+    :returns: generator of values
+    :raises ValueError: if the mode or file type is not supported
+    """
+    if mode == 'lookup':
+        results = search_events(iter_events(file, prog_opts), lambda p: p[-1] == text)
+    elif mode == 'path':
+        query = compile_query(text, prog_opts['default_separator'])
+        results = search_events(
+            iter_events(file, prog_opts),
+            query.match,
+            query.may_contain,
+            nested=query.max_depth is None,
+        )
+    else:
+        raise ValueError(f'streaming search not supported for {mode} mode')
+    return (value for _, value in results)
+
+
+class _XmlFrame:
+    """
+    Open XML element (or the document itself) in an ``XmlSearch``.
+    """
+
+    __slots__ = ('name', 'item', 'data', 'states', 'capture', 'hit')
+
+    def __init__(self, name: Optional[str], item: Optional[Dict], states: Set[int]):
+        self.name = name
+        self.item = item
+        self.data: List[str] = []
+        self.states = states
+        self.capture = False
+        self.hit = False
+
+
+class XmlSearch:
+    """
+    ``expat`` handler that builds the ``xmltodict`` form of an XML document
+    for one search, replacing each element that cannot contain a match
+    with an empty placeholder when it ends. Elements under a (possible)
+    match are kept whole, so searching the result with the same mode gives
+    the same matches as searching the ``xmltodict.parse()`` output.
+
+    :param mode: ``path``, ``filter``, or ``lookup``
+    :param text: path glob (path mode) or key name (lookup mode)
+    :param prog_opts: configuration options
+    :param matcher: key/leaf predicate (filter mode)
+    :raises ValueError: if the mode is not supported
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        text: str,
+        prog_opts: Dict,
+        matcher: Optional[Callable[[str], bool]] = None,
+    ):
+        if mode not in ('path', 'filter', 'lookup'):
+            raise ValueError(f'XML search not supported for {mode} mode')
+        self.mode = mode
+        self.text = text
+        self.matcher: Callable[[str], bool] = matcher or (lambda _: False)
+        self.prefix: List = []
+        self.suffix: Optional[List] = None
+        if mode == 'path':
+            query = compile_query(text, prog_opts['default_separator'])
+            self.prefix, self.suffix = query.prefix, query.suffix
+        self.final = len(self.prefix) + len(self.suffix or ())
+        self.process_comments = bool(prog_opts.get('process_comments'))
+        self.stack = [_XmlFrame(None, None, {0})]
+
+    @staticmethod
+    def push_data(item: Optional[Dict], key: Any, data: Any) -> Dict:
+        """
+        Add a child value to an element, turning repeated keys into a list
+        (same as ``xmltodict``).
+        """
+        if item is None:
+            item = {}
+        if key in item:
+            value = item[key]
+            if isinstance(value, list):
+                value.append(data)
+            else:
+                item[key] = [value, data]
+        else:
+            item[key] = data
+        return item
+
+    def _advance(self, states: Set[int], key: Any) -> Set[int]:
+        """
+        Get the query states after one more path segment. States count
+        the matched segments, so ``self.final`` means a full match; the
+        ``**`` segment (if any) sits between the prefix and suffix states
+        and matches any number of segments.
+        """
+        num_prefix = len(self.prefix)
+        found = set()
+        for depth in states:
+            if depth < num_prefix:
+                seg = self.prefix[depth]
+            elif self.suffix is None:
+                continue
+            else:
+                if depth == num_prefix:
+                    found.add(depth)
+                if depth == self.final:
+                    continue
+                seg = self.suffix[depth - num_prefix]
+            if seg[0](key):
+                found.add(depth + 1)
+        return found
+
+    def _key_match(self, states: Set[int], key: Any) -> bool:
+        """
+        Check whether the (mapping) key ``key`` is a match.
+        """
+        if self.mode == 'lookup':
+            return key == self.text
+        if self.mode == 'filter':
+            return self.matcher(str(key))
+        return self.final in self._advance(states, key)
+
+    def _leaf_match(self, states: Set[int], key: Any, value: Any) -> bool:
+        """
+        Check whether the scalar ``value`` under ``key`` (or any scalar in
+        it, if it is a list) is a match.
+        """
+        values = value if isinstance(value, list) else [value]
+        if self.mode == 'filter':
+            return any(
+                self.matcher(str(x))
+                for x in values
+                if not isinstance(x, (dict, list, MappingProxyType))
+            )
+        if self.mode == 'path' and isinstance(value, list):
+            states = self._advance(states, key)
+            return any(
+                self.final in self._advance(states, idx) for idx in range(len(values))
+            )
+        return False
+
+    def _needed(self, frame: _XmlFrame, value: Any) -> bool:
+        """
+        Check whether an ended element has to be kept, ie, whether it is
+        (or holds) a match.
+        """
+        if frame.capture or frame.hit:
+            return True
+        parent = self.stack[-1]
+        if self._leaf_match(parent.states, frame.name, value):
+            return True
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if self._key_match(frame.states, key) or self._leaf_match(
+                    frame.states, key, child
+                ):
+                    return True
+        return False
+
+    def start(self, name: str, attrs: List[str]):
+        """
+        Handle an element start.
+        """
+        parent = self.stack[-1]
+        item = {'@' + key: value for key, value in zip(attrs[0::2], attrs[1::2])}
+        frame = _XmlFrame(name, item or None, set())
+        if self.mode == 'path':
+            key_states = self._advance(parent.states, name)
+            siblings = (parent.item or {}).get(name, _NO_KEY)
+            if siblings is _NO_KEY:
+                # a first child may still become item 0 of a list
+                frame.states = key_states | self._advance(key_states, 0)
+            else:
+                count = len(siblings) if isinstance(siblings, list) else 1
+                frame.states = self._advance(key_states, count)
+            frame.capture = self.final in key_states or self.final in frame.states
+        else:
+            frame.capture = self._key_match(parent.states, name)
+        frame.capture = frame.capture or parent.capture
+        self.stack.append(frame)
+
+    def end(self, _name: str):
+        """
+        Handle an element end.
+        """
+        frame = self.stack.pop()
+        data = ''.join(frame.data).strip() or None
+        item = frame.item
+        if item is not None:
+            if data:
+                self.push_data(item, '#text', data)
+            value: Any = item
+        else:
+            value = data
+        parent = self.stack[-1]
+        if self._needed(frame, value):
+            parent.hit = True
+        else:
+            value = _PRUNED
+        parent.item = self.push_data(parent.item, frame.name, value)
+
+    def characters(self, data: str):
+        """
+        Handle element text.
+        """
+        self.stack[-1].data.append(data)
+
+    def comment(self, data: str):
+        """
+        Handle a comment.
+        """
+        frame = self.stack[-1]
+        frame.item = self.push_data(frame.item, '#comment', data.strip())
+
+    def parse(self, stream: IO, chunk_size: int = CHUNK_SIZE) -> Any:
+        """
+        Parse XML from a binary ``stream`` (read in chunks) and return the
+        search document.
+
+        :param stream: open binary stream
+        :param chunk_size: number of bytes to read at a time
+        :returns: document dict (or None if the input has no elements)
+        :raises xml.parsers.expat.ExpatError: if the XML is not well-formed
+        :raises ValueError: if the XML declares entities
+        """
+        from xml.parsers import expat  # pylint: disable=C0415
+
+        def forbid_entities(*_args):
+            raise ValueError('entities are disabled')
+
+        parser = expat.ParserCreate()
+        parser.ordered_attributes = True
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.characters
+        parser.EntityDeclHandler = forbid_entities
+        if self.process_comments:
+            parser.CommentHandler = self.comment
+        while True:
+            data = stream.read(chunk_size)
+            parser.Parse(data, not data)
+            if not data:
+                break
+        return self.stack[0].item
+
+
+def xml_search_data(
+    file: str,
+    mode: str,
+    text: str,
+    prog_opts: Dict,
+    matcher: Optional[Callable[[str], bool]] = None,
+) -> Any:
+    """
+    Read an XML file into a document for one ``yagrep`` search, keeping
+    only the elements on the way to a match (see ``XmlSearch``). Comments
+    are included if ``process_comments`` is enabled.
+
+    :param file: filename/path to search
+    :param mode: ``path``, ``filter``, or ``lookup``
+    :param text: path glob or key name
+    :param prog_opts: configuration options
+    :param matcher: key/leaf predicate (filter mode)
+    :returns: search document
+    """
+    with open(file, 'rb') as dfile:
+        return XmlSearch(mode, text, prog_opts, matcher).parse(dfile)
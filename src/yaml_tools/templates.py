@@ -3,10 +3,17 @@ Template bits for generating SSG-style controls in YAML.
 """
 
 import re
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple, Union
 
 from .utils import pystache_render
 
+ID_SEPARATORS = re.compile(r'[\s)(.-]')
+
+# size limit of the ControlId and xform_id caches (NIST 800-53 rev5 has
+# about 1200 controls and enhancements, in two spellings)
+ID_CACHE_SIZE = 8192
+
 PROFILES: List = ['LOW', 'MODERATE', 'HIGH', 'PRIVACY']
 
 IMPACT_LVLS: List = ['low', 'moderate', 'high']
@@ -65,12 +72,147 @@ def generate_control(context: Dict) -> str:
     return id_yaml
 
 
+class ControlId:
+    """
+    Interned, pre-parsed control ID value type. Both ID spellings are
+    parsed once into ``(family, number, enhancements)`` and map to the
+    same instance, eg::
+
+      ControlId('AC-12(2)') is ControlId('ac-12.02')
+
+    Both spellings, a cheap natural sort key, and the hash are computed
+    once and stored on the instance. The intern tables are cleared when
+    they reach ``ID_CACHE_SIZE`` entries (so they do not grow without
+    bound in a long-running process), thus instances compare and hash by
+    value rather than identity.
+
+    :param string: id string in either format
+    :raises ValueError: if ``string`` is not a control ID
+    """
+
+    __slots__ = (
+        'family',
+        'number',
+        'enhancements',
+        'upper',
+        'lower',
+        'sort_key',
+        '_hash',
+    )
+
+    _interned: Dict[Tuple, 'ControlId'] = {}
+    _by_text: Dict[str, 'ControlId'] = {}
+
+    family: str
+    number: int
+    enhancements: Tuple[Union[int, str], ...]
+    upper: str
+    lower: str
+    sort_key: Tuple
+    _hash: int
+
+    def __new__(cls, string: str) -> 'ControlId':
+        cached = cls._by_text.get(string)
+        if cached is not None:
+            return cached
+        tokens = [x for x in ID_SEPARATORS.split(string) if x != '']
+        if len(tokens) < 2 or not tokens[0].isalpha() or not tokens[1].isdigit():
+            raise ValueError(f'invalid control ID: {string!r}')
+        family = tokens[0].lower()
+        number = int(tokens[1])
+        enhancements = tuple(int(x) if x.isdigit() else x.lower() for x in tokens[2:])
+        key = (family, number, enhancements)
+        obj = cls._interned.get(key)
+        if obj is None:
+            obj = super().__new__(cls)
+            obj.family = family
+            obj.number = number
+            obj.enhancements = enhancements
+            obj.upper = f'{family.upper()}-{number}' + ''.join(
+                f'({x})' for x in enhancements
+            )
+            obj.lower = f'{family}-{number:02d}' + ''.join(
+                f'.{x:02d}' if isinstance(x, int) else f'.{x}' for x in enhancements
+            )
+            obj.sort_key = (
+                family,
+                number,
+                tuple(
+                    (0, x, '') if isinstance(x, int) else (1, 0, x)
+                    for x in enhancements
+                ),
+            )
+            obj._hash = hash(key)
+            if len(cls._interned) >= ID_CACHE_SIZE:
+                cls.cache_clear()
+            cls._interned[key] = obj
+        if len(cls._by_text) >= ID_CACHE_SIZE:
+            cls._by_text.clear()
+        cls._by_text[string] = obj
+        return obj
+
+    @classmethod
+    def cache_clear(cls) -> None:
+        """
+        Clear the intern tables.
+        """
+        cls._interned.clear()
+        cls._by_text.clear()
+
+    def __reduce__(self):
+        return (self.__class__, (self.upper,))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, ControlId):
+            return NotImplemented
+        return self._hash == other._hash and self.sort_key == other.sort_key
+
+    def __hash__(self):
+        return self._hash
+
+    def __lt__(self, other):
+        if not isinstance(other, ControlId):
+            return NotImplemented
+        return self.sort_key < other.sort_key
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.upper!r})'
+
+    def __str__(self):
+        return self.upper
+
+
+def id_sort_key(string: str) -> Tuple:
+    """
+    Natural sort key for control ID strings in either format; use as the
+    ``key`` argument to ``sorted()``. Strings that are not control IDs
+    (including empty strings) sort after all valid IDs, in plain string
+    order.
+
+    :param string: id string
+    :returns: sort key tuple
+    """
+    try:
+        return (0, ControlId(string).sort_key)
+    except ValueError:
+        return (1, string)
+
+
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def xform_id(string: str, strip_trailing_zeros: bool = False) -> str:
     """
     Transform control ID strings, add leading zeros in forward direction::
 
       AC-12(2) <==> ac-12.02
 
+    Results are memoized (the least recently used results are dropped
+    past ``ID_CACHE_SIZE``), and the forward direction is served from the
+    interned ``ControlId`` so each ID is only parsed once. The reverse
+    direction keeps any zero padding found in the input, ie, ``ac-12.02``
+    becomes ``AC-12(02)``.
+
     Caller should filter zero-length input or handle IndexError as needed.
 
     :param string: id string in one of the above formats
@@ -78,18 +220,22 @@ def xform_id(string: str, strip_trailing_zeros: bool = False) -> str:
     :returns: opposite ID format string
     """
     if string[0].isupper():
-        idp = re.compile(r'[)(-]')  # regex character class id separators
-        slist = [x for x in idp.split(string) if x != '']
         if strip_trailing_zeros:
-            slist = [x for x in idp.split(string) if x not in ('00', '')]
-        slist_with_dots = [slist[0].lower() + f"-{int(slist[1]):02d}"]
-        slist_with_dots += [
-            f".{s}" if s.isalpha() else f".{int(s):02d}" for s in slist[2:]
-        ]
-        new_id = ''.join(slist_with_dots)
+            string = ''.join(x for x in re.split(r'([)(-])', string) if x != '00')
+        new_id = ControlId(string).lower
     else:
         slist = string.upper().split('.')
-        slist_with_parens = [slist[0]]
-        slist_with_parens += [f"({s.lower()})" for s in slist[1:]]
-        new_id = ''.join(slist_with_parens)
+        new_id = slist[0] + ''.join(f"({s.lower()})" for s in slist[1:])
     return new_id
+
+
+def xform_ids(strings: Iterable[str], strip_trailing_zeros: bool = False) -> List[str]:
+    """
+    Batch version of ``xform_id()``; zero-length strings are skipped, so
+    the result can be shorter than the input.
+
+    :param strings: iterable of id strings in one of the supported formats
+    :param strip_trailing_zeros: off by default
+    :returns: list of opposite ID format strings
+    """
+    return [xform_id(x, strip_trailing_zeros) for x in strings if x]
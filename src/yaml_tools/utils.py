@@ -3,20 +3,33 @@ Shared utility code.
 """
 
 import collections
-import csv
-import json
+import math
+import os
 import re
 import sys
+import threading
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache
+from io import StringIO
 from pathlib import Path
 from string import Template
-from typing import Any, Dict, List, Tuple
-
-import pystache
-import yaml as yaml_loader
-from munch import Munch
-from natsort import os_sorted
-from ruamel.yaml import YAML
-from ruamel.yaml.compat import StringIO
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .cache import cache_enabled, cached_load
+
+if TYPE_CHECKING:
+    from munch import Munch
 
 if sys.version_info < (3, 8):
     from importlib_metadata import version
@@ -28,7 +41,9 @@ if sys.version_info < (3, 10):
 else:
     import importlib.resources as importlib_resources
 
-EXTENSIONS = ['.csv', '.json', '.rst', '.tmpl', '.txt', '.yaml', '.yml']
+CACHE_EXTENSIONS = ['.json', '.jsonl', '.yaml', '.yml']
+CGROUP_ROOT = '/sys/fs/cgroup'
+EXTENSIONS = ['.csv', '.json', '.jsonl', '.rst', '.tmpl', '.txt', '.yaml', '.yml']
 PROFILE_ID_FILES = [
     'HIGH-ids.txt',
     'MODERATE-ids.txt',
@@ -37,6 +52,15 @@ PROFILE_ID_FILES = [
 ]
 PROFILE_NAMES = ['HIGH', 'MODERATE', 'LOW', 'PRIVACY']
 VERSION = version('yaml_tools')
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+YAML_BACKENDS = ['auto', 'libyaml', 'ruamel', 'python']
+
+# parsed config file data keyed by (path, mtime, size, encoding), reused
+# across tool runs in the daemon process
+_CONFIG_DATA: Dict[Tuple, Any] = {}
+
+# per-thread pool of configured StrYAML instances (see get_str_yaml)
+_YAML_POOL = threading.local()
 
 
 class FileTypeError(Exception):
@@ -47,30 +71,161 @@ class FileTypeError(Exception):
     __module__ = Exception.__module__
 
 
+_UNHASHABLE = object()
+
+
+def _fingerprint(value: Any) -> Any:
+    """
+    Return a hashable lookup key for ``value``. Hashable values are their
+    own key; unhashable containers (eg, dicts and lists from YAML) are
+    converted to a canonical, order-preserving (lists) or order-insensitive
+    (dicts and sets) frozen equivalent tagged with a private sentinel so
+    they can never collide with a real element.
+    """
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+    if isinstance(value, collections.abc.Mapping):
+        frozen: Any = frozenset(
+            (_fingerprint(k), _fingerprint(v)) for k, v in value.items()
+        )
+    elif isinstance(value, collections.abc.Set):
+        frozen = frozenset(_fingerprint(v) for v in value)
+    elif isinstance(value, collections.abc.Iterable):
+        frozen = tuple(_fingerprint(v) for v in value)
+    else:
+        frozen = repr(value)
+    return (_UNHASHABLE, type(value).__name__, frozen)
+
+
 class SortedSet(collections.abc.Set):
     """
-    Alternate set implementation favoring space over speed, while not
-    requiring the set elements to be hashable. We also add a sort method.
+    Insertion-ordered set implementation that does not require the set
+    elements to be hashable. Elements are indexed by hash (or by a
+    canonical fingerprint for unhashable elements) so membership and the
+    set algebra operators are O(1) per element. We also add sort methods,
+    including a cached natural sort view.
     """
 
-    def __init__(self, iterable):
-        self.elements: List = []
+    def __init__(self, iterable=()):
+        self._data: Dict = {}
+        self._natsorted: Optional[Tuple] = None
         for value in iterable:
-            if value not in self.elements:
-                self.elements.append(value)
+            self._data.setdefault(_fingerprint(value), value)
+
+    @classmethod
+    def _from_items(cls, items) -> 'SortedSet':
+        """Build a new set from (key, value) pairs without re-hashing."""
+        new = cls()
+        new._data = dict(items)
+        return new
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return cls(it)
+
+    @staticmethod
+    def _keys(other) -> Any:
+        """Return a fast membership view of ``other``."""
+        if isinstance(other, SortedSet):
+            return other._data
+        return {_fingerprint(x) for x in other}
+
+    @property
+    def elements(self) -> List:
+        """Set elements in insertion order."""
+        return list(self._data.values())
 
     def __iter__(self):
-        return iter(self.elements)
+        return iter(self._data.values())
 
     def __contains__(self, value):
-        return value in self.elements
+        return _fingerprint(value) in self._data
 
     def __len__(self):
-        return len(self.elements)
+        return len(self._data)
+
+    def __and__(self, other):
+        if not isinstance(other, collections.abc.Iterable):
+            return NotImplemented
+        keys = self._keys(other)
+        return self._from_items((k, v) for k, v in self._data.items() if k in keys)
+
+    def __sub__(self, other):
+        if not isinstance(other, collections.abc.Iterable):
+            return NotImplemented
+        keys = self._keys(other)
+        return self._from_items((k, v) for k, v in self._data.items() if k not in keys)
+
+    def __or__(self, other):
+        if not isinstance(other, collections.abc.Iterable):
+            return NotImplemented
+        new = self._from_items(self._data.items())
+        for value in other:
+            new._data.setdefault(_fingerprint(value), value)
+        return new
+
+    def __xor__(self, other):
+        if not isinstance(other, collections.abc.Iterable):
+            return NotImplemented
+        if not isinstance(other, SortedSet):
+            other = SortedSet(other)
+        return (self - other) | (other - self)
+
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+    def __le__(self, other):
+        if not isinstance(other, collections.abc.Set):
+            return NotImplemented
+        if len(self) > len(other):
+            return False
+        keys = self._keys(other)
+        return all(k in keys for k in self._data)
+
+    def __lt__(self, other):
+        if not isinstance(other, collections.abc.Set):
+            return NotImplemented
+        return len(self) < len(other) and self.__le__(other)
+
+    def __ge__(self, other):
+        if not isinstance(other, collections.abc.Set):
+            return NotImplemented
+        if len(self) < len(other):
+            return False
+        return all(k in self._data for k in self._keys(other))
+
+    def __gt__(self, other):
+        if not isinstance(other, collections.abc.Set):
+            return NotImplemented
+        return len(self) > len(other) and self.__ge__(other)
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.abc.Set):
+            return NotImplemented
+        return len(self) == len(other) and self.__le__(other)
+
+    def isdisjoint(self, other):
+        keys = self._keys(other)
+        return not any(k in keys for k in self._data)
 
     def sort(self):
         """Why not be sorted?"""
-        return sorted(self.elements)
+        return sorted(self._data.values())
+
+    def natsort(self) -> Tuple:
+        """
+        Return the set elements in natural (``os_sorted``) order; the
+        result is computed once and cached since the set is immutable.
+        """
+        if self._natsorted is None:
+            from natsort import os_sorted  # pylint: disable=C0415
+
+            self._natsorted = tuple(os_sorted(self._data.values()))
+        return self._natsorted
 
     def __repr__(self):
         if not self:
@@ -78,14 +233,24 @@ class SortedSet(collections.abc.Set):
         return '%s(%r)' % (self.__class__.__name__, list(self))
 
 
-class StrYAML(YAML):
+class StrYAML:
     """
     Simple YAML subclass with default indenting. Useful in old RHEL
     environments with ``ruamel.yaml==0.16.6``. The API likes dumping
     straight to file/stdout, so we also create 'inefficient' custom
-    string dumper.
+    string dumper. Pass a ``stream`` to ``dump()`` to write straight to
+    an open file handle instead.
+
+    .. note:: ``ruamel.yaml`` is only imported when the first instance is
+              created; instances are of a private subclass that mixes in
+              ``ruamel.yaml.YAML``.
     """
 
+    def __new__(cls, *args, **kwargs):  # pylint: disable=W0613
+        if cls is StrYAML:
+            cls = _str_yaml_type()
+        return super().__new__(cls)
+
     def __init__(self, **kwargs):
         """
         Init with specific indenting and quote preservation.
@@ -95,44 +260,242 @@ class StrYAML(YAML):
         self.indent(mapping=2, sequence=4, offset=2)
 
     def dump(self, data, stream=None, **kw):
-        stream = StringIO()
-        YAML.dump(self, data, stream, **kw)
-        return stream.getvalue()
+        """
+        Dump ``data`` to ``stream`` if provided, otherwise return it as
+        a string.
+        """
+        if stream is not None:
+            super().dump(data, stream, **kw)  # type: ignore[misc]
+            return None
+        sstream = StringIO()
+        super().dump(data, sstream, **kw)  # type: ignore[misc]
+        return sstream.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _str_yaml_type() -> type:
+    """
+    Create the concrete ``StrYAML`` class (deferred ruamel import).
+    """
+    from ruamel.yaml import YAML  # pylint: disable=C0415
+
+    return type('StrYAML', (StrYAML, YAML), {'__module__': __name__})
+
+
+def _cgroup_cpu_quota(root: str = CGROUP_ROOT) -> Optional[int]:
+    """
+    Get the CPU limit from the cgroup (v2 or v1) CPU quota, rounded up to
+    whole CPUs, or None if there is no quota.
+    """
+    cgroup = Path(root)
+    try:
+        quota, period = cgroup.joinpath('cpu.max').read_text().split()[:2]
+    except (OSError, ValueError):
+        for cpu_dir in ['cpu', 'cpu,cpuacct']:
+            try:
+                quota = cgroup.joinpath(cpu_dir, 'cpu.cfs_quota_us').read_text()
+                period = cgroup.joinpath(cpu_dir, 'cpu.cfs_period_us').read_text()
+                break
+            except OSError:
+                continue
+        else:
+            return None
+    try:
+        quota_us, period_us = int(quota), int(period)
+    except ValueError:  # 'max' means no limit
+        return None
+    if quota_us <= 0 or period_us <= 0:
+        return None
+    return max(1, math.ceil(quota_us / period_us))
+
+
+def _has_libyaml() -> bool:
+    """
+    Check whether PyYAML was built with the libyaml C extension.
+    """
+    import yaml  # pylint: disable=C0415
+
+    return bool(yaml.__with_libyaml__)
 
 
-def get_filelist(dirpath: str, filepattern: str = '*.txt', debug: bool = False) -> List:
+def _has_ruamel_clib() -> bool:
+    """
+    Check whether the ``ruamel.yaml.clib`` C extension is importable.
+    """
+    try:
+        import _ruamel_yaml  # noqa: F401 pylint: disable=C0415,W0611
+    except ImportError:
+        return False
+    return True
+
+
+def _run_captured(task: Tuple[Callable, Any, Tuple]) -> Tuple[str, Any, Optional[str]]:
+    """
+    Worker side of ``run_jobs()``; run one task with stdout captured and
+    return the output, the result, and the error string (if any).
+    """
+    func, item, args = task
+    out = StringIO()
+    result = error = None
+    with redirect_stdout(out):
+        try:
+            result = func(item, *args)
+        except Exception as exc:  # pylint: disable=W0703
+            error = f'{type(exc).__name__}: {exc}'
+    return out.getvalue(), result, error
+
+
+def _write_json_array(items: Iterator, encoder: Any, stream: IO):
+    """
+    Write an iterator of items as a JSON array, one item at a time, with
+    the same layout ``encoder`` would use for a list.
+    """
+    indent = encoder.indent
+    if indent is None:
+        item_sep, head, tail, nl_indent = encoder.item_separator, '[', ']', None
+    else:
+        pad = ' ' * indent if isinstance(indent, int) else indent
+        item_sep = encoder.item_separator.rstrip() + '\n' + pad
+        head, tail, nl_indent = '[\n' + pad, '\n]', '\n' + pad
+    first = True
+    for item in items:
+        stream.write(head if first else item_sep)
+        first = False
+        for chunk in encoder.iterencode(item):
+            stream.write(chunk.replace('\n', nl_indent) if nl_indent else chunk)
+    stream.write('[]' if first else tail)
+
+
+def available_cpus() -> int:
+    """
+    Get the number of CPUs available to this process, ie, the CPU affinity
+    count limited by the cgroup CPU quota when running in a container.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))  # type: ignore[attr-defined]
+    except AttributeError:  # pragma: no cover
+        count = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota:
+        count = min(count, quota)
+    return max(1, count)
+
+
+def get_filelist(
+    dirpath: str,
+    filepattern: str = '*.txt',
+    debug: bool = False,
+    exclude: Optional[List[str]] = None,
+    gitignore: bool = False,
+) -> List:
     """
     Get path objects matching ``filepattern`` starting at ``dirpath`` and
-    return a list of matching paths for any files found.
+    return a list of matching paths for any files found. Excluded (eg,
+    VCS and virtualenv) directories are pruned from the search. Paths are
+    in the same form as ``Path(dirpath).rglob()`` paths, eg, ``x.yaml``
+    (not ``./x.yaml``) for ``dirpath`` ``.``, but they are in walk order
+    (sorted by name, with each directory's files before its
+    subdirectories) rather than directory order.
 
     :param dirpath: directory to start file search
     :param filepattern: file extension glob
     :param debug: increase output verbosity
+    :param exclude: file/directory globs to skip (default is
+                    ``walk.DEFAULT_EXCLUDES``)
+    :param gitignore: also skip paths ignored by ``.gitignore`` files
     """
-    file_list: List = []
-    filenames = Path(dirpath).rglob(filepattern)
-    for pfile in list(filenames):
-        file_list.append(str(pfile))
+    from .walk import walk_files  # pylint: disable=C0415
+
+    file_list = [
+        str(Path(x)) for x in walk_files(dirpath, [filepattern], exclude, gitignore)
+    ]
     if debug:
         print(f'Found file list: {file_list}')
     return file_list
 
 
-def get_profile_ids(prog_opts: Dict, debug: bool = False) -> List[str]:
+def get_loader_backend(prog_opts: Optional[Dict] = None) -> str:
+    """
+    Resolve the YAML loader backend from the ``yaml_backend`` config
+    option (one of YAML_BACKENDS). The default ``auto`` selects the
+    PyYAML libyaml ``CSafeLoader`` when available, and a C backend that
+    is not installed falls back to the same ``auto`` selection.
+
+    :param prog_opts: configuration options
+    :returns: resolved backend name, ie, libyaml, ruamel, or python
+    :raises ValueError: if the configured backend name is unknown
+    """
+    name = (prog_opts or {}).get('yaml_backend') or 'auto'
+    if name not in YAML_BACKENDS:
+        msg = f"invalid yaml_backend: {name} (choose one of {YAML_BACKENDS})"
+        raise ValueError(msg)
+    if name == 'ruamel' and _has_ruamel_clib():
+        return name
+    if name in {'auto', 'libyaml', 'ruamel'}:
+        return 'libyaml' if _has_libyaml() else 'python'
+    return name
+
+
+def get_str_yaml(
+    prog_opts: Dict, typ: Optional[str] = None, jinja: bool = False
+) -> 'StrYAML':
+    """
+    Get a ``StrYAML`` instance configured with the indenting and quote
+    options from ``prog_opts``. Instances are created once per thread and
+    option set and then reused, so callers should not change the instance
+    settings.
+
+    :param prog_opts: configuration options
+    :param typ: ruamel.yaml ``typ`` argument, eg, ``safe``
+    :param jinja: pass Jinja ``{{{ }}}`` scalars through unchanged (see
+                  the ``jinja`` module)
+    :returns: configured StrYAML instance
+    """
+    key = (
+        typ,
+        jinja,
+        prog_opts['mapping'],
+        prog_opts['sequence'],
+        prog_opts['offset'],
+        prog_opts['preserve_quotes'],
+    )
+    pool = _YAML_POOL.__dict__.setdefault('instances', {})
+    yaml = pool.get(key)
+    if yaml is None:
+        yaml = StrYAML(typ=typ) if typ else StrYAML()
+        yaml.indent(
+            mapping=prog_opts['mapping'],
+            sequence=prog_opts['sequence'],
+            offset=prog_opts['offset'],
+        )
+        yaml.preserve_quotes = prog_opts['preserve_quotes']
+        if jinja:
+            from .jinja import jinja_yaml  # pylint: disable=C0415
+
+            jinja_yaml(yaml)
+        pool[key] = yaml
+    return yaml
+
+
+def get_profile_ids(
+    prog_opts: Dict, debug: bool = False
+) -> List[Tuple[str, List[str]]]:
     """
     Replacement for ``get_filelist()`` when using the NIST profile ID text
-    files (which are now packaged with the YAML config files).
+    files (which are now packaged with the YAML config files). The sorted
+    IDs come from the prebuilt profile index, so no text parsing or
+    sorting is needed. As in the index, the ID lines are stripped, and
+    blank lines and duplicate IDs are dropped.
     """
+    from .profile_index import (  # pylint: disable=C0415
+        load_profile_index,
+    )
+
+    id_index = load_profile_index(prog_opts['file_encoding'])
     id_str_data: List = []
-    id_data = importlib_resources.files('yaml_tools').joinpath('data')
     for file in PROFILE_ID_FILES:
         ptype = get_profile_type(file, debug=debug)
-        pdata = os_sorted(
-            id_data.joinpath(file)
-            .read_text(encoding=prog_opts['file_encoding'])
-            .splitlines()
-        )
-        id_str_data.append((ptype, pdata))
+        id_str_data.append((ptype, list(id_index['profiles'][ptype]['ids'])))
     return id_str_data
 
 
@@ -155,10 +518,14 @@ def load_config(
     pkg: str = 'yaml_tools.data',
     file_encoding: str = 'utf-8',
     debug: bool = False,
-) -> Tuple[Munch, Path]:
+) -> Tuple['Munch', Path]:
     """
     Load yaml configuration file and munchify the data. If local file is
-    not found in current directory, the default will be loaded.
+    not found in current directory, the default will be loaded. Parsed
+    config data is kept for the life of the process, so loading the same
+    (unchanged) file again does not parse it again. This only saves the
+    parse in a long-running process, ie, tool runs in the ``--daemon``;
+    a one-shot tool run still parses the config file once.
 
     :param prog_name: filename of calling script (no extension)
     :param pkg: name of calling package.path for importlib
@@ -174,11 +541,42 @@ def load_config(
             cfgfile = path
     if debug:
         print(f'Using config: {str(cfgfile.resolve())}')
-    cfgobj = Munch.fromYAML(cfgfile.read_text(encoding=file_encoding))
+    from munch import Munch  # pylint: disable=C0415
+
+    stat = cfgfile.stat()
+    cfg_key = (str(cfgfile.resolve()), stat.st_mtime_ns, stat.st_size, file_encoding)
+    if cfg_key not in _CONFIG_DATA:
+        _CONFIG_DATA[cfg_key] = yaml_safe_load(
+            cfgfile.read_text(encoding=file_encoding)
+        )
+    cfgobj = Munch.fromDict(_CONFIG_DATA[cfg_key])
 
     return cfgobj, cfgfile
 
 
+@contextmanager
+def output_stream(prog_opts: Dict) -> Iterator[IO]:
+    """
+    Context manager yielding the output stream for writers, ie, a new
+    buffered file if ``output_path`` is set in the config, or stdout.
+
+    :param prog_opts: configuration options
+    """
+    opath = prog_opts.get('output_path')
+    if not opath:
+        yield sys.stdout
+        sys.stdout.flush()
+        return
+    newline = '' if prog_opts.get('output_format') == 'csv' else None
+    with Path(opath).open(
+        'w',
+        encoding=prog_opts.get('file_encoding', 'utf-8'),
+        buffering=OUTPUT_BUFFER_SIZE,
+        newline=newline,
+    ) as ofile:
+        yield ofile
+
+
 def process_template(tmpl_file: str, data_file: str, prog_opts: Dict) -> str:
     """
     Process string template file and context data and return rendered
@@ -195,8 +593,7 @@ def process_template(tmpl_file: str, data_file: str, prog_opts: Dict) -> str:
     :param prog_opts: configuration options
     :returns: rendered template string
     """
-    yaml = StrYAML(typ="safe")
-    yaml.preserve_quotes = prog_opts['preserve_quotes']
+    yaml = get_str_yaml(prog_opts, typ='safe')
     template = Path(tmpl_file).resolve().read_text(encoding=prog_opts['file_encoding'])
     context = yaml.load(Path(data_file).resolve())
     return Template(template).substitute(context)
@@ -206,6 +603,8 @@ def pystache_render(*args, **kwargs) -> str:
     """
     Render pystache template with strict mode enabled.
     """
+    import pystache  # pylint: disable=C0415
+
     renderer = pystache.Renderer(missing_tags='strict')
     out_str: str = renderer.render(*args, **kwargs)
     return out_str
@@ -227,6 +626,23 @@ def replace_curlys(data: str) -> str:
     return re.sub(r'\}}}\s', '}}> ', data)
 
 
+def resolve_jobs(jobs: Optional[int]) -> int:
+    """
+    Get the number of worker processes for the ``--jobs`` option value;
+    ``0`` (or less) means all available CPUs, and larger values are
+    limited to the available CPUs.
+
+    :param jobs: requested number of jobs
+    :returns: number of workers (at least 1)
+    """
+    if jobs is None:
+        return 1
+    cpus = available_cpus()
+    if jobs <= 0:
+        return cpus
+    return max(1, min(jobs, cpus))
+
+
 def restore_xml_comments(xmls: str) -> str:
     """
     Turn tagged comment elements back into xml comments.
@@ -239,6 +655,68 @@ def restore_xml_comments(xmls: str) -> str:
     return xmls
 
 
+def run_jobs(
+    func: Callable,
+    items: Iterable[Any],
+    args: Tuple = (),
+    jobs: Optional[int] = 1,
+    chunksize: Optional[int] = None,
+    errors: Optional[List] = None,
+) -> Iterator[Any]:
+    """
+    Run ``func(item, *args)`` for each of ``items`` and yield the results
+    in input order. With more than one job the work is spread over a
+    process pool (so ``func`` and ``args`` must be picklable) and the
+    stdout of each task is captured and replayed in input order, so the
+    console output is the same as a serial run. An exception for one item
+    is reported and ``None`` is yielded in its place, so the remaining
+    items still get processed; pass an ``errors`` list to collect the
+    failed items, eg, to set the exit status.
+
+    :param func: module-level function to call for each item
+    :param items: input items, eg, file arguments
+    :param args: extra positional arguments for ``func``
+    :param jobs: number of jobs (see ``resolve_jobs()``)
+    :param chunksize: number of items sent to a worker at a time (default
+                      is about 4 chunks per worker)
+    :param errors: list to append failed items to
+    :returns: generator of results
+    """
+    items = list(items)
+    workers = min(resolve_jobs(jobs), len(items))
+
+    if workers <= 1:
+        for item in items:
+            try:
+                yield func(item, *args)
+            except Exception as exc:  # pylint: disable=W0703
+                print(
+                    f'Error processing {item}: {type(exc).__name__}: {exc} Skipping...'
+                )
+                if errors is not None:
+                    errors.append(item)
+                yield None
+        return
+
+    from concurrent.futures import (  # pylint: disable=C0415
+        ProcessPoolExecutor,
+    )
+
+    if not chunksize:
+        chunksize = max(1, len(items) // (workers * 4))
+    tasks = [(func, item, args) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_run_captured, tasks, chunksize=chunksize)
+        for item, (out, result, error) in zip(items, results):
+            sys.stdout.write(out)
+            if error:
+                print(f'Error processing {item}: {error} Skipping...')
+                if errors is not None:
+                    errors.append(item)
+            yield result
+    sys.stdout.flush()
+
+
 def sort_from_parent(input_data: Dict, prog_opts: Dict) -> Dict:
     """
     Sort a list based on whether the target sort key has a parent key.
@@ -262,21 +740,15 @@ def sort_from_parent(input_data: Dict, prog_opts: Dict) -> Dict:
     return input_data
 
 
-def str_yaml_dumper(data: Dict, prog_opts: Dict) -> Any:
+def str_yaml_dumper(data: Dict, prog_opts: Dict, stream: Optional[IO] = None) -> Any:
     """
-    Small StrYAML() dump wrapper.
+    Small StrYAML() dump wrapper using the pooled instance for the config
+    options; writes to ``stream`` if provided, otherwise returns a string.
     """
-    yaml = StrYAML()
-    yaml.indent(
-        mapping=prog_opts['mapping'],
-        sequence=prog_opts['sequence'],
-        offset=prog_opts['offset'],
-    )
-    yaml.preserve_quotes = prog_opts['preserve_quotes']
-    return yaml.dump(data)
+    return get_str_yaml(prog_opts).dump(data, stream)
 
 
-def text_data_writer(outdata: Dict, prog_opts: Dict):
+def text_data_writer(outdata: Any, prog_opts: Dict, stream: Optional[IO] = None):
     """
     Text data writer with optional formatting (default is raw); uses config
     setting for output format. Supports the same text data formats supported
@@ -284,66 +756,231 @@ def text_data_writer(outdata: Dict, prog_opts: Dict):
 
     * csv
     * json
+    * jsonl
     * yaml
     * raw
 
-    Sends formatted data to stdout; redirect to a file as needed.
+    Output is written incrementally, so ``outdata`` can also be a generator
+    (or other iterator) of records, eg, CSV rows, JSON array items, JSON
+    Lines records, or YAML documents (written as a multi-document stream).
+    Set ``compact_output`` in the config to skip JSON key sorting and
+    indenting. Empty CSV output is only written if ``default_csv_hdr``
+    is set (as a header row with no data rows).
 
-    :param outdata: data to be written to stdout
-    :param prog_opts: configuration options
-    """
-    out = ''
-    csv_hdr = prog_opts['default_csv_hdr']
-    delim = prog_opts['csv_delimiter'] if prog_opts['csv_delimiter'] else ';'
-    fmt = prog_opts['output_format'] if prog_opts['output_format'] else 'raw'
+    Sends formatted data to ``stream`` if provided, otherwise to the file
+    given by ``output_path`` in the config, or stdout.
 
-    if fmt == 'csv' and isinstance(outdata, collections.abc.Sequence):
-        field_names = csv_hdr if csv_hdr else list(outdata[0].keys())
-        w = csv.DictWriter(sys.stdout, field_names, delimiter=delim)
+    :param outdata: data (or iterator of records) to be written
+    :param prog_opts: configuration options
+    :param stream: open text stream to write to
+    """
+    if stream is None:
+        with output_stream(prog_opts) as ostream:
+            text_data_writer(outdata, prog_opts, ostream)
+        return
+
+    import csv  # pylint: disable=C0415
+    import json  # pylint: disable=C0415
+
+    csv_hdr = prog_opts.get('default_csv_hdr')
+    delim = prog_opts.get('csv_delimiter') or ';'
+    fmt = prog_opts.get('output_format') or 'raw'
+    compact = bool(prog_opts.get('compact_output'))
+    is_iter = isinstance(outdata, collections.abc.Iterator)
+
+    if fmt == 'csv' and (is_iter or isinstance(outdata, collections.abc.Sequence)):
+        rows = iter(outdata)
+        first = next(rows, None)
+        if first is None and not csv_hdr:
+            return
+        field_names = csv_hdr if csv_hdr else list(first.keys())
+        w = csv.DictWriter(stream, field_names, delimiter=delim)
         w.writeheader()
-        w.writerows(outdata)
+        if first is not None:
+            w.writerow(first)
+            w.writerows(rows)
+
+    elif fmt == 'json':
+        encoder = (
+            json.JSONEncoder(separators=(',', ':'))
+            if compact
+            else json.JSONEncoder(indent=4, sort_keys=True)
+        )
+        if is_iter:
+            _write_json_array(outdata, encoder, stream)
+        else:
+            for chunk in encoder.iterencode(outdata):
+                stream.write(chunk)
+        stream.write('\n')
+
+    elif fmt == 'jsonl':
+        encoder = json.JSONEncoder(separators=(',', ':'), sort_keys=not compact)
+        records = (
+            outdata
+            if is_iter or isinstance(outdata, collections.abc.Sequence)
+            else [outdata]
+        )
+        for record in records:
+            stream.write(encoder.encode(record) + '\n')
+
+    elif fmt == 'yaml':
+        if is_iter:
+            for doc in outdata:
+                stream.write('---\n')
+                str_yaml_dumper(doc, prog_opts, stream)
+        else:
+            str_yaml_dumper(outdata, prog_opts, stream)
+            stream.write('\n')
 
+    elif is_iter:
+        for record in outdata:
+            stream.write(repr(record) + '\n')
     else:
-        if fmt == 'json':
-            out = json.dumps(outdata, indent=4, sort_keys=True)
-        elif fmt == 'yaml':
-            out = str_yaml_dumper(outdata, prog_opts)
-        else:
-            out = repr(outdata)
+        stream.write(repr(outdata) + '\n')
+
+
+def iter_file_records(file: str, prog_opts: Dict) -> Iterator[Any]:
+    """
+    Streaming companion to ``text_file_reader()`` that yields records
+    lazily so a single pass over a large file uses constant memory. The
+    record type depends on the input file:
+
+    * csv - one dict per row
+    * jsonl - one object per (non-empty) line
+    * json - the whole document (JSON has no record boundaries)
+    * yaml - one document at a time, ie, each ``---`` document
+    * ids - one ID string per line
+    * raw text - one line at a time (with line endings)
+
+    The file stays open until the generator is exhausted or closed.
+
+    :param file: filename/path to read
+    :param prog_opts: configuration options
+    :returns: generator of file records
+    :raises FileTypeError: if input file extension is not in EXTENSIONS
+    """
+    infile = Path(file)
+    delim = prog_opts.get('csv_delimiter') or ';'
 
-        sys.stdout.write(out + '\n')
+    if infile.suffix not in EXTENSIONS:
+        msg = f"invalid input file extension: {infile.name}"
+        raise FileTypeError(msg)
+    return _iter_records(infile, delim, prog_opts)
+
+
+def _iter_records(infile: Path, delim: str, prog_opts: Dict) -> Iterator[Any]:
+    """
+    Record generator for ``iter_file_records()`` (split out so the file
+    extension is checked when called rather than on first iteration).
+    """
+    import csv  # pylint: disable=C0415
+    import json  # pylint: disable=C0415
+
+    with infile.open("r", encoding=prog_opts['file_encoding']) as dfile:
+        if infile.suffix == '.csv':
+            yield from csv.DictReader(dfile, delimiter=delim)
+        elif infile.suffix == '.jsonl':
+            for line in dfile:
+                if line.strip():
+                    yield json.loads(line)
+        elif infile.suffix == '.json':
+            yield json.load(dfile)
+        elif infile.suffix in {'.yaml', '.yml'}:
+            yield from yaml_safe_load_all(dfile, prog_opts)
+        elif 'ids' in infile.name and infile.suffix == '.txt':
+            for line in dfile:
+                yield line.rstrip('\r\n')
+        else:
+            yield from dfile
 
 
 def text_file_reader(file: str, prog_opts: Dict) -> Any:
     """
     Text file reader for specific data types including raw text. Tries
-    to handle YAML, JSON, CSV, text files with IDs, and plain ASCII
-    text. Read and parse the file data if ``file`` is one of the
-    expected types and return data objects. For all supported types of
-    data, return a dictionary (or a list if input is a sequence).
+    to handle YAML, JSON, JSON Lines, CSV, text files with IDs, and plain
+    ASCII text. Read and parse the file data if ``file`` is one of the
+    expected types and return data objects (YAML is parsed with the
+    ``yaml_backend`` loader from the config). Parsed YAML and JSON data
+    is stored in the document cache if ``use_cache`` is enabled. For all
+    supported types of data, return a dictionary (or a list if input is a
+    sequence). Use ``iter_file_records()`` to read large files in a single
+    lazy pass.
 
     :param file: filename/path to read
     :param prog_opts: configuration options
     :returns: file data as dict or list
     :raises FileTypeError: if input file extension is not in EXTENSIONS
     """
-    data_in: Any
+    import csv  # pylint: disable=C0415
+    import json  # pylint: disable=C0415
+
     infile = Path(file)
-    delim = prog_opts['csv_delimiter'] if prog_opts['csv_delimiter'] else ';'
+    delim = prog_opts.get('csv_delimiter') or ';'
 
     if infile.suffix not in EXTENSIONS:
         msg = f"invalid input file extension: {infile.name}"
         raise FileTypeError(msg)
-    with infile.open("r", encoding=prog_opts['file_encoding']) as dfile:
+
+    def load_data(dfile: IO) -> Any:
+        data_in: Any
         if infile.suffix == '.csv':
             data_in = list(csv.DictReader(dfile, delimiter=delim))
         elif infile.suffix == '.json':
             data_in = json.load(dfile)
+        elif infile.suffix == '.jsonl':
+            data_in = [json.loads(line) for line in dfile if line.strip()]
         elif infile.suffix in {'.yaml', '.yml'}:
-            data_in = yaml_loader.safe_load(dfile)
+            data_in = yaml_safe_load(dfile, prog_opts)
         elif 'ids' in infile.name and infile.suffix == '.txt':
             data_in = list(dfile.read().splitlines())
         else:
             data_in = dfile.readlines()
+        return data_in
+
+    if cache_enabled(prog_opts) and infile.suffix in CACHE_EXTENSIONS:
+        loader_cfg = f'{get_loader_backend(prog_opts)}:{delim}'
+        return cached_load(infile, prog_opts, load_data, loader_cfg)
+    with infile.open("r", encoding=prog_opts['file_encoding']) as dfile:
+        return load_data(dfile)
+
+
+def yaml_safe_load(stream: IO, prog_opts: Optional[Dict] = None) -> Any:
+    """
+    Safe-load a single YAML document from ``stream`` using the configured
+    loader backend.
+
+    :param stream: open file or string
+    :param prog_opts: configuration options
+    :returns: parsed document
+    """
+    import yaml  # pylint: disable=C0415
+
+    backend = get_loader_backend(prog_opts)
+    if backend == 'libyaml':
+        return yaml.load(stream, Loader=yaml.CSafeLoader)
+    if backend == 'ruamel':
+        from ruamel.yaml import YAML  # pylint: disable=C0415
+
+        return YAML(typ='safe', pure=False).load(stream)
+    return yaml.safe_load(stream)
+
+
+def yaml_safe_load_all(stream: IO, prog_opts: Optional[Dict] = None) -> Iterator[Any]:
+    """
+    Safe-load all YAML documents from ``stream`` (lazily, one at a time)
+    using the configured loader backend.
+
+    :param stream: open file or string
+    :param prog_opts: configuration options
+    :returns: generator of parsed documents
+    """
+    import yaml  # pylint: disable=C0415
+
+    backend = get_loader_backend(prog_opts)
+    if backend == 'libyaml':
+        return yaml.load_all(stream, Loader=yaml.CSafeLoader)
+    if backend == 'ruamel':
+        from ruamel.yaml import YAML  # pylint: disable=C0415
 
-    return data_in
+        return YAML(typ='safe', pure=False).load_all(stream)
+    return yaml.safe_load_all(stream)
@@ -0,0 +1,278 @@
+"""
+Lazy directory walker for finding input files. Directories are read with
+``os.scandir()`` so file types come from the directory entries (no extra
+``stat()`` calls), excluded directories are pruned before they are read,
+and ``.gitignore`` files can optionally be honored. Paths are yielded as
+they are found, sorted by name within each directory, files first.
+"""
+
+import os
+import re
+from collections import deque
+from fnmatch import translate
+from typing import (
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+# VCS, tool, and virtualenv directories that never hold content
+DEFAULT_EXCLUDES = [
+    '.git',
+    '.hg',
+    '.svn',
+    '.tox',
+    '.nox',
+    '.venv',
+    'venv',
+    '__pycache__',
+    '.mypy_cache',
+    '.pytest_cache',
+    'node_modules',
+    '*.egg-info',
+]
+GITIGNORE = '.gitignore'
+READ_AHEAD_CHUNK = 1024 * 1024
+
+Pattern = Callable[[str], Optional[re.Match]]
+
+
+def _compile_globs(globs: Iterable[str]) -> Tuple[Optional[Pattern], Optional[Pattern]]:
+    """
+    Compile globs into one regex for file/directory names and one for
+    relative paths (globs with a ``/``); either may be None.
+    """
+    names = []
+    paths = []
+    for glob in globs:
+        if '/' in glob.strip('/'):
+            paths.append(translate(glob.strip('/')))
+        else:
+            names.append(translate(glob.strip('/')))
+    return (
+        re.compile('|'.join(names)).match if names else None,
+        re.compile('|'.join(paths)).match if paths else None,
+    )
+
+
+def _gitignore_regex(pattern: str) -> str:
+    """
+    Translate one ``.gitignore`` pattern (without negation or trailing
+    slash) into a regex for paths relative to the ``.gitignore`` directory.
+    """
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.lstrip('/')
+    out = [] if anchored else ['(?:.*/)?']
+    idx = 0
+    while idx < len(pattern):
+        char = pattern[idx]
+        if pattern.startswith('**/', idx):
+            out.append('(?:.*/)?')
+            idx += 3
+            continue
+        if pattern.startswith('**', idx):
+            out.append('.*')
+            idx += 2
+            continue
+        if char == '*':
+            out.append('[^/]*')
+        elif char == '?':
+            out.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', idx + 2)
+            if end < 0:
+                out.append(re.escape(char))
+            else:
+                body = pattern[idx + 1 : end].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                idx = end
+        elif char == '\\' and idx + 1 < len(pattern):
+            idx += 1
+            out.append(re.escape(pattern[idx]))
+        else:
+            out.append(re.escape(char))
+        idx += 1
+    return ''.join(out) + r'\Z'
+
+
+class GitIgnore:
+    """
+    Rules from one ``.gitignore`` file; the last matching rule wins, and a
+    ``!`` rule re-includes a path.
+
+    :param base: relative path of the directory holding the file ('' for
+                 the top-level directory)
+    :param lines: lines of the ``.gitignore`` file
+    """
+
+    def __init__(self, base: str, lines: Iterable[str]):
+        self.base = base
+        self.rules: List[Tuple[Pattern, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            line = line.rstrip(' ')
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            pattern = _gitignore_regex(line.rstrip('/'))
+            self.rules.append((re.compile(pattern).match, negate, dir_only))
+
+    @classmethod
+    def read(cls, dirpath: str, base: str) -> Optional['GitIgnore']:
+        """
+        Read the ``.gitignore`` file in ``dirpath`` (if any).
+        """
+        try:
+            with open(os.path.join(dirpath, GITIGNORE), encoding='utf-8') as gfile:
+                rules = cls(base, gfile)
+        except (OSError, UnicodeDecodeError):
+            return None
+        return rules if rules.rules else None
+
+    def ignored(self, relpath: str, is_dir: bool) -> Optional[bool]:
+        """
+        Check a path (relative to the walk root); returns None if no rule
+        matches.
+        """
+        if self.base:
+            if not relpath.startswith(self.base + '/'):
+                return None
+            relpath = relpath[len(self.base) + 1 :]
+        result = None
+        for match, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if match(relpath):
+                result = not negate
+        return result
+
+
+def walk_files(
+    dirpath: str,
+    include: Iterable[str] = ('*',),
+    exclude: Optional[Iterable[str]] = None,
+    gitignore: bool = False,
+    follow_symlinks: bool = False,
+) -> Iterator[str]:
+    """
+    Walk ``dirpath`` and yield the paths (as strings starting with
+    ``dirpath``) of files matching any of the ``include`` globs. Globs
+    without a ``/`` match the file name, others match the path relative
+    to ``dirpath``. Files and directories matching an ``exclude`` glob
+    are skipped, and excluded directories are never read.
+
+    :param dirpath: directory to start the walk
+    :param include: file globs to include
+    :param exclude: globs to exclude (default is DEFAULT_EXCLUDES)
+    :param gitignore: also skip paths ignored by ``.gitignore`` files
+    :param follow_symlinks: descend into symlinked directories
+    :returns: generator of file paths
+    """
+    inc_name, inc_path = _compile_globs(include)
+    exc_name, exc_path = _compile_globs(
+        DEFAULT_EXCLUDES if exclude is None else exclude
+    )
+
+    def excluded(name: str, relpath: str, is_dir: bool, rules: List[GitIgnore]) -> bool:
+        if (exc_name and exc_name(name)) or (exc_path and exc_path(relpath)):
+            return True
+        for rule in reversed(rules):
+            result = rule.ignored(relpath, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    seen = set()
+    stack: List[Tuple[str, str, List[GitIgnore]]] = [(str(dirpath), '', [])]
+    while stack:
+        path, relbase, rules = stack.pop()
+        if gitignore:
+            local = GitIgnore.read(path, relbase)
+            if local is not None:
+                rules = rules + [local]
+        try:
+            with os.scandir(path) as entries:
+                items = sorted(entries, key=lambda x: x.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in items:
+            relpath = f'{relbase}/{entry.name}' if relbase else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+            except OSError:
+                continue
+            if excluded(entry.name, relpath, is_dir, rules):
+                continue
+            if is_dir:
+                if follow_symlinks:
+                    stat = entry.stat()
+                    ident = stat.st_ino, stat.st_dev
+                    if ident in seen:
+                        continue
+                    seen.add(ident)
+                subdirs.append((entry.path, relpath, rules))
+            elif (inc_name and inc_name(entry.name)) or (
+                inc_path and inc_path(relpath)
+            ):
+                yield entry.path
+        stack.extend(reversed(subdirs))
+
+
+def _prefetch(path: str) -> str:
+    """
+    Ask the OS to start reading ``path`` into the page cache (or read it
+    if ``posix_fadvise`` is not available).
+    """
+    try:
+        fdesc = os.open(path, os.O_RDONLY)
+    except OSError:
+        return path
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fdesc, 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            while os.read(fdesc, READ_AHEAD_CHUNK):
+                pass
+    except OSError:
+        pass
+    finally:
+        os.close(fdesc)
+    return path
+
+
+def read_ahead(paths: Iterable[str], depth: int = 8) -> Iterator[str]:
+    """
+    Yield ``paths`` in order while a thread pool opens and prefetches the
+    next ``depth`` files, so file I/O overlaps with the processing of the
+    current file.
+
+    :param paths: file paths, eg, from ``walk_files()``
+    :param depth: number of files to prefetch (0 disables read-ahead)
+    :returns: generator of file paths
+    """
+    if depth <= 0:
+        yield from paths
+        return
+
+    from concurrent.futures import (  # pylint: disable=C0415
+        ThreadPoolExecutor,
+    )
+
+    pending: Deque = deque()
+    with ThreadPoolExecutor(max_workers=min(depth, 4)) as pool:
+        for path in paths:
+            pending.append(pool.submit(_prefetch, path))
+            if len(pending) > depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
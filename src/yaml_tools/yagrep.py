@@ -1,25 +1,121 @@
 """Console script for searching YAML or XML files."""
 
 import argparse
+import re
 import sys
+from functools import lru_cache
+from io import StringIO
+from itertools import chain, islice
 from pathlib import Path
+from typing import List
 
-import dpath
 from munch import Munch
-from nested_lookup import nested_lookup
 
+from .cache import clear_cache
+from .grep_index import SEARCH_EXTENSIONS, GrepIndex, index_files
+from .matching import compile_matcher
+from .query import compile_query, fold_matches, iter_filter, iter_lookup
+from .streaming import (
+    STREAM_EXTENSIONS,
+    XML_EXTENSIONS,
+    stream_search,
+    xml_search_data,
+)
 from .utils import VERSION as __version__
 from .utils import (
     FileTypeError,
+    get_loader_backend,
     load_config,
+    output_stream,
+    resolve_jobs,
+    run_jobs,
     text_data_writer,
     text_file_reader,
 )
+from .walk import DEFAULT_EXCLUDES, read_ahead, walk_files
 
 # pylint: disable=R0801
 
 
-def process_inputs(filepath, grep_args, prog_opts, debug=False):
+@lru_cache(maxsize=None)
+def get_matcher(patterns, regex=False):
+    """
+    Compile (and cache) the filter matcher for a tuple of patterns.
+    """
+    return compile_matcher(patterns, regex)
+
+
+def search_mode(grep_args):
+    """
+    Get the search mode selected by the command line args and the filter
+    matcher (None unless the mode is ``filter``).
+
+    :param grep_args: parsed command line args
+    :return: tuple of mode str and matcher
+    """
+    if grep_args.filter:
+        patterns = (grep_args.text,) + tuple(getattr(grep_args, 'patterns', None) or ())
+        regex = bool(getattr(grep_args, 'regex', False))
+        return 'filter', get_matcher(patterns, regex)
+    return ('lookup' if grep_args.lookup else 'path'), None
+
+
+def search_matches(indata, grep_args, prog_opts):
+    """
+    Search parsed input data using the mode selected by the command line
+    args (path, filter, or lookup) and return a generator of (path, value)
+    matches. Filter searches only test keys and scalar leaves against the
+    TEXT pattern (and any ``-e`` patterns).
+
+    :param indata: parsed input data
+    :param grep_args: parsed command line args
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :return: generator of (path, value) tuples
+    """
+    if grep_args.filter:
+        return iter_filter(indata, search_mode(grep_args)[1])
+    if grep_args.lookup:
+        return iter_lookup(indata, grep_args.text)
+    return compile_query(grep_args.text, prog_opts['default_separator']).search(indata)
+
+
+def write_result(fpath, matches, grep_args, prog_opts, stream, indata=None):
+    """
+    Write the search result for one file; with ``--files-with-matches``
+    or ``--count`` only the file name (or name and count) is written, and
+    the search stops as soon as the answer is known.
+
+    :param fpath: input file path
+    :param matches: generator of (path, value) matches
+    :param grep_args: parsed command line args
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :param stream: open output stream
+    :param indata: parsed input data (needed for filter results)
+    """
+    if stream is None:
+        with output_stream(prog_opts) as ostream:
+            write_result(fpath, matches, grep_args, prog_opts, ostream, indata)
+        return
+    max_count = getattr(grep_args, 'max_count', None)
+    if max_count:
+        matches = islice(matches, max_count)
+    if getattr(grep_args, 'files_with_matches', False):
+        if next(matches, None) is not None:
+            stream.write(f'{fpath}\n')
+    elif getattr(grep_args, 'count', False):
+        stream.write(f'{fpath}:{sum(1 for _ in matches)}\n')
+    elif grep_args.filter:
+        text_data_writer(fold_matches(indata, matches), prog_opts, stream)
+    else:
+        result = (value for _, value in matches)
+        if prog_opts.get('output_format') not in ('json', 'jsonl'):
+            result = list(result)  # type: ignore[assignment]
+        text_data_writer(result, prog_opts, stream)
+
+
+def process_inputs(filepath, grep_args, prog_opts, debug=False, stream=None):
     """
     Handle file arguments and process them. Return any input data for use
     with ``dpath`` search.
@@ -29,20 +125,11 @@ def process_inputs(filepath, grep_args, prog_opts, debug=False):
     :param prog_opts: configuration options
     :type prog_opts: dict
     :param debug: enable extra processing info
+    :param stream: open output stream (default is ``output_path`` or stdout)
     :return: data and source type boolean or None
     :handles FileTypeError: if input file is not yaml or xml
     """
-
-    def glob_filter(x):
-        """
-        Basic search glob to use with dpath functions.
-        """
-        if grep_args.text in str(x):
-            return True
-        return False
-
     fpath = Path(filepath)
-    path_sep = prog_opts['default_separator']
 
     if not fpath.exists():
         print(f'Input file {fpath} not found! Skipping...')
@@ -50,22 +137,116 @@ def process_inputs(filepath, grep_args, prog_opts, debug=False):
         if debug:
             print(f'Searching in {fpath}...')
 
+        if getattr(grep_args, 'stream', False) and fpath.suffix in STREAM_EXTENSIONS:
+            mode = 'lookup' if grep_args.lookup else 'path'
+            values = stream_search(fpath, grep_args.text, mode, prog_opts)
+            matches = ((None, value) for value in values)
+            write_result(filepath, matches, grep_args, prog_opts, stream)
+            return None
+
         try:
-            indata = text_file_reader(fpath, prog_opts)
+            if fpath.suffix in XML_EXTENSIONS:
+                mode, matcher = search_mode(grep_args)
+                indata = xml_search_data(
+                    fpath, mode, grep_args.text, prog_opts, matcher
+                )
+            else:
+                indata = text_file_reader(fpath, prog_opts)
         except FileTypeError as exc:
             print(f'{exc} => {fpath}')
             return None
         if debug:
             print(indata)
 
-        if grep_args.filter:
-            result = dpath.search(indata, '**', afilter=glob_filter, separator=path_sep)
-        elif grep_args.lookup:
-            result = nested_lookup(grep_args.text, indata)
+        matches = search_matches(indata, grep_args, prog_opts)
+        write_result(filepath, matches, grep_args, prog_opts, stream, indata)
+
+
+def process_index(dirpath, grep_args, prog_opts, debug=False, stream=None):
+    """
+    Search all files in an indexed directory, using the stored data for
+    files that have not changed since the index was built and skipping
+    files that cannot match. Files that are new or newer than the index
+    (and XML files, which are not indexed) are searched with a live scan
+    instead.
+
+    :param dirpath: indexed directory
+    :type dirpath: str
+    :param grep_args: parsed command line args
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :param debug: enable extra processing info
+    :param stream: open output stream (default is ``output_path`` or stdout)
+    """
+    index = GrepIndex.load(dirpath, prog_opts)
+    if not index.exists:
+        print(f'No index found for {dirpath}; use --build-index first! Skipping...')
+        return
+
+    mode, matcher = search_mode(grep_args)
+    candidates = index.candidates(
+        grep_args.text, mode, prog_opts['default_separator'], matcher
+    )
+    for fpath in index_files(index.root, prog_opts):
+        relpath = fpath.relative_to(index.root).as_posix()
+        if fpath.suffix in XML_EXTENSIONS:
+            process_inputs(fpath, grep_args, prog_opts, debug, stream)
+            continue
+        if not index.is_current(relpath):
+            if debug:
+                print(f'{fpath} is newer than the index')
+            process_inputs(fpath, grep_args, prog_opts, debug, stream)
+            continue
+        if debug:
+            print(f'Searching index for {fpath}...')
+        if candidates is not None and relpath not in candidates:
+            indata = {}
         else:
-            result = dpath.values(indata, grep_args.text, separator=path_sep)
+            indata = index.document(relpath)
+        matches = search_matches(indata, grep_args, prog_opts)
+        write_result(fpath, matches, grep_args, prog_opts, stream, indata)
+
+
+def recursive_inputs(dirpaths, grep_args, prog_opts):
+    """
+    Walk the ``-r`` directories and return a generator of the files to
+    search, using the ``--include`` globs (default is all YAML/JSON/XML files)
+    and skipping ``--exclude`` globs plus the ``walk_exclude`` config list.
+
+    :param dirpaths: directories to search
+    :param grep_args: parsed command line args
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :return: generator of file paths
+    """
+    include = getattr(grep_args, 'include', None) or [
+        f'*{ext}' for ext in SEARCH_EXTENSIONS
+    ]
+    exclude = prog_opts.get('walk_exclude')
+    if getattr(grep_args, 'exclude', None):
+        exclude = (DEFAULT_EXCLUDES if exclude is None else exclude) + grep_args.exclude
+    gitignore = bool(
+        getattr(grep_args, 'gitignore', False) or prog_opts.get('walk_gitignore')
+    )
+    return chain.from_iterable(
+        walk_files(dirpath, include, exclude, gitignore) for dirpath in dirpaths
+    )
+
+
+def grep_file(filepath, grep_args, prog_opts, debug=False):
+    """
+    Search one file and return the formatted output data as a string
+    (used as the worker function for parallel jobs).
 
-        text_data_writer(result, prog_opts)
+    :param filepath: filename as path str
+    :param grep_args: parsed command line args
+    :param prog_opts: configuration options
+    :param debug: enable extra processing info
+    :return: output data str
+    """
+    ostream = StringIO()
+    process_inputs(filepath, grep_args, prog_opts, debug, stream=ostream)
+    return ostream.getvalue()
 
 
 def main(argv=None):  # pragma: no cover
@@ -74,6 +255,10 @@ def main(argv=None):  # pragma: no cover
     """
     if argv is None:
         argv = sys.argv
+    if '--daemon' in argv[1:]:
+        from .daemon import client_main  # pylint: disable=C0415
+
+        client_main(Path(__file__).stem, argv)
 
     cfg, pfile = load_config(Path(__file__).stem)
     popts = Munch.toDict(cfg)
@@ -85,10 +270,20 @@ def main(argv=None):  # pragma: no cover
             may return empty results without a path or wildcard. Use
             the filter argument to find the path(s) to a key using a
             substring search.''',
-        usage='%(prog)s [-h] [--version] [-v] [-d] [-s] [-f | -l] TEXT FILE [FILE ...]',
+        usage='%(prog)s [-h] [--version] [--daemon] [-v] [-d] [-s] [--no-cache] [--clear-cache] '
+        '[-j N] [--stream] [--build-index DIR] [--index DIR] [-e PATTERN] '
+        '[--regex] [-m N] [--files-with-matches | -c] [-r DIR] [--include GLOB] '
+        '[--exclude GLOB] [--gitignore] [-f | -l] TEXT FILE [FILE ...]',
     )
     parser.add_argument(
-        "--version", action="version", version=f"%(prog)s {__version__}"
+        "--version",
+        action="version",
+        version=f"%(prog)s {__version__} (yaml loader: {get_loader_backend(popts)})",
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run in the background daemon (started on demand) to save startup time',
     )
     parser.add_argument(
         "-v",
@@ -110,6 +305,105 @@ def main(argv=None):  # pragma: no cover
         dest="save",
         help='save active config to default filename (.yagrep.yml) and exit',
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        dest="use_cache",
+        help='Do not use the parsed document cache',
+    )
+    parser.add_argument(
+        '--clear-cache',
+        action='store_true',
+        dest="clear_cache",
+        help='Remove all parsed document cache entries and exit',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        metavar="N",
+        type=int,
+        default=1,
+        help='Number of files to process in parallel (0 means one per CPU)',
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Search YAML/JSON files as a stream of parser events with memory '
+        'bounded by document depth (path and lookup searches only)',
+    )
+    parser.add_argument(
+        '--build-index',
+        metavar="DIR",
+        type=str,
+        dest="build_index",
+        help='Build or update the search index for files in DIR and exit',
+    )
+    parser.add_argument(
+        '--index',
+        metavar="DIR",
+        type=str,
+        dest="index",
+        help='Search files in DIR using the index (instead of FILE args)',
+    )
+    parser.add_argument(
+        '-e',
+        '--regexp',
+        metavar="PATTERN",
+        action='append',
+        dest="patterns",
+        help='Additional filter pattern (can be repeated; matches any pattern)',
+    )
+    parser.add_argument(
+        '--regex',
+        action='store_true',
+        help='Treat filter patterns as regular expressions',
+    )
+    parser.add_argument(
+        '-m',
+        '--max-count',
+        metavar="N",
+        type=int,
+        dest="max_count",
+        help='Stop searching a file after N matches',
+    )
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        '--files-with-matches',
+        action='store_true',
+        dest="files_with_matches",
+        help='Only print the names of files with at least one match',
+    )
+    output.add_argument(
+        '-c',
+        '--count',
+        action='store_true',
+        help='Only print the number of matches in each file',
+    )
+    parser.add_argument(
+        '-r',
+        '--recursive',
+        metavar="DIR",
+        action='append',
+        dest="recursive",
+        help='Search all YAML/JSON/XML files under DIR (can be repeated)',
+    )
+    parser.add_argument(
+        '--include',
+        metavar="GLOB",
+        action='append',
+        help='Only search files matching GLOB with -r (can be repeated)',
+    )
+    parser.add_argument(
+        '--exclude',
+        metavar="GLOB",
+        action='append',
+        help='Skip files and directories matching GLOB with -r (can be repeated)',
+    )
+    parser.add_argument(
+        '--gitignore',
+        action='store_true',
+        help='Skip files ignored by .gitignore files with -r',
+    )
     group = parser.add_mutually_exclusive_group()
     group.add_argument(
         "-f",
@@ -148,17 +442,69 @@ def main(argv=None):  # pragma: no cover
     if args.dump:
         sys.stdout.write(pfile.read_text(encoding=popts['file_encoding']))
         sys.exit(0)
+    if args.clear_cache:
+        print(f'Clearing cache in {clear_cache(popts)}')
+        sys.exit(0)
+    if not args.use_cache:
+        popts['use_cache'] = False
+    if args.build_index:
+        if not Path(args.build_index).is_dir():
+            parser.error(f'index path {args.build_index} is not a directory')
+        stats = GrepIndex.load(args.build_index, popts).update(debug=args.verbose)
+        print(
+            f"Indexed {stats['files']} files in {args.build_index} "
+            f"({stats['updated']} updated, {stats['removed']} removed)"
+        )
+        sys.exit(0)
     # we need to help argparse here, since it has trouble parsing the 2
     # postional args as required when both are missing, even with help from
     # nargs behavior (we also need customized usage msg above to replace the
     # default error text with the following print() statement)
-    if not args.file or not args.text:
+    if not (args.file or args.index or args.recursive) or not args.text:
         parser.print_usage()
         print("yagrep: error: the following arguments are required: TEXT *and* FILE")
         sys.exit(1)
 
-    for filearg in args.file:
-        process_inputs(filearg, args, popts, args.verbose)
+    if args.stream and args.filter:
+        parser.error('--stream does not support filter searches')
+    if (args.patterns or args.regex) and not args.filter:
+        parser.error('-e and --regex require a filter search (-f)')
+    if args.max_count is not None and args.max_count < 1:
+        parser.error('--max-count must be a positive number')
+    if args.regex:
+        try:
+            get_matcher((args.text,) + tuple(args.patterns or ()), True)
+        except re.error as exc:
+            parser.error(f'invalid regex: {exc}')
+    if not (args.filter or args.lookup):
+        try:
+            compile_query(args.text, popts['default_separator'])
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    if args.recursive:
+        for dirpath in args.recursive:
+            if not Path(dirpath).is_dir():
+                parser.error(f'recursive search path {dirpath} is not a directory')
+    files = args.file
+    if args.recursive:
+        files = chain(args.file, recursive_inputs(args.recursive, args, popts))
+
+    errors: List = []
+    with output_stream(popts) as ostream:
+        if args.index:
+            process_index(args.index, args, popts, args.verbose, stream=ostream)
+        elif resolve_jobs(args.jobs) > 1:
+            pargs = (args, popts, args.verbose)
+            for data in run_jobs(
+                grep_file, files, pargs, jobs=args.jobs, errors=errors
+            ):
+                ostream.write(data or '')
+        else:
+            for filearg in read_ahead(files, popts.get('read_ahead', 0)):
+                process_inputs(filearg, args, popts, args.verbose, stream=ostream)
+    if errors:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -3,18 +3,20 @@
 import argparse
 import sys
 from pathlib import Path
+from typing import List
 
 from munch import Munch
-from ruamel.yaml import YAML
 
+from .jinja import JINJA_START, jinja_yaml
+from .manifest import BuildManifest, OutputFile
+from .sorting import SortSpec, find_unsorted_key, sort_mapping_keys
 from .utils import VERSION as __version__
 from .utils import (
     FileTypeError,
-    StrYAML,
+    get_str_yaml,
     load_config,
-    replace_angles,
-    replace_curlys,
-    sort_from_parent,
+    run_jobs,
+    yaml_safe_load_all,
 )
 
 # pylint: disable=R0801
@@ -22,9 +24,9 @@ from .utils import (
 
 def get_input_yaml(filepath, prog_opts):
     """
-    Check filename extension, open and munge the contents, return data
-    (where in this context we "munge" the curly braces to make it valid
-    YAML).
+    Check filename extension, open and load the contents, return data.
+    Jinja ``{{{ }}}`` scalars (which are not valid YAML) are loaded as
+    plain strings. Use ``iter_input_yaml()`` for multi-document files.
 
     :param filepath: filename as Path obj
     :param prog_opts: configuration options
@@ -33,80 +35,262 @@ def get_input_yaml(filepath, prog_opts):
     :raises FileTypeError: if the input file is not yaml
     """
 
+    from ruamel.yaml import YAML  # pylint: disable=C0415
+
     data_in = None
-    yaml = YAML()
+    yaml = jinja_yaml(YAML())
 
     if filepath.name.lower().endswith(('.yml', '.yaml')):
         with open(filepath, encoding=prog_opts['file_encoding']) as f_path:
             file_data = f_path.read()
-        munged_data = replace_curlys(str(file_data))
-        data_in = yaml.load(munged_data)
+        data_in = yaml.load(file_data)
     else:
         raise FileTypeError("FileTypeError: unknown input file extension")
     return data_in
 
 
+def iter_input_yaml(filepath, prog_opts, safe=False):
+    """
+    Check filename extension and get the documents in a (multi-document)
+    YAML file. Documents are loaded lazily, one at a time, as they are
+    consumed, so only one of them needs to be in memory. Jinja ``{{{ }}}``
+    scalars (which are not valid YAML) are loaded as plain strings.
+
+    :param filepath: filename as Path obj
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :param safe: use the (faster) safe loader, eg, when the formatting
+                 does not matter
+    :return: generator of documents
+    :raises FileTypeError: if the input file is not yaml
+    """
+    if not filepath.name.lower().endswith(('.yml', '.yaml')):
+        raise FileTypeError("FileTypeError: unknown input file extension")
+    return _load_documents(filepath, prog_opts, safe)
+
+
+def _load_documents(filepath, prog_opts, safe):
+    """
+    Load the documents in ``filepath`` one at a time; the safe loader is
+    only replaced by the (slower) pure Python one if the file has Jinja
+    scalars.
+    """
+    from ruamel.yaml import YAML  # pylint: disable=C0415
+
+    encoding = prog_opts['file_encoding']
+    jinja = True
+    if safe:
+        with open(filepath, encoding=encoding) as f_path:
+            jinja = any(JINJA_START in line for line in f_path)
+    with open(filepath, encoding=encoding) as f_path:
+        if not safe:
+            yield from jinja_yaml(YAML()).load_all(f_path)
+        elif jinja:
+            yield from jinja_yaml(YAML(typ='safe', pure=True)).load_all(f_path)
+        else:
+            yield from yaml_safe_load_all(f_path, prog_opts)
+
+
+def get_sort_spec(prog_opts):
+    """
+    Get the compiled sort spec from the ``sort_spec`` config option, or
+    make a one-target spec from the parent/sort key options if it is not
+    set.
+
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :return: compiled sort spec
+    :raises ValueError: if the sort spec is invalid
+    """
+    spec = prog_opts.get('sort_spec')
+    if not spec:
+        skey_name = prog_opts['default_sort_key']
+        path = skey_name
+        if prog_opts['has_parent_key']:
+            path = f"{prog_opts['default_parent_key']}/*/{skey_name}"
+        spec = [{'path': path}]
+    return SortSpec(spec, prog_opts.get('default_separator') or '/')
+
+
+def sort_data(payload, prog_opts):
+    """
+    Sort the lists in the sort spec (and the mapping keys, if ``sort_keys``
+    is set) in place, in a single pass over the data.
+
+    :param payload: Dict obj representing YAML input data
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :return: number of lists (and mappings) sorted
+    """
+    count = get_sort_spec(prog_opts).sort(payload)
+    if prog_opts.get('sort_keys'):
+        count += sort_mapping_keys(payload)
+    return count
+
+
 def sort_list_data(payload, prog_opts):
     """
     Set YAML formatting and sort keys from config, produce output data
-    from input dict-ish object.
+    from input dict-ish object. All the lists in the sort spec are sorted
+    in a single pass over the data.
 
     :param payload: Dict obj representing YAML input data
     :param prog_opts: configuration options
     :type prog_opts: dict
-    :return res: yaml dump of sorted input
+    :return res: yaml dump of sorted input, or None if there is nothing
+                 to sort
     """
-    yaml = StrYAML()
-    yaml.indent(
-        mapping=prog_opts['mapping'],
-        sequence=prog_opts['sequence'],
-        offset=prog_opts['offset'],
-    )
-    yaml.preserve_quotes = prog_opts['preserve_quotes']
+    if not sort_data(payload, prog_opts):
+        return None
+
+    return get_str_yaml(prog_opts, jinja=True).dump(payload)
+
+
+def sort_documents(docs, prog_opts, stream, debug=False):
+    """
+    Sort each document and write it to ``stream`` before the next one is
+    loaded; documents after the first one start with ``---``.
+
+    :param docs: iterable of documents, eg, from ``iter_input_yaml()``
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :param stream: open text stream to write to
+    :param debug: enable extra processing info
+    :return: number of lists (and mappings) sorted
+    """
+    yaml = get_str_yaml(prog_opts, jinja=True)
+    count = 0
+    for idx, doc in enumerate(docs):
+        if debug:
+            print(doc)
+        count += sort_data(doc, prog_opts)
+        if idx:
+            stream.write('---\n')
+        yaml.dump(doc, stream)
+    return count
+
 
-    payload_sorted = sort_from_parent(payload, prog_opts)
+def find_unsorted(payload, prog_opts):
+    """
+    Find the first out-of-order item in the list(s) that ``yasort`` would
+    sort; checking stops at the first item that sorts before the one
+    above it.
+
+    :param payload: Dict obj representing YAML input data
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :return: tuple of item path, previous item, and item, or None if the
+             list(s) (and mapping keys with ``sort_keys``) are sorted
+    """
+    spec = get_sort_spec(prog_opts)
+    found = spec.find_unsorted(payload)
+    if found is None and prog_opts.get('sort_keys'):
+        found = find_unsorted_key(payload, spec.separator)
+    return found
+
+
+def check_inputs(filepath, prog_opts, debug=False):
+    """
+    Check whether the list(s) in a file are already sorted, without any
+    output. The file is parsed with the (faster) safe loader since the
+    formatting does not matter here (files with Jinja ``{{{ }}}`` scalars
+    use the pure Python safe loader). Print the path of the first item out
+    of order, if any.
+
+    :param filepath: filename as Path obj
+    :param prog_opts: configuration options
+    :type prog_opts: dict
+    :param debug: enable extra processing info
+    :return: True if sorted, False if not (or the file was skipped)
+    :handles FileTypeError: if input file is not yml
+    """
+    fpath = Path(filepath)
 
-    return yaml.dump(payload_sorted)
+    if not fpath.exists():
+        print(f'Input file {fpath} not found! Skipping...')
+        return False
+    try:
+        docs = iter_input_yaml(fpath, prog_opts, safe=True)
+    except FileTypeError as exc:
+        print(f'{exc} => {fpath}')
+        return False
+    if debug:
+        print(f'Checking data in {fpath}')
+
+    spec = get_sort_spec(prog_opts)
+    has_lists = False
+    for idx, indata in enumerate(docs):
+        has_keys = prog_opts.get('sort_keys') and isinstance(indata, dict)
+        if not has_keys and next(spec.lists(indata), None) is None:
+            continue
+        has_lists = True
+        found = find_unsorted(indata, prog_opts)
+        if found is not None:
+            path, prev, item = found
+            where = f'{fpath} (document {idx + 1})' if idx else fpath
+            print(f'{where}: {path} is out of order ({item!r} sorts before {prev!r})')
+            return False
+    if not has_lists:
+        print(f'No lists to sort in {fpath}! Skipping...')
+        return False
+    if debug:
+        print(f'{fpath} is sorted')
+    return True
 
 
-def process_inputs(filepath, prog_opts, debug=False):
+def process_inputs(filepath, prog_opts, debug=False, manifest=None):
     """
     Handle file arguments and process them. Write new (sorted) files to
-    the 'sorted-out/' directory in the current working directory.
+    the 'sorted-out/' directory in the current working directory; files
+    are only written if the content changed. With a build ``manifest``,
+    inputs whose output is up to date are skipped (including inputs with
+    no lists to sort, which are recorded without an output).
 
     :param filepath: filename as Path obj
     :param prog_opts: configuration options
     :type prog_opts: dict
     :param debug: enable extra processing info
-    :return None:
+    :param manifest: build manifest for the output directory
+    :return: manifest record for the output, or None
     :handles FileTypeError: if input file is not yml
     """
 
     fpath = Path(filepath)
     opath = Path(prog_opts['output_dirname']).joinpath(fpath.stem)
+    new_opath = opath.with_suffix(prog_opts['default_yml_ext'])
 
     if not fpath.exists():
         print(f'Input file {fpath} not found! Skipping...')
+    elif manifest is not None and manifest.is_current(fpath, new_opath):
+        if debug:
+            print(f'{new_opath} is up to date')
     else:
         if debug:
             print(f'Processing data from {fpath}')
 
+        in_state = manifest.input_state(fpath) if manifest is not None else None
         try:
-            indata = get_input_yaml(fpath, prog_opts)
+            docs = iter_input_yaml(fpath, prog_opts)
         except FileTypeError as exc:
             print(f'{exc} => {fpath}')
-            return
-        if debug:
-            print(indata)
-
-        outdata = sort_list_data(indata, prog_opts)
+            return None
 
-        restored_data = replace_angles(outdata)
-
-        new_opath = opath.with_suffix(prog_opts['default_yml_ext'])
         if debug:
             print(f'Writing processed data to {new_opath}')
-        new_opath.write_text(restored_data, encoding=prog_opts['file_encoding'])
+        with OutputFile(new_opath, prog_opts['file_encoding']) as ofile:
+            count = sort_documents(docs, prog_opts, ofile, debug)
+            if not count:
+                ofile.discard()
+        if not count:
+            print(f'No lists to sort in {fpath}! Skipping...')
+        elif debug and not ofile.changed:
+            print(f'{new_opath} is unchanged')
+        if manifest is not None:
+            digest = ofile.digest if count else None
+            return manifest.record(
+                fpath, new_opath, digest=digest, input_state=in_state
+            )
+    return None
 
 
 def main(argv=None):  # pragma: no cover
@@ -116,6 +300,10 @@ def main(argv=None):  # pragma: no cover
     debug = False
     if argv is None:
         argv = sys.argv
+    if '--daemon' in argv[1:]:
+        from .daemon import client_main  # pylint: disable=C0415
+
+        client_main(Path(__file__).stem, argv)
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         description='Sort YAML lists and write new files.',
@@ -123,6 +311,11 @@ def main(argv=None):  # pragma: no cover
     parser.add_argument(
         "--version", action="version", version=f"%(prog)s {__version__}"
     )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run in the background daemon (started on demand) to save startup time',
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -143,6 +336,31 @@ def main(argv=None):  # pragma: no cover
         dest="save",
         help='save active config to default filename (.yasort.yml) and exit',
     )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        metavar="N",
+        type=int,
+        default=1,
+        help='Number of files to process in parallel (0 means one per CPU)',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Skip input files whose output is up to date (uses a build manifest)',
+    )
+    parser.add_argument(
+        '--sort-keys',
+        action='store_true',
+        dest="sort_keys",
+        help='Also sort the keys of all mappings (comments stay with their keys)',
+    )
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help='Only check whether the list(s) are sorted (no output files); exit '
+        'non-zero and show the first unsorted item for any unsorted files',
+    )
     parser.add_argument(
         'file',
         nargs='*',
@@ -170,11 +388,33 @@ def main(argv=None):  # pragma: no cover
     if not args.file:
         parser.print_help()
         sys.exit(1)
+    if args.sort_keys:
+        popts['sort_keys'] = True
+    try:
+        get_sort_spec(popts)
+    except ValueError as exc:
+        parser.error(f'invalid sort_spec: {exc}')
+    errors: List = []
+    if args.check:
+        results = run_jobs(
+            check_inputs, args.file, (popts, debug), jobs=args.jobs, errors=errors
+        )
+        sys.exit(0 if all(list(results)) and not errors else 1)
     if debug:
         print(f'Creating output directory {outdir}')
     Path(outdir).mkdir(exist_ok=True)
-    for filearg in args.file:
-        process_inputs(filearg, popts, debug=debug)
+    manifest = None
+    if args.incremental or popts.get('incremental'):
+        manifest = BuildManifest.load(outdir, Path(__file__).stem, popts)
+    pargs = (popts, debug, manifest)
+    results = run_jobs(process_inputs, args.file, pargs, jobs=args.jobs, errors=errors)
+    if manifest is not None:
+        manifest.update(results)
+    else:
+        for _ in results:
+            pass
+    if errors:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -12,17 +12,21 @@ xmltodict docs for details.
 import argparse
 import sys
 from pathlib import Path
+from typing import List
 
-import xmltodict
-import yaml as yaml_loader
 from munch import Munch
 
+from .cache import cache_enabled, cached_load, clear_cache
+from .manifest import BuildManifest, write_output
 from .utils import VERSION as __version__
 from .utils import (
     FileTypeError,
+    get_loader_backend,
     load_config,
     restore_xml_comments,
+    run_jobs,
     str_yaml_dumper,
+    yaml_safe_load,
 )
 
 
@@ -41,10 +45,20 @@ def get_input_type(filepath, prog_opts):
     data_in = None
 
     if filepath.name.lower().endswith(('.yml', '.yaml')):
-        with filepath.open() as infile:
-            data_in = yaml_loader.safe_load(infile)
+        if cache_enabled(prog_opts):
+            data_in = cached_load(
+                filepath,
+                prog_opts,
+                lambda infile: yaml_safe_load(infile, prog_opts),
+                get_loader_backend(prog_opts),
+            )
+        else:
+            with filepath.open(encoding=prog_opts['file_encoding']) as infile:
+                data_in = yaml_safe_load(infile, prog_opts)
         to_xml = True
     elif filepath.name.lower().endswith('.xml'):
+        import xmltodict  # pylint: disable=C0415
+
         with filepath.open('r+b') as infile:
             data_in = xmltodict.parse(
                 infile, process_comments=prog_opts['process_comments']
@@ -67,6 +81,8 @@ def transform_data(payload, prog_opts, to_xml=True):
     """
     res = ''
     if to_xml:
+        import xmltodict  # pylint: disable=C0415
+
         xml = xmltodict.unparse(
             payload,
             short_empty_elements=prog_opts['short_empty_elements'],
@@ -83,9 +99,11 @@ def transform_data(payload, prog_opts, to_xml=True):
     return res
 
 
-def process_inputs(filepath, prog_opts, outpath=None, debug=False):
+def process_inputs(filepath, prog_opts, outpath=None, debug=False, manifests=None):
     """
-    Handle file arguments and process them.
+    Handle file arguments and process them; output files are only written
+    if the content changed. With build ``manifests``, inputs whose output
+    is up to date are skipped.
 
     :param filepath: filename as Path obj
     :param prog_opts: configuration options
@@ -93,35 +111,53 @@ def process_inputs(filepath, prog_opts, outpath=None, debug=False):
     :param outpath: output file name/path if provided
     :type outpath: str
     :param debug: enable extra processing info
-    :return None:
+    :param manifests: build manifests keyed by output directory str
+    :type manifests: dict
+    :return: manifest record for the output, or None
     :handles FileTypeError: input file is not xml or yml
     """
     fpath = Path(filepath)
     opath = Path(outpath) if outpath else fpath
+    manifest = manifests.get(str(opath.parent)) if manifests else None
+
+    if fpath.name.lower().endswith(('.yml', '.yaml')):
+        new_opath = opath.with_suffix(prog_opts['default_xml_ext'])
+    else:
+        new_opath = opath.with_suffix(prog_opts['default_yml_ext'])
 
     if not fpath.exists():
         print(f'Input file {fpath} not found! Skipping...')
+    elif manifest is not None and manifest.is_current(fpath, new_opath):
+        if debug:
+            print(f'{new_opath} is up to date')
     else:
         if debug:
             print(f'Processing data from {fpath}')
 
+        in_state = manifest.input_state(fpath) if manifest is not None else None
         try:
             from_yml, indata = get_input_type(fpath, prog_opts)
         except FileTypeError as exc:
             print(f'{exc} => {fpath}')
-            return
-
-        outdata = transform_data(indata, prog_opts, to_xml=from_yml)
-
-        if from_yml:
-            new_opath = opath.with_suffix(prog_opts['default_xml_ext'])
-            outdata = outdata + '\n'
-        else:
-            new_opath = opath.with_suffix(prog_opts['default_yml_ext'])
+            return None
 
         if debug:
             print(f'Writing processed data to {new_opath}')
-        new_opath.write_text(outdata, encoding=prog_opts['file_encoding'])
+        if from_yml:
+            outdata = transform_data(indata, prog_opts, to_xml=True) + '\n'
+        else:
+            outdata = str_yaml_dumper(indata, prog_opts)
+        if not write_output(new_opath, outdata, prog_opts['file_encoding']):
+            if debug:
+                print(f'{new_opath} is unchanged')
+        if manifest is not None:
+            return manifest.record(
+                fpath,
+                new_opath,
+                outdata.encode(prog_opts['file_encoding']),
+                input_state=in_state,
+            )
+    return None
 
 
 def main(argv=None):  # pragma: no cover
@@ -131,12 +167,25 @@ def main(argv=None):  # pragma: no cover
     debug = False
     if argv is None:
         argv = sys.argv
+    if '--daemon' in argv[1:]:
+        from .daemon import client_main  # pylint: disable=C0415
+
+        client_main(Path(__file__).stem, argv)
+    pcfg, pfile = load_config()
+    popts = Munch.toDict(pcfg)
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         description='Transform YAML to XML and XML to YAML',
     )
     parser.add_argument(
-        "--version", action="version", version=f"%(prog)s {__version__}"
+        "--version",
+        action="version",
+        version=f"%(prog)s {__version__} (yaml loader: {get_loader_backend(popts)})",
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run in the background daemon (started on demand) to save startup time',
     )
     parser.add_argument(
         "-v",
@@ -158,6 +207,26 @@ def main(argv=None):  # pragma: no cover
         dest="save",
         help='save active config to default filename (.ymltoxml.yml) and exit',
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        dest="use_cache",
+        help='Do not use the parsed document cache',
+    )
+    parser.add_argument(
+        '--clear-cache',
+        action='store_true',
+        dest="clear_cache",
+        help='Remove all parsed document cache entries and exit',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        metavar="N",
+        type=int,
+        default=1,
+        help='Number of files to process in parallel (0 means one per CPU)',
+    )
     parser.add_argument(
         '-i',
         '--infile',
@@ -174,6 +243,11 @@ def main(argv=None):  # pragma: no cover
         type=str,
         help="Path to single output file (use with --infile)",
     )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Skip input files whose output is up to date (uses a build manifest)',
+    )
     parser.add_argument(
         'file',
         nargs='*',
@@ -190,9 +264,8 @@ def main(argv=None):  # pragma: no cover
         parser.error("missing infile argument")
     if args.verbose:
         debug = True
-
-    pcfg, pfile = load_config(debug=debug)
-    popts = Munch.toDict(pcfg)
+    if debug:
+        print(f'Using config: {str(pfile.resolve())}')
 
     if args.save:
         cfg_data = pfile.read_bytes()
@@ -203,16 +276,35 @@ def main(argv=None):  # pragma: no cover
         sys.stdout.write(pfile.read_text(encoding=popts['file_encoding']))
         sys.stdout.flush()
         sys.exit(0)
+    if args.clear_cache:
+        print(f'Clearing cache in {clear_cache(popts)}')
+        sys.exit(0)
+    if not args.use_cache:
+        popts['use_cache'] = False
+
+    manifests = {}
+    if args.incremental or popts.get('incremental'):
+        outputs = [args.outfile or args.infile] if args.infile else []
+        for outdir in {str(Path(x).parent) for x in outputs + args.file}:
+            manifests[outdir] = BuildManifest.load(outdir, 'ymltoxml', popts)
+    records = []
+    errors: List = []
 
     if args.infile:
-        if args.outfile:
-            process_inputs(args.infile, popts, args.outfile, debug=debug)
-        else:
-            process_inputs(args.infile, popts, debug=debug)
+        records.append(
+            process_inputs(args.infile, popts, args.outfile, debug, manifests)
+        )
 
     if args.file:
-        for filearg in args.file:
-            process_inputs(filearg, popts, debug=debug)
+        pargs = (popts, None, debug, manifests)
+        records.extend(
+            run_jobs(process_inputs, args.file, pargs, jobs=args.jobs, errors=errors)
+        )
+
+    for manifest in manifests.values():
+        manifest.update(records)
+    if errors:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,175 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from yaml_tools.cache import (
+    MEMORY_CACHE,
+    DocumentCache,
+    MemoryCache,
+    cached_load,
+    clear_cache,
+    get_cache_dir,
+)
+from yaml_tools.utils import StrYAML, text_file_reader
+
+defconfig_str = """\
+# comments should be preserved
+file_encoding: 'utf-8'
+use_cache: true
+cache_dir: null
+cache_max_size: null
+csv_delimiter: null
+"""
+
+
+def test_get_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert get_cache_dir() == tmp_path / 'yaml-tools'
+    assert get_cache_dir({'cache_dir': str(tmp_path / 'cache')}) == tmp_path / 'cache'
+
+
+def test_cache_get_put(tmp_path):
+    src = tmp_path / "in.yaml"
+    src.write_text("id: ac-1\n", encoding="utf-8")
+    cache = DocumentCache(tmp_path / 'cache')
+    key = cache.make_key(src, src.read_bytes(), 'libyaml')
+
+    assert cache.get(key) == (False, None)
+    cache.put(key, {'id': 'ac-1'})
+    assert cache.get(key) == (True, {'id': 'ac-1'})
+    assert key != cache.make_key(src, src.read_bytes(), 'python')
+
+    src.write_text("id: ac-2\n", encoding="utf-8")
+    assert key != cache.make_key(src, src.read_bytes(), 'libyaml')
+
+    cache.clear()
+    assert not cache.cache_dir.exists()
+
+
+def test_cache_corrupt_entry(tmp_path):
+    cache = DocumentCache(tmp_path)
+    (tmp_path / 'bogus.pickle').write_bytes(b'not a pickle')
+    assert cache.get('bogus') == (False, None)
+    assert not (tmp_path / 'bogus.pickle').exists()
+
+
+def test_cache_evict(tmp_path):
+    cache = DocumentCache(tmp_path, max_size=0)
+    cache.put('first', list(range(100)))
+    assert list(tmp_path.iterdir()) == []
+
+    cache.max_size = 10000
+    for idx, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, list(range(100)))
+        os.utime(tmp_path / f'{key}.pickle', ns=(idx, idx))
+    cache.get('a')
+    cache.max_size = (tmp_path / 'a.pickle').stat().st_size * 2
+    cache.evict()
+    assert sorted(x.name for x in tmp_path.iterdir()) == ['a.pickle', 'c.pickle']
+    assert cache.size == cache.max_size
+
+
+def test_cache_size_tracking(tmp_path, monkeypatch):
+    scans = []
+    cache = DocumentCache(tmp_path, max_size=10000)
+    monkeypatch.setattr(
+        cache, 'evict', lambda *args: scans.append(args) or DocumentCache.evict(cache)
+    )
+    for key in ['a', 'b', 'c']:
+        cache.put(key, list(range(100)))
+    assert len(scans) == 1
+    assert cache.size == sum(x.stat().st_size for x in tmp_path.iterdir())
+    cache.max_size = cache.size
+    cache.put('d', list(range(100)))
+    assert len(scans) == 2
+
+
+def test_cached_load(tmp_path):
+    calls = []
+    popts = {'file_encoding': 'utf-8', 'cache_dir': tmp_path / 'cache'}
+    src = tmp_path / "in.txt"
+    src.write_text("one\r\ntwo\n", encoding="utf-8")
+
+    def loader(stream):
+        calls.append(stream)
+        return stream.readlines()
+
+    assert cached_load(src, popts, loader, 'raw') == ['one\n', 'two\n']
+    assert cached_load(src, popts, loader, 'raw') == ['one\n', 'two\n']
+    assert len(calls) == 1
+    assert calls[0].name == str(src)
+    popts['file_encoding'] = 'latin-1'
+    assert cached_load(src, popts, loader, 'raw') == ['one\n', 'two\n']
+    assert len(calls) == 2
+    assert clear_cache(popts) == tmp_path / 'cache'
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_file_reader_cached_error(tmp_path):
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+    popts['cache_dir'] = str(tmp_path / 'cache')
+    bad = tmp_path / 'bad.yaml'
+    bad.write_text('a: [1\n', encoding='utf-8')
+
+    with pytest.raises(Exception, match='bad.yaml'):
+        text_file_reader(bad, popts)
+
+
+def test_memory_cache():
+    cache = MemoryCache()
+    cache.put('a', [1, 2])
+    assert cache.get('a') == (False, None)
+
+    cache.max_size = 200
+    cache.put('a', [1, 2])
+    hit, data = cache.get('a')
+    assert (hit, data) == (True, [1, 2])
+    data.append(3)
+    assert cache.get('a') == (True, [1, 2])
+    cache.put('b', b'b' * 60)
+    cache.put('c', b'c' * 60)
+    cache.get('a')
+    cache.put('d', b'd' * 100)
+    assert list(cache.entries) == ['a', 'd']
+    assert cache.size == sum(len(x) for x in cache.entries.values())
+    cache.put('big', b'x' * 1000)
+    assert 'big' not in cache.entries
+    cache.clear()
+    assert cache.size == 0 and not cache.entries
+
+
+def test_cached_load_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(MEMORY_CACHE, 'max_size', 1024 * 1024)
+    monkeypatch.setattr(MEMORY_CACHE, 'entries', type(MEMORY_CACHE.entries)())
+    calls = []
+    popts = {'file_encoding': 'utf-8', 'cache_dir': tmp_path / 'cache'}
+    src = tmp_path / "in.txt"
+    src.write_text("one\n", encoding="utf-8")
+
+    def loader(stream):
+        calls.append(stream)
+        return stream.readlines()
+
+    assert cached_load(src, popts, loader, 'raw') == ['one\n']
+    clear_cache(popts)
+    assert cached_load(src, popts, loader, 'raw') == ['one\n']
+    assert len(calls) == 1
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_file_reader_cached(tmp_path):
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+    popts['cache_dir'] = str(tmp_path)
+
+    for file in ['tests/data/catalog.yaml', 'tests/data/catalog.json']:
+        cold = text_file_reader(file, popts)
+        warm = text_file_reader(file, popts)
+        assert cold == warm
+    assert len(list(Path(tmp_path).iterdir())) == 2
+
+    popts['use_cache'] = False
+    text_file_reader('tests/data/controls.yml', popts)
+    assert len(list(Path(tmp_path).iterdir())) == 2
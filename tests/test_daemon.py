@@ -0,0 +1,116 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from yaml_tools import cache, daemon
+
+pytestmark = pytest.mark.skipif(not daemon.supported(), reason='no fd passing')
+
+LAUNCHER = (
+    "import sys; from yaml_tools.daemon import yagrep_main; "
+    "sys.argv[0] = 'yagrep'; sys.exit(yagrep_main())"
+)
+
+
+@pytest.fixture
+def runtime_dir(tmp_path, monkeypatch):
+    rdir = tmp_path / 'run'
+    rdir.mkdir(mode=0o700)
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(rdir))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return rdir
+
+
+def test_socket_path(runtime_dir, monkeypatch):
+    path = daemon.socket_path()
+    assert path.parent == runtime_dir / 'yaml-tools'
+    assert path.name.startswith('daemon-') and path.suffix == '.sock'
+    assert daemon.socket_path() == path
+    link = runtime_dir / 'python'
+    link.symlink_to(os.path.realpath(sys.executable))
+    monkeypatch.setattr(sys, 'executable', str(link))
+    assert daemon.socket_path() == path
+    path.parent.chmod(0o755)
+    with pytest.raises(OSError):
+        daemon.socket_path()
+
+
+def test_request_roundtrip(tmp_path):
+    request = {'tool': 'yagrep', 'argv': ['yagrep', '-l', 'id'], 'env': {'A': 'é'}}
+    dfile = tmp_path / 'out.txt'
+    left, right = socket.socketpair(socket.AF_UNIX)
+    with left, right, dfile.open('w', encoding='utf-8') as ofile:
+        daemon.send_request(left, request, [ofile.fileno()])
+        data, fds = daemon.recv_request(right)
+        assert data == request
+        assert len(fds) == 1
+        os.write(fds[0], b'passed')
+        os.close(fds[0])
+    assert dfile.read_text(encoding='utf-8') == 'passed'
+
+
+def test_serve_idle_shutdown(runtime_dir, monkeypatch):
+    monkeypatch.setattr(daemon, 'PRELOAD', [])
+    monkeypatch.setattr(cache.MEMORY_CACHE, 'max_size', 0)
+    path = daemon.socket_path()
+    server = daemon.Daemon(path, idle_timeout=0.5)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.01)
+    assert daemon.send_command('status') == os.getpid()
+    # a second daemon for the same socket exits right away
+    daemon.Daemon(path, idle_timeout=0.5).serve()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert not path.exists()
+    assert daemon.send_command('status') is None
+
+
+def run_tool(args, cwd):
+    proc = subprocess.run(
+        [sys.executable, '-c', LAUNCHER] + args,
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        check=False,
+    )
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ['-f', 'AC-'],
+        ['-c', '-l', 'id', 'controls.yml', 'missing.yml'],
+        ['-f', '--regex', '(', 'controls.yml'],
+        ['--version'],
+        [],
+    ],
+)
+def test_daemon_matches_one_shot(args, runtime_dir, tmp_path):
+    work = tmp_path / 'work'
+    work.mkdir()
+    src = os.path.join(os.path.dirname(__file__), 'data', 'controls.yml')
+    work.joinpath('controls.yml').write_bytes(open(src, 'rb').read())
+    if args[:2] == ['-f', 'AC-']:
+        args = args + ['controls.yml']
+    try:
+        expected = run_tool(args, work)
+        assert run_tool(['--daemon'] + args, work) == expected
+        # again with the warm daemon
+        assert run_tool(args + ['--daemon'], work) == expected
+        assert daemon.send_command('status') is not None
+    finally:
+        subprocess.run(
+            [sys.executable, '-m', 'yaml_tools.daemon', '--stop'],
+            capture_output=True,
+            check=False,
+        )
@@ -0,0 +1,189 @@
+import os
+
+import pytest
+from munch import Munch
+
+from yaml_tools.grep_index import (
+    GrepIndex,
+    index_dir,
+    index_files,
+    iter_locations,
+)
+from yaml_tools.utils import StrYAML
+from yaml_tools.yagrep import process_index, process_inputs
+
+defconfig_str = """\
+file_encoding: 'utf-8'
+default_separator: '/'
+input_format: null
+output_format: 'json'
+csv_delimiter: null
+default_csv_hdr: null
+preserve_quotes: true
+process_comments: false
+use_cache: false
+cache_dir: null
+mapping: 4
+sequence: 6
+offset: 4
+"""
+
+controls_str = """\
+id: srg_gpos
+levels:
+- id: high
+- id: low
+controls:
+    -   id: Variables
+        title: Variables
+        rules:
+            - var_sshd_disable_compression=no
+            - sshd_approved_macs=stig
+"""
+
+profile_str = """\
+name: example
+settings:
+    mapping: 4
+    rules: [1, 2]
+"""
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    content = tmp_path / 'content'
+    content.joinpath('sub').mkdir(parents=True)
+    content.joinpath('controls.yaml').write_text(controls_str, encoding='utf-8')
+    content.joinpath('sub', 'profile.yml').write_text(profile_str, encoding='utf-8')
+    content.joinpath('notes.txt').write_text('not indexed', encoding='utf-8')
+    popts = StrYAML().load(defconfig_str)
+    popts['cache_dir'] = str(tmp_path / 'cache')
+    return content, popts
+
+
+def test_index_files(corpus):
+    content, popts = corpus
+    assert [x.name for x in index_files(content)] == ['controls.yaml', 'profile.yml']
+    assert index_dir(content, popts).parent.name == 'yagrep-index'
+
+
+def test_index_files_walk(corpus, capfd):
+    content, popts = corpus
+    content.joinpath('.git').mkdir()
+    content.joinpath('.git', 'skip.yaml').write_text(profile_str, encoding='utf-8')
+    content.joinpath('ignored').mkdir()
+    content.joinpath('ignored', 'skip.yaml').write_text(profile_str, encoding='utf-8')
+    content.joinpath('.gitignore').write_text('ignored/\n', encoding='utf-8')
+    content.joinpath('data.xml').write_text(
+        '<data><rules>stig</rules></data>\n', encoding='utf-8'
+    )
+    popts['walk_gitignore'] = True
+    names = [x.relative_to(content).as_posix() for x in index_files(content, popts)]
+    assert names == ['controls.yaml', 'data.xml', 'sub/profile.yml']
+
+    index = GrepIndex.load(content, popts)
+    assert index.update()['files'] == 2
+    args = Munch(text='stig', filter=True, lookup=False)
+    for fpath in index_files(content, popts):
+        process_inputs(fpath, args, popts)
+    live, _ = capfd.readouterr()
+    process_index(content, args, popts)
+    out, _ = capfd.readouterr()
+    assert '"rules": "stig"' in out
+    assert out == live
+
+
+def test_iter_locations():
+    locs = list(iter_locations({'a': [1, {'b': 'x'}]}))
+    assert (('a',), 'a', True) in locs
+    assert (('a', 0), 1, False) in locs
+    assert (('a', 1, 'b'), 'b', True) in locs
+    assert (('a', 1, 'b'), 'x', False) in locs
+
+
+def test_build_and_update(corpus):
+    content, popts = corpus
+    index = GrepIndex.load(content, popts)
+    assert not index.exists
+    assert index.update() == {'files': 2, 'updated': 2, 'removed': 0}
+    assert index.exists
+
+    index = GrepIndex.load(content, popts)
+    assert sorted(index.files) == ['controls.yaml', 'sub/profile.yml']
+    assert index.find_key('rules') == {
+        'controls.yaml': [('controls', 0, 'rules')],
+        'sub/profile.yml': [('settings', 'rules')],
+    }
+    assert index.find_value('macs') == {
+        'controls.yaml': [('controls', 0, 'rules', 1)],
+    }
+    assert index.document('sub/profile.yml')['settings']['rules'] == [1, 2]
+    assert index.update() == {'files': 2, 'updated': 0, 'removed': 0}
+
+    # same content with a new mtime is not parsed again
+    ctl = content / 'controls.yaml'
+    stat = ctl.stat()
+    os.utime(ctl, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not index.is_current('controls.yaml')
+    assert index.update()['updated'] == 0
+    assert index.is_current('controls.yaml')
+
+    content.joinpath('sub', 'profile.yml').unlink()
+    ctl.write_text(controls_str.replace('stig', 'cis'), encoding='utf-8')
+    assert index.update() == {'files': 1, 'updated': 1, 'removed': 1}
+    assert index.find_value('stig') == {}
+    assert index.find_key('settings') == {}
+    assert len(list(index.path.joinpath('docs').glob('*.pickle'))) == 1
+
+
+def test_candidates(corpus):
+    content, popts = corpus
+    index = GrepIndex.load(content, popts)
+    index.update()
+    assert index.candidates('settings', 'lookup') == {'sub/profile.yml'}
+    assert index.candidates('nope', 'lookup') == set()
+    assert index.candidates('macs', 'filter') == {'controls.yaml'}
+    assert index.candidates("', '", 'filter') == set()
+    assert index.candidates(' macs', 'filter') == set()
+    assert index.candidates('high', 'filter', matcher=lambda x: x.isdigit()) == {
+        'sub/profile.yml'
+    }
+    assert index.candidates('controls/*/rules', 'path') == {'controls.yaml'}
+    assert index.candidates('**/rules', 'path') == {'controls.yaml', 'sub/profile.yml'}
+    assert index.candidates('*/0', 'path') is None
+
+
+@pytest.mark.parametrize(
+    "text,filt,lookup",
+    [
+        ("rules", False, True),
+        ("mapping", False, True),
+        ("stig", True, False),
+        ("4", True, False),
+        ("': ", True, False),
+        ("**/rules", False, False),
+        ("controls/*/id", False, False),
+    ],
+)
+def test_process_index(corpus, capfd, text, filt, lookup):
+    content, popts = corpus
+    args = Munch(text=text, filter=filt, lookup=lookup)
+    for fpath in index_files(content):
+        process_inputs(fpath, args, popts)
+    live, _ = capfd.readouterr()
+
+    process_index(content, args, popts)
+    out, _ = capfd.readouterr()
+    assert 'No index found' in out
+
+    GrepIndex.load(content, popts).update()
+    process_index(content, args, popts)
+    out, _ = capfd.readouterr()
+    assert out == live
+
+    # files newer than the index fall back to a live scan
+    content.joinpath('new.yaml').write_text(profile_str, encoding='utf-8')
+    process_index(content, args, popts, debug=True)
+    out, _ = capfd.readouterr()
+    assert 'new.yaml is newer than the index' in out
+    assert 'Searching index for' in out
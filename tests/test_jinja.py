@@ -0,0 +1,63 @@
+from io import StringIO
+
+import pytest
+from ruamel.yaml import YAML
+from ruamel.yaml.comments import CommentedSeq
+
+from yaml_tools.jinja import JinjaScalar, jinja_yaml
+from yaml_tools.utils import StrYAML, get_str_yaml
+
+jinja_str = """\
+title: Ensure {{{ full_name }}} is set  # macro inside
+{{{ key_macro() }}}: 1
+rules:
+- {{{ xccdf_value("var_x") }}}
+- b
+- '{{{ quoted }}}'
+- {a: 1}
+desc: |-
+  {{{ block }}}
+last: {{{ end }}}
+"""
+
+popts_str = """\
+mapping: 2
+sequence: 2
+offset: 0
+preserve_quotes: true
+"""
+
+
+def test_jinja_roundtrip():
+    data = jinja_yaml(YAML()).load(jinja_str)
+    assert data['rules'][0] == '{{{ xccdf_value("var_x") }}}'
+    assert isinstance(data['rules'][0], JinjaScalar)
+    assert isinstance(data['last'], JinjaScalar)
+    assert not isinstance(data['rules'][2], JinjaScalar)
+    assert data['rules'][3] == {'a': 1}
+
+    popts = StrYAML().load(popts_str)
+    yaml = get_str_yaml(popts, jinja=True)
+    assert yaml is get_str_yaml(popts, jinja=True)
+    assert yaml is not get_str_yaml(popts)
+    assert yaml.dump(data) == jinja_str
+
+
+def test_jinja_safe_and_errors():
+    data = jinja_yaml(YAML(typ='safe', pure=True)).load(jinja_str)
+    assert data['rules'][:2] == ['{{{ xccdf_value("var_x") }}}', 'b']
+    # flow context is still plain YAML
+    data = jinja_yaml(YAML()).load('a: [{{{ x }}}]\n')
+    assert isinstance(data['a'][0], dict)
+    # without the jinja support, macros are (unhashable) flow mappings
+    with pytest.raises(Exception):
+        YAML(typ='safe', pure=True).load('- {{{ x }}}\n')
+
+
+def test_jinja_dump_quoted():
+    flow = CommentedSeq([JinjaScalar('{{{ x }}}')])
+    flow.fa.set_flow_style()
+    data = {'a': JinjaScalar('{{{ x }}}: y'), 'b': JinjaScalar('{{{ x }}}'), 'c': flow}
+    out = StringIO()
+    jinja_yaml(YAML()).dump(data, out)
+    assert out.getvalue() == "a: '{{{ x }}}: y'\nb: {{{ x }}}\nc: ['{{{ x }}}']\n"
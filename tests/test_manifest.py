@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+from yaml_tools.manifest import (
+    MANIFEST_NAME,
+    BuildManifest,
+    OutputFile,
+    config_digest,
+    hash_bytes,
+    write_output,
+)
+
+popts = {'file_encoding': 'utf-8', 'mapping': 4}
+
+
+def test_write_output(tmp_path):
+    out = tmp_path / 'out.yaml'
+    assert write_output(out, 'a: 1\n')
+    assert out.read_text(encoding='utf-8') == 'a: 1\n'
+    out.chmod(0o640)
+    mtime = out.stat().st_mtime_ns
+    assert not write_output(out, 'a: 1\n')
+    assert out.stat().st_mtime_ns == mtime
+    assert write_output(out, 'a: 2\n')
+    assert out.read_text(encoding='utf-8') == 'a: 2\n'
+    assert out.stat().st_mode & 0o777 == 0o640
+    assert [x.name for x in tmp_path.iterdir()] == ['out.yaml']
+
+
+def test_output_file(tmp_path):
+    out = tmp_path / 'out.yaml'
+    with OutputFile(out) as ofile:
+        ofile.write('a: 1\n')
+        ofile.write('b: é\n')
+    assert ofile.changed
+    assert ofile.digest == hash_bytes('a: 1\nb: é\n'.encode('utf-8'))
+    mtime = out.stat().st_mtime_ns
+    with OutputFile(out) as ofile:
+        ofile.write('a: 1\nb: é\n')
+    assert not ofile.changed
+    assert out.stat().st_mtime_ns == mtime
+    with OutputFile(out) as ofile:
+        ofile.write('a: 2\n')
+        ofile.discard()
+    with pytest.raises(ValueError):
+        with OutputFile(out) as ofile:
+            ofile.write('a: 3\n')
+            raise ValueError('bad input')
+    assert out.read_text(encoding='utf-8') == 'a: 1\nb: é\n'
+    assert sorted(tmp_path.iterdir()) == [out]
+
+
+def test_config_digest():
+    digest = config_digest('yasort', popts)
+    assert digest == config_digest('yasort', dict(popts))
+    assert digest != config_digest('ymltoxml', popts)
+    assert digest != config_digest('yasort', dict(popts, mapping=2))
+
+
+def test_manifest_roundtrip(tmp_path):
+    inp = tmp_path / 'in.yaml'
+    inp.write_text('a: 1\n', encoding='utf-8')
+    outdir = tmp_path / 'out'
+    outdir.mkdir()
+    out = outdir / 'in.yaml'
+
+    manifest = BuildManifest.load(outdir, 'yasort', popts)
+    assert not manifest.is_current(inp, out)
+    write_output(out, 'a: 1\n')
+    manifest.update([None, manifest.record(inp, out, b'a: 1\n')])
+    assert json.loads(outdir.joinpath(MANIFEST_NAME).read_text())['version'] == 1
+
+    manifest = BuildManifest.load(outdir, 'yasort', popts)
+    assert manifest.is_current(inp, out)
+    # a new mtime with the same content is still current
+    os.utime(inp, ns=(1, 1))
+    assert manifest.is_current(inp, out)
+    assert not BuildManifest.load(outdir, 'yasort', dict(popts, mapping=2)).is_current(
+        inp, out
+    )
+    inp.write_text('a: 2\n', encoding='utf-8')
+    assert not manifest.is_current(inp, out)
+    inp.write_text('a: 1\n', encoding='utf-8')
+    out.write_text('a: 3\n', encoding='utf-8')
+    assert not manifest.is_current(inp, out)
+    out.unlink()
+    assert not manifest.is_current(inp, out)
+
+    # the input state is taken before the input is read
+    state = manifest.input_state(inp)
+    inp.write_text('a: 4\n', encoding='utf-8')
+    write_output(out, 'a: 1\n')
+    manifest.update([manifest.record(inp, out, b'a: 1\n', input_state=state)])
+    assert not manifest.is_current(inp, out)
+
+    # an input with no output is current while there is no output file
+    out.unlink()
+    manifest.update([manifest.record(inp, out)])
+    assert manifest.is_current(inp, out)
+    out.write_text('a: 3\n', encoding='utf-8')
+    assert not manifest.is_current(inp, out)
+
+    outdir.joinpath(MANIFEST_NAME).write_text('{not json', encoding='utf-8')
+    assert BuildManifest.load(outdir, 'yasort', popts).entries == {}
@@ -0,0 +1,64 @@
+import re
+
+import pytest
+
+from yaml_tools.matching import (
+    AC_MIN_PATTERNS,
+    AhoCorasick,
+    compile_matcher,
+)
+
+patterns = ['he', 'she', 'his', 'hers', 'sshd', 'auditd', 'macs', 'stig', 'rhel8']
+
+testdata = [
+    ('ushers', True),
+    ('sshd_approved_macs=stig', True),
+    ('var_auditd_action', True),
+    ('login_banner_text=dod_banners', False),
+    ('', False),
+    ('rhl8', False),
+    ('rhel8', True),
+]
+
+
+@pytest.mark.parametrize("text,expected", testdata)
+def test_aho_corasick(text, expected):
+    automaton = AhoCorasick(patterns)
+    assert automaton(text) is expected
+    assert automaton(text) == any(x in text for x in patterns)
+
+
+def test_aho_corasick_find():
+    automaton = AhoCorasick(['abcd', 'bc', 'xyz'])
+    assert automaton.find('zabcde') == 'bc'
+    assert automaton.find('xxyz') == 'xyz'
+    assert automaton.find('abd') is None
+    with pytest.raises(ValueError):
+        AhoCorasick([])
+    with pytest.raises(ValueError):
+        AhoCorasick(['a', ''])
+
+
+@pytest.mark.parametrize("num", [1, 2, AC_MIN_PATTERNS, len(patterns)])
+@pytest.mark.parametrize("text,expected", testdata)
+def test_compile_matcher(num, text, expected):
+    matcher = compile_matcher(patterns[:num])
+    assert bool(matcher(text)) == any(x in text for x in patterns[:num])
+    if num == len(patterns):
+        assert isinstance(matcher, AhoCorasick)
+        assert matcher(text) is expected
+
+
+def test_compile_matcher_regex():
+    matcher = compile_matcher([r'^var_\w+=\d+$', 'stig$'], regex=True)
+    assert matcher('var_auditd_space_left_percentage=25')
+    assert matcher('sshd_approved_macs=stig')
+    assert not matcher('var_auditd_space_left_percentage=25pc')
+    with pytest.raises(re.error):
+        compile_matcher(['('], regex=True)
+
+
+def test_compile_matcher_empty():
+    assert compile_matcher(['abc', ''])('xyz')
+    with pytest.raises(ValueError):
+        compile_matcher([])
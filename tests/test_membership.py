@@ -0,0 +1,60 @@
+from yaml_tools.membership import IdMembership, id_key, popcount
+from yaml_tools.templates import ControlId
+
+
+def test_id_key():
+    assert id_key('AC-2(1)') is id_key('ac-02.01')
+    assert isinstance(id_key('ac-2.1'), ControlId)
+    assert id_key('Variables') == 'Variables'
+
+
+def test_popcount():
+    assert popcount(0) == 0
+    assert popcount(0b1011) == 3
+    assert popcount(1 << 1000) == 1
+
+
+def test_membership_exact():
+    engine = IdMembership()
+    low = engine.add_set('low', ['AC-2(1)', 'Variables'])
+    assert engine.contains(low, 'AC-2(1)')
+    assert not engine.contains(low, 'ac-02.01')
+    assert engine.add_set(1, ['ac-02.01']) == 0b100
+    assert engine.compare(1, 'low')['num_missing'] == 1
+
+
+def test_membership_sets():
+    engine = IdMembership(['ac-1', 'ac-2'], fold_ids=True)
+    assert engine.ids == ['ac-1', 'ac-2']
+    low = engine.add_set('low', ['ac-1', 'ac-2'])
+    high = engine.add_set('high', ['AC-1', 'AC-2', 'AC-2(1)', 'Variables'])
+    assert low == 0b11
+    assert high == 0b1111
+    assert engine.members(high & ~low) == ['AC-2(1)', 'Variables']
+    assert engine.contains(high, 'ac-02.01')
+    assert not engine.contains(low, 'ac-2.1')
+    assert not engine.contains(low, 'bogus')
+
+    result = engine.compare('low', 'high')
+    assert result['subset']
+    assert result['size'] == 2
+    assert result['other_size'] == 4
+    assert result['num_common'] == 2
+    assert result['num_missing'] == 0
+
+    matrix = engine.matrix(['high'])
+    assert list(matrix['high']) == ['low']
+    assert not matrix['high']['low']['subset']
+    assert matrix['high']['low']['num_missing'] == 2
+
+
+def test_membership_profiles():
+    engine = IdMembership.from_profile_index()
+    in_ids = engine.respell(['AC-2(1)', 'AC-1', 'XX-99'])
+    assert in_ids == ['ac-2.1', 'ac-1', 'XX-99']
+    engine.add_set('input', in_ids)
+    matrix = engine.matrix(['input'])['input']
+    assert sorted(matrix) == ['HIGH', 'LOW', 'MODERATE', 'PRIVACY']
+    assert matrix['HIGH']['num_common'] == 2
+    assert engine.members(matrix['HIGH']['missing']) == ['XX-99']
+    assert engine.compare('LOW', 'HIGH')['subset']
@@ -1,6 +1,10 @@
 import csv
+import io
 import json
+import os
+import subprocess
 import sys
+import threading
 from difflib import SequenceMatcher as SM
 from pathlib import Path
 
@@ -8,19 +12,33 @@ import pytest
 from munch import Munch
 from natsort import os_sorted
 
-from yaml_tools import utils
-from yaml_tools.templates import ID_TEMPLATE, generate_control, xform_id
+from yaml_tools import templates, utils
+from yaml_tools.templates import (
+    ID_CACHE_SIZE,
+    ID_TEMPLATE,
+    ControlId,
+    generate_control,
+    id_sort_key,
+    xform_id,
+    xform_ids,
+)
 from yaml_tools.utils import (
     PROFILE_NAMES,
     FileTypeError,
     SortedSet,
     StrYAML,
     get_filelist,
+    get_loader_backend,
     get_profile_ids,
     get_profile_type,
+    get_str_yaml,
+    iter_file_records,
     load_config,
     process_template,
     pystache_render,
+    resolve_jobs,
+    run_jobs,
+    str_yaml_dumper,
     text_data_writer,
     text_file_reader,
 )
@@ -124,6 +142,72 @@ def test_data_writer_csv(capfd):
     # print(out3)
 
 
+def test_data_writer_csv_empty(capfd):
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+    popts['output_format'] = 'csv'
+    popts['csv_delimiter'] = ';'
+
+    for data in ([], iter([])):
+        text_data_writer(data, popts)
+        out, _ = capfd.readouterr()
+        assert out == ''
+
+    popts['default_csv_hdr'] = ['id', 'title']
+    for data in ([], iter([])):
+        text_data_writer(data, popts)
+        out, _ = capfd.readouterr()
+        assert out.splitlines() == ['id;title']
+
+
+def test_data_writer_streaming(capfd):
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+    rows = [{'id': f'AC-{x}', 'num': x} for x in range(1, 4)]
+
+    text_data_writer(iter(rows), popts)
+    out, _ = capfd.readouterr()
+    assert out == json.dumps(rows, indent=4, sort_keys=True) + '\n'
+
+    text_data_writer(iter([]), popts)
+    out, _ = capfd.readouterr()
+    assert json.loads(out) == []
+
+    popts['compact_output'] = True
+    text_data_writer((x for x in rows), popts)
+    out, _ = capfd.readouterr()
+    assert out == json.dumps(rows, separators=(',', ':')) + '\n'
+
+    popts['output_format'] = 'jsonl'
+    text_data_writer(iter(rows), popts)
+    out, _ = capfd.readouterr()
+    assert [json.loads(x) for x in out.splitlines()] == rows
+
+    popts['output_format'] = 'csv'
+    text_data_writer(iter(rows), popts)
+    out, _ = capfd.readouterr()
+    assert list(csv.DictReader(out.splitlines())) == [
+        {'id': x['id'], 'num': str(x['num'])} for x in rows
+    ]
+
+    popts['output_format'] = 'yaml'
+    text_data_writer(iter(rows), popts)
+    out, _ = capfd.readouterr()
+    assert list(yaml.load_all(out)) == rows
+
+
+def test_data_writer_output_path(capfd, tmp_path):
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+    data = yaml.load(yaml_str)
+    popts['output_path'] = str(tmp_path / 'out.json')
+
+    text_data_writer(data, popts)
+    out, _ = capfd.readouterr()
+    assert out == ''
+    assert json.loads(Path(popts['output_path']).read_text()) == data
+
+
 def test_file_reader(capfd, tmp_path):
     yaml = StrYAML()
     popts = yaml.load(defconfig_str)
@@ -152,6 +236,53 @@ def test_file_reader(capfd, tmp_path):
     assert sim_12 > 0.9
 
 
+def test_iter_file_records(tmp_path):
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+
+    for file in ['tests/data/catalog.csv', 'tests/data/OE-expanded-profile-ids.txt']:
+        records = iter_file_records(file, popts)
+        assert not isinstance(records, list)
+        assert list(records) == text_file_reader(file, popts)
+
+    json_data = text_file_reader('tests/data/catalog.json', popts)
+    assert list(iter_file_records('tests/data/catalog.json', popts)) == [json_data]
+
+    jsonl = tmp_path / "catalog.jsonl"
+    jsonl.write_text(
+        '\n'.join(json.dumps(x) for x in json_data) + '\n\n', encoding="utf-8"
+    )
+    assert list(iter_file_records(jsonl, popts)) == json_data
+    assert text_file_reader(jsonl, popts) == json_data
+
+    multi = tmp_path / "multi.yaml"
+    multi.write_text("---\nid: ac-1\n---\nid: ac-2\n", encoding="utf-8")
+    docs = iter_file_records(multi, popts)
+    assert next(docs) == {'id': 'ac-1'}
+    assert next(docs) == {'id': 'ac-2'}
+
+    with pytest.raises(FileTypeError):
+        iter_file_records(tmp_path / "in.ymml", popts)
+
+
+@pytest.mark.parametrize("backend", ['auto', 'libyaml', 'ruamel', 'python'])
+def test_file_reader_backends(backend):
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+    expected = text_file_reader('tests/data/catalog.yaml', popts)
+
+    popts['yaml_backend'] = backend
+    assert get_loader_backend(popts) in {'libyaml', 'ruamel', 'python'}
+    assert text_file_reader('tests/data/catalog.yaml', popts) == expected
+
+
+def test_loader_backend_raises():
+    assert get_loader_backend() in {'libyaml', 'python'}
+    assert get_loader_backend({'yaml_backend': 'python'}) == 'python'
+    with pytest.raises(ValueError):
+        get_loader_backend({'yaml_backend': 'bogus'})
+
+
 def test_file_reader_raises(capfd, tmp_path):
     yaml = StrYAML()
     popts = yaml.load(defconfig_str)
@@ -173,6 +304,9 @@ def test_get_profile_ids():
     assert out[0][0] == 'HIGH'
     assert isinstance(out[0][1], list)
 
+    popts['file_encoding'] = 'ascii'
+    assert get_profile_ids(popts) == out
+
 
 def test_get_profile_type_good():
     good = 'HIGH-ids.txt'
@@ -202,6 +336,117 @@ def test_sorted_set():
     assert list(s3) == expected
 
 
+def test_sorted_set_algebra():
+    s1 = SortedSet(['ac-02', 'ac-01', 'ac-10', 'ac-02'])
+    s2 = SortedSet(['ac-10', 'ac-01'])
+    assert len(s1) == 3
+    assert list(s1) == ['ac-02', 'ac-01', 'ac-10']
+    assert s1 > s2
+    assert s2 < s1
+    assert not s2 > s1
+    assert list(s1 - s2) == ['ac-02']
+    assert list(s1 | ['ac-03']) == ['ac-02', 'ac-01', 'ac-10', 'ac-03']
+    assert list(s1 ^ s2) == ['ac-02']
+    assert s1 == {'ac-01', 'ac-02', 'ac-10'}
+    assert isinstance(s1 & s2, SortedSet)
+    assert s1.natsort() == ('ac-01', 'ac-02', 'ac-10')
+    assert s1.natsort() is s1.natsort()
+
+
+def test_sorted_set_unhashable():
+    ctl1 = {'id': 'ac-1', 'levels': ['high', 'low']}
+    ctl2 = {'levels': ['high', 'low'], 'id': 'ac-1'}
+    ctl3 = {'id': 'ac-2', 'levels': ['low', 'high']}
+    s1 = SortedSet([ctl1, ctl2, ctl3, ['a', 'b']])
+    assert len(s1) == 3
+    assert ctl2 in s1
+    assert ['a', 'b'] in s1
+    assert ['b', 'a'] not in s1
+    assert list(s1 & [ctl3]) == [ctl3]
+    assert s1.isdisjoint([{'id': 'ac-3'}])
+
+
+def _job_worker(item, scale):
+    if item == 3:
+        raise ValueError('bad item')
+    print(f'item {item}')
+    return item * scale
+
+
+@pytest.mark.parametrize('cpus', [1, 2])
+def test_run_jobs(capfd, monkeypatch, cpus):
+    monkeypatch.setattr(utils, 'available_cpus', lambda: cpus)
+    items = list(range(1, 6))
+    results = list(run_jobs(_job_worker, items, (10,), jobs=0, chunksize=2))
+    out, _ = capfd.readouterr()
+    assert results == [10, 20, None, 40, 50]
+    assert out.splitlines() == [
+        'item 1',
+        'item 2',
+        'Error processing 3: ValueError: bad item Skipping...',
+        'item 4',
+        'item 5',
+    ]
+
+
+def test_run_jobs_errors(capfd):
+    errors = []
+    results = list(run_jobs(_job_worker, [3, 1], (10,), errors=errors))
+    assert results == [None, 10]
+    assert errors == [3]
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+@pytest.mark.parametrize('mod', ['yasort', 'ymltoxml'])
+def test_exit_status_bad_input(mod, jobs, tmp_path):
+    good = tmp_path / 'good.yaml'
+    good.write_text('controls:\n  - id: ac-1\n', encoding='utf-8')
+    bad = tmp_path / 'bad.yaml'
+    bad.write_text('controls:\n  - id: [ac-1\n', encoding='utf-8')
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path / 'cache'))
+    cmd = [sys.executable, '-m', f'yaml_tools.{mod}', '--jobs', jobs]
+    proc = subprocess.run(
+        cmd + ['good.yaml', 'bad.yaml'],
+        capture_output=True,
+        text=True,
+        cwd=tmp_path,
+        env=env,
+        check=False,
+    )
+    assert proc.returncode == 1
+    assert 'Error processing bad.yaml' in proc.stdout
+    proc = subprocess.run(
+        cmd + ['good.yaml'], capture_output=True, cwd=tmp_path, env=env, check=False
+    )
+    assert proc.returncode == 0
+
+
+def test_resolve_jobs(monkeypatch):
+    monkeypatch.setattr(utils, 'available_cpus', lambda: 4)
+    assert resolve_jobs(None) == 1
+    assert resolve_jobs(1) == 1
+    assert resolve_jobs(0) == 4
+    assert resolve_jobs(16) == 4
+    assert utils.available_cpus() == 4
+
+
+def test_cgroup_cpu_quota(tmp_path):
+    assert utils._cgroup_cpu_quota(str(tmp_path)) is None
+    cpu_max = tmp_path / 'cpu.max'
+    cpu_max.write_text('max 100000\n')
+    assert utils._cgroup_cpu_quota(str(tmp_path)) is None
+    cpu_max.write_text('150000 100000\n')
+    assert utils._cgroup_cpu_quota(str(tmp_path)) == 2
+    cpu_max.unlink()
+    v1_dir = tmp_path / 'cpu'
+    v1_dir.mkdir()
+    v1_dir.joinpath('cpu.cfs_quota_us').write_text('-1\n')
+    v1_dir.joinpath('cpu.cfs_period_us').write_text('100000\n')
+    assert utils._cgroup_cpu_quota(str(tmp_path)) is None
+    v1_dir.joinpath('cpu.cfs_quota_us').write_text('300000\n')
+    assert utils._cgroup_cpu_quota(str(tmp_path)) == 3
+
+
 def test_get_filelist():
     test_path = Path('tests') / 'data' / 'catalog.json'
     files = get_filelist('tests/data', '*')
@@ -261,6 +506,37 @@ def test_str_dumper():
     assert hasattr(my_yaml, 'dump')
 
 
+def test_str_dumper_stream():
+    yaml = StrYAML()
+    data = yaml.load(yaml_str)
+    stream = io.StringIO()
+    assert yaml.dump(data, stream) is None
+    assert stream.getvalue() == yaml.dump(data)
+
+
+def test_get_str_yaml_pool():
+    yaml = StrYAML()
+    popts = yaml.load(defconfig_str)
+    dumper = get_str_yaml(popts)
+    assert isinstance(dumper, StrYAML)
+    assert get_str_yaml(popts) is dumper
+    assert get_str_yaml(popts, typ='safe') is not dumper
+
+    popts['mapping'] = 2
+    assert get_str_yaml(popts) is not dumper
+
+    found = []
+    worker = threading.Thread(target=lambda: found.append(get_str_yaml(popts)))
+    worker.start()
+    worker.join()
+    assert found[0] is not get_str_yaml(popts)
+
+    data = yaml.load(yaml_str)
+    stream = io.StringIO()
+    str_yaml_dumper(data, popts, stream)
+    assert stream.getvalue() == str_yaml_dumper(data, popts)
+
+
 def test_xform_id_tolower():
     doc_ids = ['AC-1', 'AC-2(11)', 'AC-2(a)', 'AC-02(09)(a)', 'AC-03-01']
     sort_ids = ['ac-01', 'ac-02.11', 'ac-02.a', 'ac-02.09.a', 'ac-03.01']
@@ -284,6 +560,80 @@ def test_xform_id_strip():
     assert stripped == 'ac-08'
 
 
+def test_xform_ids():
+    doc_ids = ['AC-1', '', 'AC-2(11)', 'AC-6 (1)']
+    sort_ids = ['ac-01', 'ac-02.11', 'ac-06.01']
+    assert xform_ids(doc_ids) == sort_ids
+
+
+def test_control_id_interned():
+    ctl = ControlId('AC-12(2)')
+    assert ctl is ControlId('ac-12.02')
+    assert ctl is ControlId('AC-12-02')
+    assert ctl.family == 'ac'
+    assert ctl.number == 12
+    assert ctl.enhancements == (2,)
+    assert ctl.upper == 'AC-12(2)'
+    assert ctl.lower == 'ac-12.02'
+    assert len({ctl, ControlId('ac-12.2')}) == 1
+    assert not hasattr(ctl, '__dict__')
+
+
+def test_control_id_cache_bound(monkeypatch):
+    ctl = ControlId('AC-12(2)')
+    monkeypatch.setattr(templates, 'ID_CACHE_SIZE', 4)
+    for num in range(10):
+        ControlId(f'ac-{num}')
+    assert len(ControlId._interned) <= 4
+    assert len(ControlId._by_text) <= 4
+    ControlId.cache_clear()
+    other = ControlId('ac-12.02')
+    assert other is not ctl
+    assert other == ctl and hash(other) == hash(ctl)
+    assert len({ctl, other}) == 1
+    assert ctl != 'AC-12(2)'
+    assert xform_id.cache_info().maxsize == ID_CACHE_SIZE
+
+
+def test_control_id_raises():
+    with pytest.raises(ValueError):
+        ControlId('Variables')
+
+
+def test_id_sort_key():
+    ids = ['ac-10', 'ac-2.a', 'Variables', 'ac-2.1', 'ac-2', 'ac-1']
+    expected = ['ac-1', 'ac-2', 'ac-2.1', 'ac-2.a', 'ac-10', 'Variables']
+    assert sorted(ids, key=id_sort_key) == expected
+    profile_ids = Path('tests/data/OE-expanded-profile-all-ids.txt')
+    in_ids = profile_ids.read_text(encoding='utf-8').splitlines()
+    assert sorted(in_ids, key=id_sort_key) == os_sorted(in_ids)
+
+
+@pytest.mark.parametrize("mod", ['ymltoxml', 'yasort', 'yagrep', 'oscal'])
+def test_deferred_imports(mod):
+    deferred = [
+        'dpath',
+        'natsort',
+        'nested_lookup',
+        'pystache',
+        'ruamel.yaml',
+        'xmltodict',
+    ]
+    code = f"import sys, yaml_tools.{mod}; print(sorted(set({deferred}) & set(sys.modules)))"
+    proc = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True
+    )
+    assert proc.stdout.strip() == '[]'
+
+
+def test_load_config_memo():
+    popts, pfile = load_config('yagrep')
+    popts.file_encoding = 'bogus'
+    popts2, _ = load_config('yagrep')
+    assert popts2.file_encoding == 'utf-8'
+    assert popts2 is not popts
+
+
 def test_load_debug_config():
     popts, pfile = load_config(debug=True)
 
@@ -1,4 +1,5 @@
 import csv
+from collections import deque
 
 import pytest
 from munch import Munch
@@ -6,6 +7,7 @@ from munch import Munch
 import yaml_tools.oscal
 from yaml_tools.oscal import (
     csv_row_match,
+    id_set_match,
     process_data,
     ssg_ctrl_from_nist,
 )
@@ -169,6 +171,24 @@ def test_process_data(a, b, c, expected, capfd, tmp_path):
     assert expected in out
 
 
+def test_process_data_errors(capfd, tmp_path):
+    args_obj.sort = False
+    args_obj.ssg = False
+    args_obj.verbose = False
+    infile = 'tests/data/OE-expanded-profile-ids.txt'
+    (tmp_path / "test.yaml").write_text(yaml_str, encoding="utf-8")
+    (tmp_path / "test.bogus").write_text(yaml_str, encoding="utf-8")
+    popts = StrYAML().load(defconfig_str)
+    popts['default_content_path'] = tmp_path
+    popts['default_profile_glob'] = 'test.*'
+
+    errors = []
+    process_data(infile, popts, args_obj, errors=errors)
+    out, err = capfd.readouterr()
+    assert errors == [str(tmp_path / "test.bogus")]
+    assert "invalid input file extension: test.bogus" in out
+
+
 @pytest.mark.parametrize("a,b,c,expected", testdata2)
 def test_process_data_alt(a, b, c, expected, capfd, tmp_path):
     args_obj.sort = a
@@ -210,6 +230,24 @@ def test_process_data_alt(a, b, c, expected, capfd, tmp_path):
 # print(out)
 
 
+def test_id_set_match_names(capfd):
+    uargs = Munch(verbose=True, sort=False)
+    id_q = deque(
+        [
+            ('HIGH', ['AC-1', 'AC-2']),
+            ('input', ['AC-3']),
+            ('HIGH', ['AC-2', 'ac-01']),
+        ]
+    )
+    common, missing = id_set_match(['AC-2', 'AC-1', 'XX-9'], id_q, uargs)
+    out, _ = capfd.readouterr()
+    assert common == ['AC-2']
+    assert missing == ['AC-1', 'XX-9']
+    assert 'HIGH control IDs -> 2' in out
+    assert 'input control IDs -> 1' in out
+    assert 'HIGH;2;1' in out
+
+
 def test_ssg_ctrl_from_nist_raises():
 
     with pytest.raises(NotImplementedError):
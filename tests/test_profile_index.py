@@ -0,0 +1,63 @@
+import pickle
+
+import pytest
+
+from yaml_tools.profile_index import (
+    INDEX_VERSION,
+    build_index,
+    index_is_stale,
+    load_profile_index,
+    read_index,
+    write_index,
+)
+from yaml_tools.utils import PROFILE_NAMES
+
+
+def test_packaged_index_not_stale():
+    assert not index_is_stale()
+
+
+def test_load_profile_index():
+    idx = load_profile_index()
+    assert idx is load_profile_index()
+    assert load_profile_index('UTF8') is load_profile_index('UTF8')
+    latin = load_profile_index('latin-1')
+    assert latin is not idx
+    assert latin == build_index('latin-1')
+    assert idx['version'] == INDEX_VERSION
+    assert sorted(idx['profiles']) == sorted(PROFILE_NAMES)
+
+    all_ids = idx['ids']
+    for ptype in PROFILE_NAMES:
+        ids = idx['profiles'][ptype]['ids']
+        mask = idx['profiles'][ptype]['mask']
+        assert bin(mask).count('1') == len(ids)
+        assert [x for n, x in enumerate(all_ids) if mask >> n & 1] == list(ids)
+
+    high = idx['profiles']['HIGH']['mask']
+    low = idx['profiles']['LOW']['mask']
+    assert low & high == low
+
+
+def test_write_read_index(tmp_path):
+    opath = write_index(tmp_path / 'test.idx')
+    assert read_index(opath) == build_index()
+    assert not index_is_stale(opath)
+
+
+def test_stale_index(tmp_path):
+    assert index_is_stale(tmp_path / 'missing.idx')
+
+    bogus = tmp_path / 'bogus.idx'
+    bogus.write_bytes(b'not an index')
+    assert index_is_stale(bogus)
+
+    data = build_index()
+    data['ids'] = data['ids'][1:]
+    old = tmp_path / 'old.idx'
+    old.write_bytes(pickle.dumps(data))
+    assert index_is_stale(old)
+
+    old.write_bytes(pickle.dumps({'version': 0}))
+    with pytest.raises(pickle.UnpicklingError):
+        read_index(old)
@@ -0,0 +1,185 @@
+import dpath
+import pytest
+from nested_lookup import nested_lookup
+
+from yaml_tools.query import (
+    PathQuery,
+    collect_keys,
+    compile_query,
+    fold_matches,
+    is_container,
+    iter_filter,
+    iter_keys,
+    iter_lookup,
+)
+
+doc = {
+    'id': 'srg_gpos',
+    'levels': [{'id': 'high'}, {'id': 'medium'}, {'id': 'low'}],
+    'controls': [
+        {
+            'id': 'SRG-OS-000001-GPOS-00001',
+            'levels': ['medium'],
+            'rules': ['account_disable_post_pw_expiration'],
+            'status': 'automated',
+        },
+        {
+            'id': 'SRG-OS-000002-GPOS-00002',
+            'levels': ['low'],
+            'rules': [],
+            'status': 'pending',
+            1: 'int key',
+        },
+    ],
+}
+
+testdata = [
+    'id',
+    '/id',
+    'levels/*/id',
+    'levels/1/id',
+    'controls/*/rules',
+    'controls/*/rules/*',
+    'controls/[0-9]/status',
+    'controls/*/1',
+    '**/id',
+    '**',
+    'controls/**',
+    'controls/**/0',
+    'c*/0/*',
+    'nope/**',
+    'levels/9',
+]
+
+
+@pytest.mark.parametrize("glob", testdata)
+def test_values_match_dpath(glob):
+    query = PathQuery(glob)
+    assert query.values(doc) == dpath.values(doc, glob)
+    assert list(query.paths(doc)) == [
+        p for p, _ in dpath.search(doc, glob, yielded=True)
+    ]
+
+
+def test_separator():
+    query = PathQuery(';levels;*;id', separator=';')
+    assert query.values(doc) == ['high', 'medium', 'low']
+    assert list(query.paths(doc)) == ['levels;0;id', 'levels;1;id', 'levels;2;id']
+
+
+def test_match_and_depth():
+    query = PathQuery('controls/*/rules')
+    assert query.max_depth == 3
+    assert query.match(('controls', 0, 'rules'))
+    assert not query.match(('controls', 0))
+    assert not query.match(('levels', 0, 'rules'))
+    assert PathQuery('**/id').max_depth is None
+    assert PathQuery('**/id').match(('id',))
+    assert PathQuery('a/**/b').match(('a', 'b'))
+    assert not PathQuery('a/**/b').match(('a', 'c'))
+
+
+def test_list_root():
+    data = [{'id': 'ac-1'}, {'id': 'ac-2'}]
+    assert PathQuery('*/id').values(data) == ['ac-1', 'ac-2']
+    assert PathQuery('*').values('scalar') == []
+
+
+def test_compile_query_cached():
+    query = compile_query('**/rules')
+    assert compile_query('**/rules') is query
+    assert compile_query('**/rules', ';') is not query
+    assert 'rules' in repr(query)
+
+
+def test_invalid_glob():
+    with pytest.raises(ValueError):
+        PathQuery('**/a/**')
+
+
+def test_is_container():
+    assert is_container({})
+    assert is_container([])
+    assert not is_container('abc')
+    assert not is_container(b'abc')
+    assert not is_container(1)
+
+
+def test_iter_filter():
+    found = list(iter_filter(doc, lambda x: 'low' in x))
+    assert found == [
+        (('levels', 2, 'id'), 'low'),
+        (('controls', 1, 'levels', 0), 'low'),
+    ]
+    # a matching key returns the whole value without searching under it
+    found = list(iter_filter(doc, lambda x: x in ('rules', 'account')))
+    assert [p for p, _ in found] == [('controls', 0, 'rules'), ('controls', 1, 'rules')]
+    assert list(iter_filter(doc, lambda x: x == '1')) == [
+        (('controls', 1, 1), 'int key')
+    ]
+    assert list(iter_filter('low', lambda x: True)) == []
+
+
+def test_fold_matches():
+    found = iter_filter(doc, lambda x: 'low' in x)
+    assert fold_matches(doc, found) == {
+        'levels': [None, None, {'id': 'low'}],
+        'controls': [None, {'levels': ['low']}],
+    }
+    assert fold_matches(doc, []) == {}
+
+
+@pytest.mark.parametrize("key", ['id', 'levels', 'rules', 1, 'nope'])
+def test_iter_lookup(key):
+    assert [v for _, v in iter_lookup(doc, key)] == nested_lookup(key, doc)
+    for path, value in iter_lookup(doc, key):
+        assert dpath.get(doc, [str(x) for x in path]) == value
+
+
+def test_iter_keys():
+    keys = {'id', 'rules'}
+    found = [(k, v) for k, _, v in iter_keys(doc, keys)]
+    assert [v for k, v in found if k == 'id'] == nested_lookup('id', doc)
+    assert [v for k, v in found if k == 'rules'] == nested_lookup('rules', doc)
+    assert [k for k, _ in found][:5] == ['id', 'id', 'id', 'id', 'id']
+    assert list(iter_keys('scalar', keys)) == []
+
+
+def test_collect_keys():
+    found = collect_keys(doc, ['id', 'levels', 'nope'])
+    assert found == {
+        'id': nested_lookup('id', doc),
+        'levels': nested_lookup('levels', doc),
+        'nope': [],
+    }
+    found = collect_keys(
+        doc,
+        ['id', 'controls'],
+        predicates={'id': str.isupper},
+        limits={'controls': 1},
+    )
+    assert found['id'] == ['SRG-OS-000001-GPOS-00001', 'SRG-OS-000002-GPOS-00002']
+    assert found['controls'] == [doc['controls']]
+    assert collect_keys(doc, ['id'], limits={'id': 0}) == {'id': []}
+
+
+def test_collect_keys_early_stop():
+    seen = []
+
+    def check(value):
+        seen.append(value)
+        return value != 'srg_gpos'
+
+    found = collect_keys(doc, ['id'], predicates={'id': check}, limits={'id': 2})
+    assert found == {'id': ['high', 'medium']}
+    assert seen == ['srg_gpos', 'high', 'medium']
+
+
+def test_collect_keys_deep():
+    deep = {'id': 'top'}
+    node = deep
+    for idx in range(5000):
+        node['child'] = [{'id': idx}]
+        node = node['child'][0]
+    found = collect_keys(deep, ['id'])
+    assert found['id'] == ['top'] + list(range(5000))
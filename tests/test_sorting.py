@@ -0,0 +1,120 @@
+import pytest
+
+from yaml_tools.sorting import (
+    SortSpec,
+    SortTarget,
+    find_unsorted_key,
+    sort_mapping_keys,
+)
+from yaml_tools.utils import StrYAML
+
+yaml_str = """\
+controls:
+    -   id: ac-10
+        levels: [low, high]
+        rules:
+            - rule_10  # ten
+            - rule_9  # nine
+            - rule_1
+    -   id: ac-2
+        levels: [medium]
+        rules: [b, a]
+    -   id: ac-1
+        rules: []
+"""
+
+
+def load():
+    return StrYAML().load(yaml_str)
+
+
+def test_sort_spec():
+    data = load()
+    spec = SortSpec(
+        [
+            {'path': 'controls/*/rules', 'natural': True},
+            {'path': 'controls', 'by': 'id', 'natural': True, 'reverse': True},
+            {'path': 'controls/0/levels'},
+        ]
+    )
+    assert spec.sort(data) == 5
+    assert [x['id'] for x in data['controls']] == ['ac-10', 'ac-2', 'ac-1']
+    assert data['controls'][0]['rules'] == ['rule_1', 'rule_9', 'rule_10']
+    assert data['controls'][1]['rules'] == ['a', 'b']
+    # paths refer to the document as loaded
+    assert data['controls'][0]['levels'] == ['high', 'low']
+    assert data['controls'][1]['levels'] == ['medium']
+    out = StrYAML().dump(data)
+    assert out.index('rule_1\n') < out.index('rule_9 ') < out.index('# nine')
+    assert out.index('# nine') < out.index('rule_10 ') < out.index('# ten')
+    assert spec.find_unsorted(data) is None
+
+
+def test_sort_spec_unsorted():
+    data = load()
+    spec = SortSpec([{'path': 'controls', 'by': 'id', 'natural': True}])
+    assert spec.find_unsorted(data) == ('controls/1', 'ac-10', 'ac-2')
+    spec = SortSpec([{'path': 'controls/*/rules'}])
+    assert spec.find_unsorted(data) == ('controls/0/rules/2', 'rule_9', 'rule_1')
+    assert SortSpec([{'path': 'nope/*'}]).sort(data) == 0
+
+
+def test_sort_target_stable():
+    items = [{'k': 1, 'n': 'a'}, {'k': 0, 'n': 'b'}, {'k': 1, 'n': 'c'}]
+    SortTarget('x', by='k', reverse=True).sort(items)
+    assert [x['n'] for x in items] == ['a', 'c', 'b']
+    assert SortTarget('x', by='k', reverse=True).first_unsorted(items) is None
+    assert SortTarget('x', by='k').first_unsorted(items) == 2
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [[], [{'by': 'id'}], [{'path': 'a', 'order': 'up'}], [{'path': 'a/**/b/**'}]],
+)
+def test_sort_spec_invalid(spec):
+    with pytest.raises(ValueError):
+        SortSpec(spec)
+
+
+keys_str = """\
+f: 3
+e:
+- 10     # sequences can have nodes that are mappings
+- 11
+- x: A
+  y: 30
+  z:
+    m: 51  # this should be last
+    l: 50
+    k: 49  # this should be first
+d: 1
+"""
+
+
+def test_sort_mapping_keys():
+    data = StrYAML().load(keys_str)
+    assert find_unsorted_key(data) == ('e', 'f', 'e')
+    assert sort_mapping_keys(data) == 3
+    assert list(data) == ['d', 'e', 'f']
+    assert list(data['e'][2]['z']) == ['k', 'l', 'm']
+    assert find_unsorted_key(data) is None
+    out = StrYAML().dump(data)
+    lines = out.splitlines()
+    assert lines[7].split() == ['k:', '49', '#', 'this', 'should', 'be', 'first']
+    assert lines[9].split()[:3] == ['m:', '51', '#']
+    assert '# sequences' in lines[2]
+
+
+def test_sort_mapping_keys_deep():
+    doc = node = {}
+    for idx in range(5000):
+        node['z'] = {'b': idx, 'a': idx}
+        node = node['z']
+    node['self'] = doc
+    assert find_unsorted_key(doc) == ('z/a', 'b', 'a')
+    assert sort_mapping_keys(doc) == 5001
+    assert list(doc['z']['z']) == ['a', 'b', 'z']
+    assert sort_mapping_keys({1: 'x', 'a': 'y', 0: 'z'}) == 1
+    mixed = {1: 'x', 'a': 'y', 0: 'z'}
+    sort_mapping_keys(mixed)
+    assert list(mixed) == [0, 1, 'a']
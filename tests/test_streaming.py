@@ -0,0 +1,254 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+import xmltodict
+import yaml
+from nested_lookup import nested_lookup
+
+from yaml_tools.query import (
+    PathQuery,
+    compile_query,
+    fold_matches,
+    iter_filter,
+)
+from yaml_tools.streaming import (
+    DOC,
+    END,
+    MAP,
+    SCALAR,
+    SEQ,
+    XmlSearch,
+    iter_events,
+    json_events,
+    jsonl_events,
+    search_events,
+    stream_search,
+    xml_search_data,
+    yaml_events,
+)
+
+popts = {'file_encoding': 'utf-8', 'default_separator': '/', 'yaml_backend': 'auto'}
+
+yaml_str = """\
+id: srg_gpos
+version: 'v2r3'
+levels:
+- id: high
+- id: low
+controls:
+    -   id: Variables
+        levels: [high, low]
+        rules:
+            - var_sshd_disable_compression=no
+            - sshd_approved_macs=stig
+        status: 1.5
+    -   id: AC-1
+        rules: []
+        date: 2023-01-01
+"""
+
+data = yaml.safe_load(yaml_str)
+
+
+def build(events):
+    """collect the document(s) from events using the lookup engine"""
+    return [v for _, v in search_events(events, lambda p: len(p) == 1, nested=False)]
+
+
+def test_json_events():
+    events = list(
+        json_events(io.StringIO('{"a": [1, 2.5, -3e2, true, null, "x\\"y"]}'))
+    )
+    assert events == [
+        (MAP, None),
+        (SCALAR, 'a'),
+        (SEQ, None),
+        (SCALAR, 1),
+        (SCALAR, 2.5),
+        (SCALAR, -300.0),
+        (SCALAR, True),
+        (SCALAR, None),
+        (SCALAR, 'x"y'),
+        (END, None),
+        (END, None),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+def test_json_events_chunks(chunk_size):
+    text = json.dumps(data, default=str, indent=2)
+    events = json_events(io.StringIO(text), chunk_size=chunk_size)
+    expected = json.loads(text)
+    assert build(events) == list(expected.values())
+
+
+def test_json_events_raises():
+    with pytest.raises(ValueError):
+        list(json_events(io.StringIO('{"a": bogus}')))
+
+
+def test_jsonl_events():
+    text = '{"id": 1}\n\n{"id": 2}\n'
+    events = list(jsonl_events(io.StringIO(text)))
+    assert events[0] == (SEQ, None)
+    assert events[-1] == (END, None)
+    assert build(iter(events)) == [{'id': 1}, {'id': 2}]
+
+
+def test_yaml_events():
+    events = list(yaml_events(io.StringIO(yaml_str), popts))
+    assert events[0] == (DOC, None)
+    assert build(iter(events)) == list(data.values())
+
+
+def test_yaml_aliases():
+    text = "base: &b {x: 1}\nother: *b\nname: &n foo\nalias: *n\n"
+    found = search_events(yaml_events(io.StringIO(text)), lambda p: p[-1] == 'x')
+    assert [v for _, v in found] == [1, 1]
+    assert build(yaml_events(io.StringIO(text))) == [{'x': 1}, {'x': 1}, 'foo', 'foo']
+    with pytest.raises(yaml.YAMLError):
+        list(yaml_events(io.StringIO("a: *missing\n")))
+
+
+@pytest.mark.parametrize("text", ["id", "rules", "levels", "nope"])
+def test_lookup_matches_nested_lookup(text):
+    found = search_events(yaml_events(io.StringIO(yaml_str)), lambda p: p[-1] == text)
+    assert [v for _, v in found] == nested_lookup(text, data)
+
+
+@pytest.mark.parametrize(
+    "glob", ["controls/*/id", "levels/1", "*", "controls/0/rules/*"]
+)
+def test_path_matches_query(glob):
+    query = PathQuery(glob)
+    found = search_events(
+        yaml_events(io.StringIO(yaml_str)), query.match, query.may_contain, nested=False
+    )
+    assert [v for _, v in found] == query.values(data)
+
+
+def test_stream_search(tmp_path):
+    yfile = tmp_path / 'in.yaml'
+    yfile.write_text(yaml_str, encoding='utf-8')
+    jfile = tmp_path / 'in.json'
+    jfile.write_text(json.dumps(data, default=str), encoding='utf-8')
+    for infile in [yfile, jfile]:
+        assert list(stream_search(infile, 'id', 'lookup', popts))[:2] == [
+            'srg_gpos',
+            'high',
+        ]
+        assert list(stream_search(infile, 'controls/*/id', 'path', popts)) == [
+            'Variables',
+            'AC-1',
+        ]
+    assert list(stream_search(yfile, '**/rules', 'path', popts))[1] == []
+    with pytest.raises(ValueError):
+        stream_search(yfile, 'id', 'filter', popts)
+    with pytest.raises(ValueError):
+        iter_events(tmp_path / 'in.txt', popts)
+
+
+def test_stream_search_memory(tmp_path):
+    records = [
+        {'id': f'ac-{x}', 'text': 'x' * 1000, 'props': {'n': x}} for x in range(2000)
+    ]
+    jfile = tmp_path / 'big.json'
+    jfile.write_text(json.dumps({'controls': records}), encoding='utf-8')
+    size = jfile.stat().st_size
+
+    tracemalloc.start()
+    found = 0
+    for _ in stream_search(jfile, 'controls/*/props/n', 'path', popts):
+        found += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert found == 2000
+    assert peak < size / 4
+
+
+xml_str = """\
+<?xml version="1.0" encoding="utf-8"?>
+<catalog id="nist">
+  <!-- controls -->
+  <group id="ac" class="family">
+    <title>Access Control</title>
+    <control id="ac-1"><title>Policy</title><prop name="label">AC-1</prop></control>
+    <control id="ac-2"><title>Accounts</title></control>
+  </group>
+  <group id="at">
+    <title>Awareness <b>and</b> Training</title>
+    <control id="at-1"/>
+  </group>
+  <back-matter/>
+</catalog>
+"""
+
+
+def xml_search(mode, text, prog_opts, matcher=None):
+    return XmlSearch(mode, text, prog_opts, matcher).parse(
+        io.BytesIO(xml_str.encode('utf-8')), chunk_size=16
+    )
+
+
+@pytest.mark.parametrize("comments", [False, True])
+@pytest.mark.parametrize(
+    "glob",
+    [
+        "catalog/group/*/@id",
+        "catalog/group/1/control",
+        "catalog/group/0/control/1/title",
+        "**/title",
+        "**/control/0",
+        "catalog/**/prop",
+        "catalog/#comment",
+        "catalog/back-matter",
+        "*",
+    ],
+)
+def test_xml_path_matches_xmltodict(glob, comments):
+    opts = dict(popts, process_comments=comments)
+    full = xmltodict.parse(xml_str, process_comments=comments)
+    query = compile_query(glob)
+    assert query.values(xml_search('path', glob, opts)) == query.values(full)
+
+
+@pytest.mark.parametrize("text", ["control", "@id", "title", "#text", "nope"])
+def test_xml_lookup_matches_xmltodict(text):
+    full = xmltodict.parse(xml_str)
+    assert nested_lookup(text, xml_search('lookup', text, popts)) == nested_lookup(
+        text, full
+    )
+
+
+@pytest.mark.parametrize("text", ["ac-", "title", "Training", "None", "#comment"])
+def test_xml_filter_matches_xmltodict(text):
+    opts = dict(popts, process_comments=True)
+    full = xmltodict.parse(xml_str, process_comments=True)
+    doc = xml_search('filter', text, opts, lambda x: text in x)
+    assert fold_matches(doc, iter_filter(doc, lambda x: text in x)) == fold_matches(
+        full, iter_filter(full, lambda x: text in x)
+    )
+
+
+def test_xml_search_prunes(tmp_path):
+    controls = ''.join(
+        f'<control id="ac-{x}"><title>{"x" * 1000}</title></control>'
+        for x in range(2000)
+    )
+    xfile = tmp_path / 'big.xml'
+    xfile.write_text(f'<catalog><group>{controls}</group></catalog>', encoding='utf-8')
+    size = xfile.stat().st_size
+
+    tracemalloc.start()
+    doc = xml_search_data(xfile, 'path', 'catalog/group/control/5/@id', popts)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert compile_query('catalog/group/control/*/@id').values(doc) == ['ac-5']
+    assert peak < size / 4
+    with pytest.raises(ValueError):
+        XmlSearch('stream', 'id', popts)
+    xfile.write_text('<!DOCTYPE x [<!ENTITY a "b">]><x>&a;</x>', encoding='utf-8')
+    with pytest.raises(ValueError):
+        xml_search_data(xfile, 'lookup', 'x', popts)
@@ -0,0 +1,136 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from yaml_tools.utils import get_filelist
+from yaml_tools.walk import GitIgnore, read_ahead, walk_files
+
+tree = [
+    'top.yaml',
+    'notes.txt',
+    'a/one.yaml',
+    'a/b/two.yml',
+    'a/b/skip.tmp',
+    'build/out.yaml',
+    '.git/objects/obj.yaml',
+    'venv/lib/site.yaml',
+    'pkg.egg-info/meta.yaml',
+    'z/last.json',
+]
+
+
+@pytest.fixture
+def content(tmp_path):
+    for name in tree:
+        path = tmp_path.joinpath(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('key: value\n', encoding='utf-8')
+    return tmp_path
+
+
+def relpaths(root, paths):
+    return [Path(x).relative_to(root).as_posix() for x in paths]
+
+
+def test_walk_files(content):
+    found = relpaths(content, walk_files(content))
+    assert found == [
+        'notes.txt',
+        'top.yaml',
+        'a/one.yaml',
+        'a/b/skip.tmp',
+        'a/b/two.yml',
+        'build/out.yaml',
+        'z/last.json',
+    ]
+    found = relpaths(content, walk_files(content, ['*.yaml', '*.yml']))
+    assert found == ['top.yaml', 'a/one.yaml', 'a/b/two.yml', 'build/out.yaml']
+    assert relpaths(content, walk_files(content, ['a/*/*.yml'])) == ['a/b/two.yml']
+
+
+def test_walk_files_exclude(content):
+    found = relpaths(content, walk_files(content, ['*.yaml'], exclude=['build', 'a']))
+    # an exclude list replaces the default excludes
+    assert found == [
+        'top.yaml',
+        '.git/objects/obj.yaml',
+        'pkg.egg-info/meta.yaml',
+        'venv/lib/site.yaml',
+    ]
+    found = relpaths(content, walk_files(content, ['*.yaml'], exclude=[]))
+    assert '.git/objects/obj.yaml' in found
+    assert 'venv/lib/site.yaml' in found
+    assert len(found) == 6
+    found = relpaths(content, walk_files(content, ['*.yml'], exclude=['a/b']))
+    assert found == []
+
+
+def test_walk_files_prunes(content, monkeypatch):
+    scanned = []
+    scandir = os.scandir
+
+    def record(path):
+        scanned.append(Path(path).relative_to(content).as_posix())
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', record)
+    list(walk_files(content, exclude=['build', '.git', 'venv', '*.egg-info']))
+    assert scanned == ['.', 'a', 'a/b', 'z']
+
+
+def test_walk_files_gitignore(content):
+    content.joinpath('.gitignore').write_text(
+        '# build output\nbuild/\n*.tmp\n/z\n', encoding='utf-8'
+    )
+    content.joinpath('a', '.gitignore').write_text(
+        '*.yaml\n!one.yaml\nb/*.yml\n', encoding='utf-8'
+    )
+    found = relpaths(content, walk_files(content, ['*.yaml', '*.yml', '*.tmp']))
+    assert len(found) == 5
+    found = relpaths(
+        content, walk_files(content, ['*.yaml', '*.yml', '*.tmp'], gitignore=True)
+    )
+    assert found == ['top.yaml', 'a/one.yaml']
+
+
+def test_gitignore_rules():
+    rules = GitIgnore(
+        'sub', ['logs/', '**/cache/*.json', 'doc/**', '!keep.log', '*.log']
+    )
+    assert rules.ignored('sub/logs', True)
+    assert rules.ignored('sub/logs', False) is None
+    assert rules.ignored('sub/x/cache/a.json', False)
+    assert rules.ignored('sub/cache/a.json', False)
+    assert rules.ignored('sub/doc/a/b.md', False)
+    assert rules.ignored('sub/x/doc/b.md', False) is None
+    assert rules.ignored('sub/x/keep.log', False)
+    assert rules.ignored('other/a.log', False) is None
+    rules = GitIgnore('', ['*.log', '!keep.log', 'data[0-9].yaml'])
+    assert not rules.ignored('keep.log', False)
+    assert rules.ignored('data1.yaml', False)
+    assert rules.ignored('datax.yaml', False) is None
+
+
+@pytest.mark.parametrize("depth", [0, 1, 3, 20])
+def test_read_ahead(content, depth):
+    paths = list(walk_files(content))
+    assert list(read_ahead(iter(paths), depth)) == paths
+    missing = str(content / 'missing.yaml')
+    assert list(read_ahead([missing], depth)) == [missing]
+
+
+def test_get_filelist_excludes(content):
+    files = get_filelist(str(content), '*.yaml')
+    assert relpaths(content, files) == ['top.yaml', 'a/one.yaml', 'build/out.yaml']
+    files = get_filelist(str(content), '*.yaml', exclude=[], gitignore=True)
+    assert len(files) == 6
+    assert sorted(get_filelist('tests/data', '*')) == sorted(
+        str(x) for x in Path('tests/data').rglob('*') if x.is_file()
+    )
+    assert get_filelist('tests/data/', 'catalog.csv') == ['tests/data/catalog.csv']
+
+
+def test_get_filelist_cwd(content, monkeypatch):
+    monkeypatch.chdir(content)
+    assert get_filelist('.', '*.yaml') == ['top.yaml', 'a/one.yaml', 'build/out.yaml']
@@ -1,8 +1,14 @@
+import json
+
 import pytest
 from munch import Munch
 
 from yaml_tools.utils import FileTypeError, StrYAML
-from yaml_tools.yagrep import process_inputs
+from yaml_tools.yagrep import (
+    grep_file,
+    process_inputs,
+    recursive_inputs,
+)
 
 defconfig_str = """\
 # comments should be preserved
@@ -131,3 +137,110 @@ def test_bad_file(capfd, tmp_path):
     process_inputs(inp2, args_obj, popts)
     out, err = capfd.readouterr()
     assert file_type_err in out
+
+
+def test_grep_file(capfd, tmp_path):
+    args_obj.text = "compression"
+    args_obj.filter = True
+    args_obj.lookup = False
+    yaml = StrYAML()
+    inp = tmp_path / "in.yml"
+    inp.write_text(yaml_str, encoding="utf-8")
+
+    popts = yaml.load(defconfig_str)
+    data = grep_file(inp, args_obj, popts)
+    out, err = capfd.readouterr()
+    assert "disable_compression" in data
+    assert out == ""
+
+
+@pytest.mark.parametrize(
+    "opts,expected",
+    [
+        ({"count": True}, ":3\n"),
+        ({"count": True, "patterns": ["auditd"]}, ":6\n"),
+        ({"count": True, "patterns": [r"=\d+$"], "regex": True}, ":5\n"),
+        ({"count": True, "max_count": 1}, ":1\n"),
+        ({"files_with_matches": True}, "in.yml\n"),
+    ],
+)
+def test_filter_output_modes(opts, expected, capfd, tmp_path):
+    grep_args = Munch.fromDict(
+        {"text": "stig", "filter": True, "lookup": False, "patterns": None}
+    )
+    grep_args.update(opts)
+    inp = tmp_path / "in.yml"
+    inp.write_text(yaml_str, encoding="utf-8")
+
+    popts = StrYAML().load(defconfig_str)
+    process_inputs(inp, grep_args, popts)
+    out, err = capfd.readouterr()
+    assert out.endswith(expected)
+
+
+def test_filter_max_count(capfd, tmp_path):
+    grep_args = Munch.fromDict(
+        {"text": "var_", "filter": True, "lookup": False, "max_count": 2}
+    )
+    inp = tmp_path / "in.yml"
+    inp.write_text(yaml_str, encoding="utf-8")
+
+    popts = StrYAML().load(defconfig_str)
+    process_inputs(inp, grep_args, popts)
+    out, err = capfd.readouterr()
+    assert "disable_compression" in out
+    assert "password_hashing" in out
+    assert "dictcheck" not in out
+
+
+def test_recursive_inputs(tmp_path):
+    for name in [
+        'in.yml',
+        'sub/in.json',
+        'sub/in.xml',
+        'sub/notes.txt',
+        '.git/in.yaml',
+        'skip/in.yml',
+    ]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(yaml_str, encoding="utf-8")
+    grep_args = Munch.fromDict(
+        {"include": None, "exclude": ["skip"], "gitignore": False}
+    )
+    popts = StrYAML().load(defconfig_str)
+
+    found = list(recursive_inputs([str(tmp_path)], grep_args, popts))
+    assert found == [
+        str(tmp_path / 'in.yml'),
+        str(tmp_path / 'sub' / 'in.json'),
+        str(tmp_path / 'sub' / 'in.xml'),
+    ]
+    grep_args.include = ['*.txt']
+    found = list(recursive_inputs([str(tmp_path)], grep_args, popts))
+    assert found == [str(tmp_path / 'sub' / 'notes.txt')]
+
+
+def test_process_inputs_xml(capfd, tmp_path):
+    inp = tmp_path / "in.xml"
+    inp.write_text(
+        '<profile><control id="ac-1"><title>Policy</title></control>'
+        '<control id="ac-2"/><!-- ac-3 --></profile>',
+        encoding="utf-8",
+    )
+    popts = StrYAML().load(defconfig_str)
+    grep_args = Munch.fromDict({"text": "@id", "filter": False, "lookup": True})
+    process_inputs(inp, grep_args, popts)
+    out, err = capfd.readouterr()
+    assert json.loads(out) == ["ac-1", "ac-2"]
+
+    grep_args.update({"text": "profile/control/0/title", "lookup": False})
+    process_inputs(inp, grep_args, popts)
+    out, err = capfd.readouterr()
+    assert '"Policy"' in out
+
+    popts["process_comments"] = True
+    grep_args.update({"text": "ac-", "filter": True, "count": True, "patterns": None})
+    process_inputs(inp, grep_args, popts)
+    out, err = capfd.readouterr()
+    assert out.endswith("in.xml:3\n")
@@ -1,7 +1,16 @@
+import tracemalloc
+
 import pytest
 
+from yaml_tools.manifest import BuildManifest
 from yaml_tools.utils import FileTypeError, StrYAML
-from yaml_tools.yasort import get_input_yaml, process_inputs
+from yaml_tools.yasort import (
+    check_inputs,
+    find_unsorted,
+    get_input_yaml,
+    iter_input_yaml,
+    process_inputs,
+)
 
 defconfig_str = """\
 # comments should be preserved
@@ -94,3 +103,200 @@ def test_bad_file(capfd, tmp_path):
 
     with pytest.raises(FileTypeError):
         get_input_yaml(inp2, popts)
+
+
+def test_process_inputs_incremental(capfd, tmp_path):
+    d = tmp_path / "out"
+    d.mkdir()
+    inp = tmp_path / "in.yml"
+    inp.write_text(yaml_str, encoding="utf-8")
+    popts = StrYAML().load(defconfig_str)
+    popts['output_dirname'] = d
+
+    manifest = BuildManifest.load(d, 'yasort', popts)
+    manifest.update([process_inputs(inp, popts, True, manifest)])
+    out, err = capfd.readouterr()
+    assert "Processing data" in out
+    outfile = d / "in.yaml"
+    mtime = outfile.stat().st_mtime_ns
+
+    manifest = BuildManifest.load(d, 'yasort', popts)
+    assert process_inputs(inp, popts, True, manifest) is None
+    out, err = capfd.readouterr()
+    assert out == f"{outfile} is up to date\n"
+
+    # changed input with the same sorted output is not rewritten
+    lines = yaml_str.splitlines(keepends=True)
+    lines[21], lines[22] = lines[22], lines[21]
+    inp.write_text(''.join(lines), encoding="utf-8")
+    manifest.update([process_inputs(inp, popts, True, manifest)])
+    out, err = capfd.readouterr()
+    assert "is unchanged" in out
+    assert outfile.stat().st_mtime_ns == mtime
+    assert manifest.is_current(inp, outfile)
+
+    # an input with nothing to sort is not parsed again
+    popts['sort_spec'] = [{'path': 'nope'}]
+    manifest = BuildManifest.load(d, 'yasort', popts)
+    outfile.unlink()
+    manifest.update([process_inputs(inp, popts, True, manifest)])
+    out, err = capfd.readouterr()
+    assert "No lists to sort" in out
+    assert process_inputs(inp, popts, True, manifest) is None
+    out, err = capfd.readouterr()
+    assert out == f"{outfile} is up to date\n"
+
+
+def test_check_inputs(capfd, tmp_path):
+    d = tmp_path / "out"
+    d.mkdir()
+    inp = tmp_path / "in.yml"
+    inp.write_text(yaml_str, encoding="utf-8")
+    popts = StrYAML().load(defconfig_str)
+    popts['output_dirname'] = d
+
+    assert check_inputs(inp, popts) is False
+    out, err = capfd.readouterr()
+    assert out == (
+        f"{inp}: controls/0/rules/1 is out of order "
+        "('var_password_hashing_algorithm=SHA512' sorts before "
+        "'var_sshd_disable_compression=no')\n"
+    )
+    assert list(d.iterdir()) == []
+
+    process_inputs(inp, popts)
+    assert check_inputs(d / "in.yaml", popts, True) is True
+    out, err = capfd.readouterr()
+    assert out.endswith("in.yaml is sorted\n")
+
+    assert check_inputs(tmp_path / "missing.yml", popts) is False
+    assert check_inputs(tmp_path / "in.ymml", popts) is False
+
+
+def test_find_unsorted():
+    popts = StrYAML().load(defconfig_str)
+    data = {'controls': [{'rules': ['a', 'b']}, {'rules': []}, {'rules': ['b', 'a']}]}
+    assert find_unsorted(data, popts) == ('controls/2/rules/1', 'b', 'a')
+    popts['has_parent_key'] = False
+    data = {'controls': [], 'rules': ['a', 'a', 'c', 'b']}
+    assert find_unsorted(data, popts) == ('rules/3', 'c', 'b')
+    data['rules'].sort()
+    assert find_unsorted(data, popts) is None
+
+
+def test_process_inputs_sort_spec(capfd, tmp_path):
+    d = tmp_path / "out"
+    d.mkdir()
+    inp = tmp_path / "in.yml"
+    inp.write_text(yaml_str, encoding="utf-8")
+    popts = StrYAML().load(defconfig_str)
+    popts['output_dirname'] = d
+    popts['sort_spec'] = [
+        {'path': 'controls/*/rules', 'reverse': True},
+        {'path': 'levels', 'by': 'id'},
+    ]
+
+    process_inputs(inp, popts)
+    data = StrYAML().load(d / "in.yaml")
+    assert [x['id'] for x in data['levels']] == ['high', 'low', 'medium']
+    assert data['controls'][0]['rules'][0] == 'var_sshd_disable_compression=no'
+    assert check_inputs(d / "in.yaml", popts) is True
+
+    popts['sort_spec'] = [{'path': 'nope'}]
+    assert process_inputs(inp, popts) is None
+    assert check_inputs(inp, popts) is False
+    out, err = capfd.readouterr()
+    assert out.count("No lists to sort") == 2
+
+
+def test_process_inputs_sort_keys(capfd, tmp_path):
+    d = tmp_path / "out"
+    d.mkdir()
+    inp = tmp_path / "in.yml"
+    inp.write_text(yaml_str, encoding="utf-8")
+    popts = StrYAML().load(defconfig_str)
+    popts['output_dirname'] = d
+    popts['sort_keys'] = True
+
+    assert check_inputs(inp, popts) is False
+    out, err = capfd.readouterr()
+    assert "controls/0/rules/1 is out of order" in out
+    process_inputs(inp, popts)
+    data = StrYAML().load(d / "in.yaml")
+    assert list(data)[:3] == ['controls', 'controls_dir', 'id']
+    assert list(data['controls'][0]) == ['id', 'levels', 'rules', 'title']
+    assert check_inputs(d / "in.yaml", popts) is True
+
+    popts['sort_spec'] = [{'path': 'nope'}]
+    inp.write_text("b: 1\na: 2\n", encoding="utf-8")
+    assert check_inputs(inp, popts) is False
+    out, err = capfd.readouterr()
+    assert out == f"{inp}: a is out of order ('a' sorts before 'b')\n"
+
+
+def test_process_inputs_jinja(capfd, tmp_path):
+    d = tmp_path / "out"
+    d.mkdir()
+    inp = tmp_path / "in.yml"
+    inp.write_text(
+        "controls:\n"
+        "  - id: {{{ ctl_id }}}\n"
+        "    rules:\n"
+        "      - {{{ xccdf_value(\"var_b\") }}}\n"
+        "      - rule_b  # keep\n"
+        "      - rule_a\n",
+        encoding="utf-8",
+    )
+    popts = StrYAML().load(defconfig_str)
+    popts['output_dirname'] = d
+
+    assert check_inputs(inp, popts) is False
+    out, err = capfd.readouterr()
+    assert "controls/0/rules/1 is out of order ('rule_b' sorts" in out
+    process_inputs(inp, popts)
+    assert d.joinpath("in.yaml").read_text(encoding="utf-8") == (
+        "controls:\n"
+        "    - id: {{{ ctl_id }}}\n"
+        "      rules:\n"
+        "          - rule_a\n"
+        "          - rule_b # keep\n"
+        "          - {{{ xccdf_value(\"var_b\") }}}\n"
+    )
+    assert check_inputs(d / "in.yaml", popts) is True
+
+
+def test_process_inputs_multi_doc(capfd, tmp_path):
+    d = tmp_path / "out"
+    d.mkdir()
+    inp = tmp_path / "in.yml"
+    sorted_doc = "controls:\n    - id: a\n      rules:\n          - x\n          - y\n"
+    inp.write_text(f"{sorted_doc}---\n{yaml_str}---\nid: none\n", encoding="utf-8")
+    popts = StrYAML().load(defconfig_str)
+    popts['output_dirname'] = d
+
+    assert len(list(iter_input_yaml(inp, popts))) == 3
+    assert check_inputs(inp, popts) is False
+    out, err = capfd.readouterr()
+    assert out.startswith(f"{inp} (document 2): controls/0/rules/1 is out of order")
+    process_inputs(inp, popts)
+    outfile = d / "in.yaml"
+    docs = list(iter_input_yaml(outfile, popts, safe=True))
+    assert len(docs) == 3
+    assert docs[0]['controls'][0]['rules'] == ['x', 'y']
+    assert docs[2] == {'id': 'none'}
+    text = outfile.read_text(encoding="utf-8")
+    assert text.startswith(sorted_doc + "---\n")
+    assert text.count("---") == 2
+    assert check_inputs(outfile, popts) is True
+
+    # documents are sorted and written one at a time
+    peaks = []
+    for count in (5, 50):
+        inp.write_text('---\n'.join([yaml_str] * count), encoding="utf-8")
+        tracemalloc.start()
+        process_inputs(inp, popts)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+    assert outfile.read_text(encoding="utf-8").count("\n---\n") == 49
+    assert peaks[1] < 2 * peaks[0]